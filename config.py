@@ -19,10 +19,18 @@ CACHE_DIR.mkdir(exist_ok=True)
 LOG_DIR = BASE_DIR / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 
+# 扫描配置（文件发现的 exclude 规则）
+SCAN_CONFIG_FILE = BASE_DIR / "configs" / "default.yaml"
+
 # ============ CodeQL配置 ============
 CODEQL_PATH = os.environ.get("CODEQL_PATH", "codeql")
 CODEQL_WORKSPACE = BASE_DIR / ".codeql_workspace"
 CODEQL_WORKSPACE.mkdir(exist_ok=True)
+CODEQL_BACKEND = os.environ.get("CODEQL_BACKEND", "cli-server")  # "cli-server"(常驻进程) 或 "subprocess"
+CODEQL_DB_CACHE_ENABLED = True  # 源码未变化时复用已有数据库
+CODEQL_DB_CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024  # 数据库缓存磁盘预算：10GB
+QUERY_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 生成查询（含预编译 .qlx）缓存预算：512MB
+API_EXTRACT_QUERY = BASE_DIR / "queries" / "extract_api_calls.ql"  # 候选API提取查询（表格输出，经 bqrs decode 读取）
 
 # ============ DeepSeek API配置 ============
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY", "")
@@ -37,7 +45,15 @@ REQUEST_TIMEOUT = 60  # 请求超时时间（秒）
 
 # ============ 缓存配置 ============
 CACHE_TTL = 7 * 24 * 60 * 60  # 缓存有效期：7天
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite")  # 持久缓存后端："sqlite"（单文件）或 "file"（每键一个文件）
+CACHE_SERIALIZER = "json"  # 缓存条目编码："json"（有orjson时使用orjson）或 "pickle"（需同时启用 CACHE_ALLOW_PICKLE）
+CACHE_COMPRESSION = "auto"  # 缓存条目压缩："auto"（zstd > lz4 > zlib）、"none"、"zlib"、"zstd"、"lz4"
+CACHE_ALLOW_PICKLE = False  # 是否允许读写pickle条目；共享缓存目录时不要开启
 CACHE_MAX_SIZE = 1000  # 内存缓存最大条目数
+CACHE_MEMORY_MAX_BYTES = 64 * 1024 * 1024  # 内存缓存最大字节数（按序列化大小估算）：64MB
+CACHE_DISK_MAX_BYTES = 1024 * 1024 * 1024  # 磁盘缓存预算，超出后按最近使用时间淘汰：1GB
+LABEL_STORE_ENABLED = True  # 规范推断前先查询跨项目的API标签库
+LABEL_STORE_PATH = CACHE_DIR / "api_labels.sqlite3"  # API标签库位置（可在多个项目间共享）
 
 # ============ 支持的CWE类型 ============
 SUPPORTED_CWES = [
@@ -129,6 +145,14 @@ IRIS_CONFIG = {
     "MAX_EXTERNAL_APIS": 500,    # 最大外部API数量
     "MAX_PUBLIC_FUNCTIONS": 200,  # 最大公开函数数量
     "MAX_PATH_STEPS": 15,         # 最大路径步骤数
+    "API_CONTEXT_SAMPLES": 3,     # 合并调用点后每个API发送给LLM的上下文样本数
+    
+    # 第四阶段路径验证并发
+    "VALIDATION_WORKERS": 4,      # 并发验证的最大请求数（1为串行）
+    "VALIDATION_TIMEOUT": 60,     # 单次验证请求超时（秒）
+    "PERSIST_VERDICTS": True,     # 验证结论按代码内容哈希跨次运行持久化（需启用缓存）
+    "PATH_SLICING": True,         # 验证上下文使用路径切片（AST提取路径语句、函数签名和控制结构头）
+    "SLICE_TOKEN_BUDGET": 1200,   # 单条路径切片的token预算（估算值）
     
     # 是否启用公开函数参数推断
     "ENABLE_FUNCTION_PARAM_INFERENCE": True,
@@ -142,5 +166,9 @@ PERFORMANCE_CONFIG = {
     "ENABLE_PARALLEL": True,        # 启用并行处理
     "MAX_WORKERS": 4,                # 最大工作线程数
     "ENABLE_STREAMING": False,       # 启用流式响应
-    "CACHE_LLM_RESPONSES": True,     # 缓存LLM响应
+    "CACHE_LLM_RESPONSES": True,     # 缓存LLM响应（按模型+提示词+温度的规范化哈希）
+    "LLM_RATE_LIMIT": 5.0,           # 并发推断时每秒最多发起的LLM请求数（令牌桶，0表示不限流）
+    "LLM_MAX_RETRIES": 5,            # 429/5xx错误的最大重试次数（指数退避）
+    "DISCOVERY_WORKERS": 8,          # 文件发现时预取目录列表的线程数（1为串行）
+    "AST_JOBS": 1,                   # ProjectAnalyzer 解析文件的进程数（0为CPU核数，1为串行）
 }
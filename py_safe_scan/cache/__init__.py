@@ -1,2 +1,4 @@
 """缓存模块"""
+from py_safe_scan.cache.backends import CacheBackend, FileBackend, SQLiteBackend
 from py_safe_scan.cache.cache_manager import CacheManager
+from py_safe_scan.cache.directory_cache import DirectoryCache
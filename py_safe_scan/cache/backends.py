@@ -0,0 +1,365 @@
+"""缓存存储后端 - 每键一个文件，或单文件SQLite键值库"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """缓存存储后端基类
+
+    后端只负责按键哈希存取字节串，序列化、内存层和TTL策略由 CacheManager 负责。
+    """
+
+    @abstractmethod
+    def get(self, key_hash: str) -> Optional[Tuple[bytes, float]]:
+        """
+        读取条目并记录最近使用时间
+
+        Returns:
+            (数据, 写入时间)，不存在返回None
+        """
+
+    def put(self, key_hash: str, data: bytes):
+        """写入一个条目"""
+        self.put_many([(key_hash, data)])
+
+    @abstractmethod
+    def put_many(self, items: Iterable[Tuple[str, bytes]]):
+        """批量写入条目"""
+
+    @abstractmethod
+    def contains(self, key_hash: str, min_created: float = 0) -> bool:
+        """条目是否存在且写入时间不早于 min_created"""
+
+    @abstractmethod
+    def delete(self, key_hash: str):
+        """删除一个条目"""
+
+    @abstractmethod
+    def clear(self):
+        """删除所有条目"""
+
+    @abstractmethod
+    def expire(self, before: float) -> int:
+        """删除写入时间早于 before 的条目，返回删除条数"""
+
+    @abstractmethod
+    def evict(self, max_bytes: int, keep: str = None) -> int:
+        """按最近使用时间淘汰条目直到总大小不超过 max_bytes，返回淘汰条数"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """返回 {"entries": 条目数, "bytes": 总字节数}"""
+
+    def close(self):
+        """释放后端资源"""
+
+
+class FileBackend(CacheBackend):
+    """每个键一个 <sha256>.cache 文件（原有存储格式）
+
+    mtime 为写入时间（用于TTL），atime 为最近使用时间（用于LRU）。
+    """
+
+    SUFFIX = ".cache"
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # 磁盘占用只在启动时统计一次，之后增量维护
+        self._bytes = sum(f.stat().st_size for f in self._files())
+
+    def _files(self):
+        return self.cache_dir.glob(f"*{self.SUFFIX}")
+
+    def _path(self, key_hash: str) -> Path:
+        return self.cache_dir / f"{key_hash}{self.SUFFIX}"
+
+    def get(self, key_hash: str) -> Optional[Tuple[bytes, float]]:
+        path = self._path(key_hash)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            mtime = path.stat().st_mtime
+            os.utime(path, (time.time(), mtime))
+        except FileNotFoundError:
+            return None
+        return data, mtime
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]):
+        with self._lock:
+            for key_hash, data in items:
+                path = self._path(key_hash)
+                old_size = path.stat().st_size if path.exists() else 0
+                tmp_path = path.with_suffix(".tmp")
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._bytes += len(data) - old_size
+
+    def contains(self, key_hash: str, min_created: float = 0) -> bool:
+        try:
+            return self._path(key_hash).stat().st_mtime >= min_created
+        except FileNotFoundError:
+            return False
+
+    def _remove(self, path: Path) -> bool:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return False
+        self._bytes -= size
+        return True
+
+    def delete(self, key_hash: str):
+        with self._lock:
+            self._remove(self._path(key_hash))
+
+    def clear(self):
+        with self._lock:
+            for path in self._files():
+                self._remove(path)
+            self._bytes = 0
+
+    def expire(self, before: float) -> int:
+        removed = 0
+        with self._lock:
+            for path in self._files():
+                try:
+                    expired = path.stat().st_mtime < before
+                except FileNotFoundError:
+                    continue
+                if expired and self._remove(path):
+                    removed += 1
+        return removed
+
+    def evict(self, max_bytes: int, keep: str = None) -> int:
+        with self._lock:
+            if self._bytes <= max_bytes:
+                return 0
+            keep_path = self._path(keep) if keep else None
+            entries = []
+            for path in self._files():
+                if path == keep_path:
+                    continue
+                try:
+                    entries.append((path.stat().st_atime, path))
+                except FileNotFoundError:
+                    continue
+
+            evicted = 0
+            for _, path in sorted(entries):
+                if self._bytes <= max_bytes:
+                    break
+                if self._remove(path):
+                    evicted += 1
+            return evicted
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": sum(1 for _ in self._files()), "bytes": self._bytes}
+
+
+class SQLiteBackend(CacheBackend):
+    """单文件SQLite键值库
+
+    写入时间和最近使用时间都有索引，过期清理和LRU淘汰不需要遍历全部条目；
+    条目数和总字节数由触发器维护在 stats 表中，统计为O(1)。
+    读取时的最近使用时间先记在内存中，随下一次写事务批量落盘。
+    """
+
+    DB_FILE = "cache.sqlite3"
+    SCHEMA_VERSION = 1
+    TOUCH_FLUSH_THRESHOLD = 256
+
+    def __init__(self, cache_dir: Path, db_file: str = None):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / (db_file or self.DB_FILE)
+
+        self._lock = threading.Lock()
+        self._pending_touches: Dict[str, float] = {}
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, self.SCHEMA_VERSION):
+            raise Exception(f"缓存数据库版本不兼容: {version}（期望 {self.SCHEMA_VERSION}）")
+
+        with self._conn:
+            self._conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_created ON entries (created);
+                CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used);
+
+                CREATE TABLE IF NOT EXISTS stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    entries INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO stats (id, entries, bytes) VALUES (0, 0, 0);
+
+                CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+                    UPDATE stats SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0;
+                END;
+                CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+                    UPDATE stats SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0;
+                END;
+                CREATE TRIGGER IF NOT EXISTS entries_resize AFTER UPDATE OF size ON entries BEGIN
+                    UPDATE stats SET bytes = bytes - OLD.size + NEW.size WHERE id = 0;
+                END;
+
+                PRAGMA user_version = {self.SCHEMA_VERSION};
+            """)
+
+    def _flush_touches(self):
+        """把缓冲的最近使用时间写入数据库（需在事务内调用）"""
+        if self._pending_touches:
+            self._conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._pending_touches.items()]
+            )
+            self._pending_touches.clear()
+
+    def get(self, key_hash: str) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key_hash,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._pending_touches[key_hash] = time.time()
+            if len(self._pending_touches) >= self.TOUCH_FLUSH_THRESHOLD:
+                with self._conn:
+                    self._flush_touches()
+        return bytes(row[0]), row[1]
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]]):
+        now = time.time()
+        rows = [(key_hash, sqlite3.Binary(data), len(data), now, now) for key_hash, data in items]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """INSERT INTO entries (key, value, size, created, last_used) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (key) DO UPDATE SET
+                       value = excluded.value, size = excluded.size,
+                       created = excluded.created, last_used = excluded.last_used""",
+                rows
+            )
+            self._flush_touches()
+
+    def put_raw(self, rows: Iterable[Tuple[str, bytes, float, float]]) -> int:
+        """
+        按原始时间戳批量导入条目（迁移用），已存在的键不覆盖
+
+        Args:
+            rows: (键哈希, 数据, 写入时间, 最近使用时间)
+
+        Returns:
+            导入条数
+        """
+        count_sql = "SELECT entries FROM stats WHERE id = 0"
+        with self._lock, self._conn:
+            before = self._conn.execute(count_sql).fetchone()[0]
+            self._conn.executemany(
+                """INSERT OR IGNORE INTO entries (key, value, size, created, last_used)
+                   VALUES (?, ?, ?, ?, ?)""",
+                [(key, sqlite3.Binary(data), len(data), created, last_used)
+                 for key, data, created, last_used in rows]
+            )
+            return self._conn.execute(count_sql).fetchone()[0] - before
+
+    def contains(self, key_hash: str, min_created: float = 0) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM entries WHERE key = ? AND created >= ?", (key_hash, min_created)
+            ).fetchone()
+        return row is not None
+
+    def delete(self, key_hash: str):
+        with self._lock, self._conn:
+            self._pending_touches.pop(key_hash, None)
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key_hash,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._pending_touches.clear()
+            self._conn.execute("DELETE FROM entries")
+
+    def expire(self, before: float) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM entries WHERE created < ?", (before,))
+            return cursor.rowcount
+
+    def evict(self, max_bytes: int, keep: str = None) -> int:
+        with self._lock, self._conn:
+            self._flush_touches()
+            total = self._conn.execute("SELECT bytes FROM stats WHERE id = 0").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+
+            victims = []
+            for key, size in self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_used"
+            ):
+                if total <= max_bytes:
+                    break
+                if key == keep:
+                    continue
+                victims.append((key,))
+                total -= size
+
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+            return len(victims)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT entries, bytes FROM stats WHERE id = 0"
+            ).fetchone()
+        return {"entries": entries, "bytes": total}
+
+    def close(self):
+        with self._lock:
+            try:
+                with self._conn:
+                    self._flush_touches()
+                self._conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # 已关闭
+
+
+BACKENDS = {
+    "file": FileBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def get_backend(kind: str, cache_dir: Path) -> CacheBackend:
+    """
+    创建缓存存储后端
+
+    Args:
+        kind: 后端类型，"sqlite" 或 "file"
+        cache_dir: 缓存目录
+    """
+    if kind not in BACKENDS:
+        raise ValueError(f"未知的缓存后端: {kind}")
+    return BACKENDS[kind](cache_dir)
@@ -2,177 +2,301 @@
 
 import json
 import hashlib
-import pickle
 import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Dict, Optional, Tuple
 import time
 
 import config
+from py_safe_scan.cache.backends import CacheBackend, get_backend
+from py_safe_scan.cache.serializers import Serializer
 
 logger = logging.getLogger(__name__)
 
 
+class LRUMemoryCache:
+    """按条目数和字节数双重限制的LRU内存缓存"""
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None):
+        """
+        初始化内存缓存
+
+        Args:
+            max_entries: 最大条目数，None表示不限制
+            max_bytes: 最大字节数（按序列化大小估算），None表示不限制
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """返回 (是否命中, 值)，命中时移到最近使用端"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[0]
+
+    def put(self, key: str, value: Any, size: int):
+        """写入条目并按需淘汰最久未使用的条目"""
+        if self.max_bytes is not None and size > self.max_bytes:
+            # 单个条目超过内存预算，只保存在磁盘
+            self.pop(key)
+            return
+
+        self.pop(key)
+        self._entries[key] = (value, size)
+        self.total_bytes += size
+
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self.evictions += 1
+
+    def pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+
+
 class CacheManager:
-    """缓存管理器，用于缓存LLM调用结果"""
-    
-    def __init__(self, cache_dir: Path = None, ttl: int = None):
+    """缓存管理器，用于缓存LLM调用结果
+
+    两级缓存：内存层为有界LRU，持久层为可插拔的存储后端（默认单文件SQLite），
+    超出磁盘预算时按最近使用时间淘汰，超过TTL的条目读取时视为未命中。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = None,
+        ttl: int = None,
+        max_entries: int = None,
+        max_memory_bytes: int = None,
+        max_disk_bytes: int = None,
+        backend: CacheBackend = None,
+        serializer: Serializer = None
+    ):
         """
         初始化缓存管理器
-        
+
         Args:
             cache_dir: 缓存目录
-            ttl: 缓存生存时间（秒）
+            ttl: 缓存生存时间（秒），None 使用配置默认值
+            max_entries: 内存缓存最大条目数，None 使用配置默认值，0 表示不在内存中保留
+            max_memory_bytes: 内存缓存最大字节数，None 使用配置默认值
+            max_disk_bytes: 磁盘缓存最大字节数，None 使用配置默认值
+            backend: 存储后端，默认按 config.CACHE_BACKEND 创建
+            serializer: 条目序列化器，默认按 config.CACHE_SERIALIZER 创建
         """
         self.cache_dir = cache_dir or config.CACHE_DIR
-        self.ttl = ttl or config.CACHE_TTL
-        
+        self.ttl = ttl if ttl is not None else config.CACHE_TTL
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else config.CACHE_DISK_MAX_BYTES
+
         # 确保缓存目录存在
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        
+        self.backend = backend or get_backend(config.CACHE_BACKEND, self.cache_dir)
+        self.serializer = serializer or Serializer.from_config()
+
         # 内存缓存
-        self.memory_cache = {}
-        
-        logger.info(f"缓存目录: {self.cache_dir}, TTL: {self.ttl}秒")
-    
-    def _get_cache_path(self, key: str) -> Path:
-        """获取缓存文件路径"""
-        # 使用哈希作为文件名
-        hash_key = hashlib.sha256(key.encode()).hexdigest()
-        return self.cache_dir / f"{hash_key}.cache"
-    
-    def _is_expired(self, cache_path: Path) -> bool:
-        """检查缓存是否过期"""
-        if not cache_path.exists():
-            return True
-        
-        mtime = cache_path.stat().st_mtime
-        return (time.time() - mtime) > self.ttl
-    
+        self.memory_cache = LRUMemoryCache(
+            max_entries=max_entries if max_entries is not None else config.CACHE_MAX_SIZE,
+            max_bytes=max_memory_bytes if max_memory_bytes is not None else config.CACHE_MEMORY_MAX_BYTES
+        )
+        self._lock = threading.RLock()
+
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "rejected": 0,
+            "disk_evictions": 0
+        }
+
+        logger.info(f"缓存目录: {self.cache_dir}, 后端: {type(self.backend).__name__}, TTL: {self.ttl}秒")
+
+    @staticmethod
+    def _hash_key(key: str) -> str:
+        """持久层使用键的哈希"""
+        return hashlib.sha256(key.encode()).hexdigest()
+
     def get(self, key: str) -> Optional[Any]:
         """
         从缓存获取数据
-        
+
         Args:
             key: 缓存键
-            
+
         Returns:
             缓存的数据，如果不存在或过期则返回None
         """
-        # 先检查内存缓存
-        if key in self.memory_cache:
-            logger.debug(f"内存缓存命中: {key[:50]}...")
-            return self.memory_cache[key]
-        
-        # 检查文件缓存
-        cache_path = self._get_cache_path(key)
-        
-        if cache_path.exists() and not self._is_expired(cache_path):
+        with self._lock:
+            # 先检查内存缓存
+            hit, value = self.memory_cache.get(key)
+            if hit:
+                self.counters["memory_hits"] += 1
+                logger.debug(f"内存缓存命中: {key[:50]}...")
+                return value
+
+            # 检查持久层
+            key_hash = self._hash_key(key)
             try:
-                with open(cache_path, 'rb') as f:
-                    data = pickle.load(f)
-                
-                # 存入内存缓存
-                self.memory_cache[key] = data
-                
-                logger.debug(f"文件缓存命中: {cache_path.name}")
-                return data
-                
+                entry = self.backend.get(key_hash)
+                if entry is not None:
+                    raw, created = entry
+                    if time.time() - created > self.ttl:
+                        self.counters["expired"] += 1
+                        self.backend.delete(key_hash)
+                    else:
+                        data = self.serializer.loads(raw)
+
+                        # 存入内存缓存
+                        self.memory_cache.put(key, data, len(raw))
+                        self.counters["disk_hits"] += 1
+
+                        logger.debug(f"持久缓存命中: {key_hash[:16]}")
+                        return data
+            except ValueError as e:
+                # 旧格式、未启用的pickle或缺少解压库：按未命中处理，条目留给下次写入覆盖
+                # （共享缓存卷上其它机器可能仍能读取）
+                self.counters["rejected"] += 1
+                logger.debug(f"缓存条目被拒绝: {e}")
             except Exception as e:
                 logger.error(f"读取缓存失败: {e}")
                 return None
-        
-        logger.debug(f"缓存未命中: {key[:50]}...")
-        return None
-    
+
+            self.counters["misses"] += 1
+            logger.debug(f"缓存未命中: {key[:50]}...")
+            return None
+
     def set(self, key: str, value: Any) -> bool:
         """
         设置缓存
-        
+
         Args:
             key: 缓存键
             value: 要缓存的数据
-            
+
         Returns:
             是否成功
         """
-        # 存入内存缓存
-        self.memory_cache[key] = value
-        
-        # 存入文件缓存
-        cache_path = self._get_cache_path(key)
-        
-        try:
-            with open(cache_path, 'wb') as f:
-                pickle.dump(value, f)
-            
-            logger.debug(f"缓存已保存: {cache_path.name}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"保存缓存失败: {e}")
-            return False
-    
+        return self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]) -> bool:
+        """
+        批量设置缓存（持久层在一个事务中写入），无法序列化的条目跳过，其余照常写入
+
+        Args:
+            items: {缓存键: 数据}
+
+        Returns:
+            是否全部成功
+        """
+        encoded = []
+        for key, value in items.items():
+            try:
+                encoded.append((key, value, self.serializer.dumps(value)))
+            except Exception as e:
+                logger.error(f"保存缓存失败: {key}: {e}")
+        skipped = len(items) - len(encoded)
+
+        with self._lock:
+            for key, value, raw in encoded:
+                # 存入内存缓存
+                self.memory_cache.put(key, value, len(raw))
+
+            try:
+                self.backend.put_many((self._hash_key(key), raw) for key, _, raw in encoded)
+                logger.debug(f"缓存已保存: {len(encoded)} 条")
+            except Exception as e:
+                logger.error(f"保存缓存失败: {e}")
+                return False
+
+            if self.max_disk_bytes is not None and encoded:
+                evicted = self.backend.evict(self.max_disk_bytes, keep=self._hash_key(encoded[-1][0]))
+                if evicted:
+                    self.counters["disk_evictions"] += evicted
+                    logger.info(f"磁盘缓存超出预算，已淘汰 {evicted} 个条目")
+            return skipped == 0
+
     def exists(self, key: str) -> bool:
         """检查缓存是否存在且未过期"""
         # 检查内存缓存
         if key in self.memory_cache:
             return True
-        
-        # 检查文件缓存
-        cache_path = self._get_cache_path(key)
-        return cache_path.exists() and not self._is_expired(cache_path)
-    
+
+        # 检查持久层
+        return self.backend.contains(self._hash_key(key), min_created=time.time() - self.ttl)
+
     def clear(self, key: Optional[str] = None):
         """
         清除缓存
-        
+
         Args:
             key: 要清除的键，None表示清除所有
         """
-        if key:
-            # 清除指定键
-            if key in self.memory_cache:
-                del self.memory_cache[key]
-            
-            cache_path = self._get_cache_path(key)
-            if cache_path.exists():
-                cache_path.unlink()
-                logger.info(f"缓存已清除: {cache_path.name}")
-        else:
-            # 清除所有
-            self.memory_cache.clear()
-            
-            for cache_file in self.cache_dir.glob("*.cache"):
-                cache_file.unlink()
-            
-            logger.info("所有缓存已清除")
-    
+        with self._lock:
+            if key:
+                # 清除指定键
+                self.memory_cache.pop(key)
+                self.backend.delete(self._hash_key(key))
+                logger.info(f"缓存已清除: {key[:50]}")
+            else:
+                # 清除所有
+                self.memory_cache.clear()
+                self.backend.clear()
+
+                logger.info("所有缓存已清除")
+
     def cleanup_expired(self):
         """清理过期缓存"""
-        expired_count = 0
-        
-        for cache_file in self.cache_dir.glob("*.cache"):
-            if self._is_expired(cache_file):
-                cache_file.unlink()
-                expired_count += 1
-        
+        with self._lock:
+            expired_count = self.backend.expire(time.time() - self.ttl)
+
         if expired_count > 0:
-            logger.info(f"已清理 {expired_count} 个过期缓存文件")
-    
+            logger.info(f"已清理 {expired_count} 个过期缓存条目")
+
+    def close(self):
+        """关闭存储后端"""
+        self.backend.close()
+
     def get_stats(self) -> dict:
         """获取缓存统计信息"""
-        cache_files = list(self.cache_dir.glob("*.cache"))
-        
-        total_size = 0
-        for f in cache_files:
-            total_size += f.stat().st_size
-        
+        backend_stats = self.backend.stats()
+        total_size = backend_stats["bytes"]
+
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+
         return {
             "cache_dir": str(self.cache_dir),
-            "file_count": len(cache_files),
+            "backend": type(self.backend).__name__,
+            "serializer": f"{self.serializer.codec}+{self.serializer.compression}",
+            "entry_count": backend_stats["entries"],
             "total_size_bytes": total_size,
             "total_size_mb": total_size / (1024 * 1024),
+            "max_disk_bytes": self.max_disk_bytes,
             "memory_cache_entries": len(self.memory_cache),
+            "memory_cache_bytes": self.memory_cache.total_bytes,
+            "memory_evictions": self.memory_cache.evictions,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            **self.counters,
             "ttl_seconds": self.ttl
         }
@@ -0,0 +1,171 @@
+"""目录缓存 - 按内容哈希寻址的目录级LRU缓存（CodeQL数据库等）"""
+
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryCache:
+    """按内容哈希寻址的目录缓存，超出磁盘预算时按LRU淘汰"""
+
+    INDEX_FILE = "cache_index.json"
+
+    def __init__(self, root_dir: Path, max_bytes: int = None, suffix: str = ""):
+        """
+        初始化目录缓存
+
+        Args:
+            root_dir: 缓存根目录
+            max_bytes: 磁盘预算（字节），None表示不限制
+            suffix: 缓存目录名后缀（如 ".db"）
+        """
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+
+        self.index_path = self.root_dir / self.INDEX_FILE
+        self.index: Dict[str, Dict] = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """加载缓存索引"""
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"缓存索引损坏，已重置: {e}")
+            return {}
+
+    def _save_index(self):
+        """原子写入缓存索引"""
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def path_for(self, key: str) -> Path:
+        """获取缓存键对应的目录路径"""
+        return self.root_dir / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[Path]:
+        """
+        查找缓存目录
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            命中时返回目录路径并刷新访问时间，否则返回None
+        """
+        entry = self.index.get(key)
+        path = self.path_for(key)
+
+        if entry is None:
+            return None
+
+        if not path.exists():
+            # 目录被外部删除，清理索引
+            del self.index[key]
+            self._save_index()
+            return None
+
+        entry["last_used"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        self._save_index()
+        return path
+
+    def put(self, key: str, metadata: Dict = None) -> Path:
+        """
+        登记已写入 path_for(key) 的目录，并按预算淘汰旧条目
+
+        Args:
+            key: 缓存键
+            metadata: 附加信息（写入索引）
+
+        Returns:
+            缓存目录路径
+        """
+        path = self.path_for(key)
+        now = time.time()
+
+        self.index[key] = {
+            "size": self._dir_size(path),
+            "created": now,
+            "last_used": now,
+            "hits": 0,
+            **(metadata or {})
+        }
+
+        self.evict(keep=key)
+        self._save_index()
+        return path
+
+    def remove(self, key: str):
+        """删除缓存条目及其目录"""
+        self.index.pop(key, None)
+        shutil.rmtree(self.path_for(key), ignore_errors=True)
+
+    def evict(self, keep: str = None) -> int:
+        """
+        按LRU淘汰条目直到满足磁盘预算
+
+        Args:
+            keep: 不参与淘汰的键（通常是刚写入的条目）
+
+        Returns:
+            淘汰的条目数
+        """
+        if self.max_bytes is None:
+            return 0
+
+        evicted = 0
+        total = self.total_bytes()
+        candidates = sorted(
+            (k for k in self.index if k != keep),
+            key=lambda k: self.index[k].get("last_used", 0)
+        )
+
+        for key in candidates:
+            if total <= self.max_bytes:
+                break
+            total -= self.index[key].get("size", 0)
+            logger.info(f"缓存超出预算，淘汰: {self.path_for(key).name}")
+            self.remove(key)
+            evicted += 1
+
+        return evicted
+
+    def total_bytes(self) -> int:
+        """缓存总大小（字节）"""
+        return sum(entry.get("size", 0) for entry in self.index.values())
+
+    def get_stats(self) -> dict:
+        """获取缓存统计信息"""
+        total = self.total_bytes()
+        return {
+            "cache_dir": str(self.root_dir),
+            "entries": len(self.index),
+            "total_size_bytes": total,
+            "total_size_mb": total / (1024 * 1024),
+            "max_bytes": self.max_bytes
+        }
+
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        """统计目录大小"""
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                try:
+                    total += os.lstat(os.path.join(dirpath, name)).st_size
+                except OSError:
+                    pass
+        return total
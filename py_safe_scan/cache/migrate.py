@@ -0,0 +1,94 @@
+"""缓存迁移工具 - 把旧的 <sha256>.cache 文件导入SQLite缓存后端
+
+旧文件是本机写入的pickle，迁移时加载一次并按当前序列化格式重新编码。
+只应对自己生成的缓存目录运行。
+
+用法:
+    python -m py_safe_scan.cache.migrate [--cache-dir DIR] [--remove]
+"""
+
+import argparse
+import logging
+import pickle
+from pathlib import Path
+from typing import Dict
+
+import config
+from py_safe_scan.cache.backends import FileBackend, SQLiteBackend
+from py_safe_scan.cache.serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_file_cache(cache_dir: Path, backend: SQLiteBackend = None,
+                       remove: bool = False, batch_size: int = 500,
+                       serializer: Serializer = None) -> Dict[str, int]:
+    """
+    导入目录下的 .cache 文件
+
+    文件名（去掉后缀）即键哈希，写入时间取 mtime，最近使用时间取 atime。
+    已存在于目标库中的键不覆盖，无法按当前格式编码的条目跳过。
+
+    Args:
+        cache_dir: 旧缓存目录
+        backend: 目标SQLite后端，None表示在同一目录下创建
+        remove: 导入后删除旧文件
+        batch_size: 每个事务导入的文件数
+        serializer: 目标序列化器，None表示按配置创建
+
+    Returns:
+        {"scanned": 扫描文件数, "imported": 导入条数, "skipped": 跳过条数, "removed": 删除文件数}
+    """
+    backend = backend or SQLiteBackend(cache_dir)
+    serializer = serializer or Serializer.from_config()
+    result = {"scanned": 0, "imported": 0, "skipped": 0, "removed": 0}
+
+    batch = []
+    paths = []
+
+    def flush():
+        result["imported"] += backend.put_raw(batch)
+        if remove:
+            for path in paths:
+                path.unlink()
+                result["removed"] += 1
+        batch.clear()
+        paths.clear()
+
+    for path in sorted(cache_dir.glob(f"*{FileBackend.SUFFIX}")):
+        stat = path.stat()
+        result["scanned"] += 1
+        try:
+            data = serializer.dumps(pickle.loads(path.read_bytes()))
+        except Exception as e:
+            logger.warning(f"跳过无法迁移的缓存文件 {path.name}: {e}")
+            result["skipped"] += 1
+            continue
+        batch.append((path.stem, data, stat.st_mtime, stat.st_atime))
+        paths.append(path)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    logger.info(f"缓存迁移完成: 扫描 {result['scanned']} 个文件, 导入 {result['imported']} 条, "
+                f"跳过 {result['skipped']} 条, 删除 {result['removed']} 个文件")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把 .cache 文件缓存迁移到SQLite后端")
+    parser.add_argument("--cache-dir", type=str, default=str(config.CACHE_DIR), help="缓存目录")
+    parser.add_argument("--remove", action="store_true", help="导入后删除旧的 .cache 文件")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    backend = SQLiteBackend(Path(args.cache_dir))
+    try:
+        result = migrate_file_cache(Path(args.cache_dir), backend, remove=args.remove)
+    finally:
+        backend.close()
+    print(f"导入 {result['imported']}/{result['scanned']} 条缓存")
+
+
+if __name__ == "__main__":
+    main()
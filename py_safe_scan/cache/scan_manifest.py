@@ -0,0 +1,129 @@
+"""扫描清单 - 记录上次扫描的文件哈希、规范推断和路径验证结果，支持增量扫描"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Set
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class ScanManifest:
+    """单个扫描目标（目录 + CWE）的扫描清单"""
+
+    VERSION = 1
+
+    # 需要复用的LLM分类字段
+    SPEC_FIELDS = ("llm_label", "llm_confidence", "sink_args", "explanation")
+
+    def __init__(self, manifest_path: Path, data: Dict = None):
+        """
+        初始化扫描清单
+
+        Args:
+            manifest_path: 清单文件路径
+            data: 清单内容
+        """
+        self.manifest_path = manifest_path
+        data = data or {}
+        self.files: Dict[str, str] = data.get("files", {})
+        self.specs: Dict[str, Dict] = data.get("specs", {})
+        self.verdicts: Dict[str, Dict] = data.get("verdicts", {})
+
+    @classmethod
+    def load(cls, target: Path, cwe_type: str = None, manifest_dir: Path = None) -> "ScanManifest":
+        """
+        加载扫描目标的清单，不存在或版本不符时返回空清单
+
+        Args:
+            target: 扫描目标目录
+            cwe_type: CWE类型
+            manifest_dir: 清单目录
+        """
+        manifest_dir = manifest_dir or config.CODEQL_WORKSPACE / "manifests"
+        target_id = f"{Path(target).resolve()}|{cwe_type or 'all'}"
+        name = hashlib.sha256(target_id.encode('utf-8')).hexdigest()[:24]
+        manifest_path = manifest_dir / f"{name}.json"
+
+        if not manifest_path.exists():
+            return cls(manifest_path)
+
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"扫描清单读取失败，将全量扫描: {e}")
+            return cls(manifest_path)
+
+        if data.get("version") != cls.VERSION:
+            logger.info("扫描清单版本不匹配，将全量扫描")
+            return cls(manifest_path)
+
+        return cls(manifest_path, data)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.files
+
+    def diff(self, file_hashes: Dict[str, str]) -> Set[str]:
+        """
+        对比当前文件哈希与上次扫描
+
+        Args:
+            file_hashes: {相对路径: 哈希}
+
+        Returns:
+            新增、修改或删除的文件集合
+        """
+        changed = {path for path, digest in file_hashes.items() if self.files.get(path) != digest}
+        removed = set(self.files) - set(file_hashes)
+        return changed | removed
+
+    @staticmethod
+    def api_key(api: Dict) -> str:
+        """候选API在清单中的键（文件未变化时行号稳定）"""
+        return f"{api.get('file', '')}:{api.get('line', 0)}:{api.get('class') or ''}.{api.get('method', '')}"
+
+    def reusable_specs(self, unchanged_files: Set[str]) -> Dict[str, Dict]:
+        """返回未变化文件中可复用的规范推断结果"""
+        return {
+            key: spec for key, spec in self.specs.items()
+            if spec.get("file") in unchanged_files
+        }
+
+    def reusable_verdicts(self, unchanged_files: Set[str]) -> Dict[str, Dict]:
+        """返回涉及文件全部未变化的路径验证结果"""
+        return {
+            key: verdict for key, verdict in self.verdicts.items()
+            if verdict.get("files") and set(verdict["files"]) <= unchanged_files
+        }
+
+    def update(self, file_hashes: Dict[str, str], apis: Iterable[Dict], verdicts: Dict[str, Dict]):
+        """用本次扫描结果覆盖清单内容"""
+        self.files = dict(file_hashes)
+        self.specs = {}
+        for api in apis:
+            if api.get("llm_label") in (None, "unknown"):
+                continue
+            spec = {field: api.get(field) for field in self.SPEC_FIELDS}
+            spec["file"] = api.get("file", "")
+            self.specs[self.api_key(api)] = spec
+        self.verdicts = {key: value for key, value in verdicts.items() if value.get("files")}
+
+    def save(self):
+        """原子写入清单文件"""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": self.VERSION,
+                "files": self.files,
+                "specs": self.specs,
+                "verdicts": self.verdicts
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+        logger.info(f"扫描清单已保存: {self.manifest_path}")
@@ -0,0 +1,161 @@
+"""缓存序列化 - 带版本头的JSON编码与可选压缩
+
+条目格式: MAGIC(4) + 格式版本(1) + 编码(1) + 压缩(1) + 负载
+读取时先校验头部，旧格式或未知编码直接拒绝，不会进入反序列化。
+"""
+
+import json
+import logging
+import pickle
+import zlib
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，回退到标准库json
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC = b"PSSC"
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+# 编码与压缩方式写入条目头部，取值不可更改
+CODECS = {"json": 1, "pickle": 2}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+
+def available_compressions() -> list:
+    """当前环境可用的压缩方式（按优先级）"""
+    names = []
+    if zstandard is not None:
+        names.append("zstd")
+    if lz4_frame is not None:
+        names.append("lz4")
+    names.append("zlib")
+    return names
+
+
+class Serializer:
+    """缓存条目序列化器
+
+    默认使用JSON（有orjson时用orjson，两者输出可互相读取），
+    pickle只在显式启用时可用，用于共享缓存目录时避免加载不可信的pickle。
+    """
+
+    def __init__(self, codec: str = "json", compression: str = "auto",
+                 allow_pickle: bool = False, min_compress_size: int = 1024):
+        """
+        初始化序列化器
+
+        Args:
+            codec: 编码方式，"json" 或 "pickle"
+            compression: 压缩方式，"auto"、"none"、"zlib"、"zstd" 或 "lz4"
+            allow_pickle: 是否允许读写pickle条目
+            min_compress_size: 小于该字节数的负载不压缩
+        """
+        if codec not in CODECS:
+            raise ValueError(f"未知的缓存编码: {codec}")
+        if codec == "pickle" and not allow_pickle:
+            raise ValueError("pickle编码需要显式启用 allow_pickle")
+        if compression == "auto":
+            compression = available_compressions()[0]
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"未知的压缩方式: {compression}")
+        if compression not in available_compressions() + ["none"]:
+            logger.warning(f"压缩库 {compression} 未安装，回退到zlib")
+            compression = "zlib"
+
+        self.codec = codec
+        self.compression = compression
+        self.allow_pickle = allow_pickle
+        self.min_compress_size = min_compress_size
+
+    @classmethod
+    def from_config(cls) -> "Serializer":
+        """按配置创建序列化器"""
+        import config
+        return cls(
+            codec=config.CACHE_SERIALIZER,
+            compression=config.CACHE_COMPRESSION,
+            allow_pickle=config.CACHE_ALLOW_PICKLE
+        )
+
+    def dumps(self, value: Any) -> bytes:
+        """序列化为带头部的字节串，无法编码时抛出 ValueError"""
+        payload = self._encode(value)
+
+        compression = self.compression
+        if len(payload) < self.min_compress_size:
+            compression = "none"
+        payload = self._compress(payload, compression)
+
+        header = MAGIC + bytes((FORMAT_VERSION, CODECS[self.codec], COMPRESSIONS[compression]))
+        return header + payload
+
+    def loads(self, data: bytes) -> Any:
+        """反序列化，头部不匹配或格式不受支持时抛出 ValueError"""
+        if len(data) < HEADER_SIZE or data[:len(MAGIC)] != MAGIC:
+            raise ValueError("缓存条目格式无法识别")
+
+        version, codec_id, compression_id = data[len(MAGIC):HEADER_SIZE]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"缓存条目格式版本不匹配: {version}")
+        if codec_id == CODECS["pickle"] and not self.allow_pickle:
+            raise ValueError("拒绝加载pickle缓存条目（未启用 allow_pickle）")
+
+        payload = self._decompress(data[HEADER_SIZE:], compression_id)
+
+        if codec_id == CODECS["json"]:
+            return orjson.loads(payload) if orjson is not None else json.loads(payload)
+        if codec_id == CODECS["pickle"]:
+            return pickle.loads(payload)
+        raise ValueError(f"未知的缓存编码: {codec_id}")
+
+    def _encode(self, value: Any) -> bytes:
+        if self.codec == "pickle":
+            return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            if orjson is not None:
+                return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+            return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+        except TypeError as e:
+            raise ValueError(f"无法编码为JSON: {e}")
+
+    @staticmethod
+    def _compress(payload: bytes, compression: str) -> bytes:
+        if compression == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(payload)
+        if compression == "lz4":
+            return lz4_frame.compress(payload)
+        if compression == "zlib":
+            return zlib.compress(payload, 6)
+        return payload
+
+    @staticmethod
+    def _decompress(payload: bytes, compression_id: int) -> bytes:
+        if compression_id == COMPRESSIONS["none"]:
+            return payload
+        if compression_id == COMPRESSIONS["zlib"]:
+            return zlib.decompress(payload)
+        if compression_id == COMPRESSIONS["zstd"]:
+            if zstandard is None:
+                raise ValueError("条目使用zstd压缩，但未安装zstandard")
+            return zstandard.ZstdDecompressor().decompress(payload)
+        if compression_id == COMPRESSIONS["lz4"]:
+            if lz4_frame is None:
+                raise ValueError("条目使用lz4压缩，但未安装lz4")
+            return lz4_frame.decompress(payload)
+        raise ValueError(f"未知的压缩方式: {compression_id}")
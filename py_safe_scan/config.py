@@ -11,11 +11,17 @@ CACHE_DIR = BASE_DIR / "cache"
 CACHE_DIR.mkdir(exist_ok=True)
 LOG_DIR = BASE_DIR / "logs"
 LOG_DIR.mkdir(exist_ok=True)
+SCAN_CONFIG_FILE = BASE_DIR.parent / "configs" / "default.yaml"
 
 # ============ CodeQL配置 ============
 CODEQL_PATH = os.environ.get("CODEQL_PATH", "codeql")
 CODEQL_WORKSPACE = BASE_DIR / ".codeql_workspace"
 CODEQL_WORKSPACE.mkdir(exist_ok=True)
+CODEQL_BACKEND = os.environ.get("CODEQL_BACKEND", "cli-server")
+CODEQL_DB_CACHE_ENABLED = True
+CODEQL_DB_CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024  # 10GB
+QUERY_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+API_EXTRACT_QUERY = BASE_DIR.parent / "queries" / "extract_api_calls.ql"
 
 # ============ DeepSeek API配置 ============
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY", "")
@@ -30,7 +36,15 @@ REQUEST_TIMEOUT = 60
 
 # ============ 缓存配置 ============
 CACHE_TTL = 7 * 24 * 60 * 60  # 7天
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite")  # "sqlite" | "file"
+CACHE_SERIALIZER = "json"  # "json" | "pickle"
+CACHE_COMPRESSION = "auto"  # "auto" | "none" | "zlib" | "zstd" | "lz4"
+CACHE_ALLOW_PICKLE = False
 CACHE_MAX_SIZE = 1000
+CACHE_MEMORY_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+CACHE_DISK_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
+LABEL_STORE_ENABLED = True
+LABEL_STORE_PATH = CACHE_DIR / "api_labels.sqlite3"
 
 # ============ 支持的CWE类型 ============
 SUPPORTED_CWES = [
@@ -79,6 +93,7 @@ IRIS_CONFIG = {
     "FILTER_TEST_LIBRARIES": True,
     "MAX_EXTERNAL_APIS": 500,
     "MAX_INTERNAL_FUNCTIONS": 200,
+    "API_CONTEXT_SAMPLES": 3,
     
     # 阶段2: LLM规范推断配置（增强版）
     "SPEC_INFERENCE_BATCH_SIZE": 20,
@@ -103,6 +118,11 @@ IRIS_CONFIG = {
     "CONTEXT_LINES": 5,
     "ENABLE_SANITIZER_DETECTION": True,
     "MIN_PATH_LENGTH": 2,
+    "VALIDATION_WORKERS": 4,
+    "VALIDATION_TIMEOUT": 60,
+    "PERSIST_VERDICTS": True,
+    "PATH_SLICING": True,
+    "SLICE_TOKEN_BUDGET": 1200,
     
     # CWE特定阈值
     "CWE_THRESHOLDS": {
@@ -130,4 +150,9 @@ PERFORMANCE_CONFIG = {
     "ENABLE_PARALLEL": True,
     "MAX_WORKERS": 4,
     "ENABLE_STREAMING": False,
+    "LLM_RATE_LIMIT": 5.0,
+    "LLM_MAX_RETRIES": 5,
+    "CACHE_LLM_RESPONSES": True,
+    "DISCOVERY_WORKERS": 8,
+    "AST_JOBS": 1,
 }
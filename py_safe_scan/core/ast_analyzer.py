@@ -1,9 +1,24 @@
 """AST分析器 - 提取API调用和函数参数"""
 
+import argparse
 import ast
+import hashlib
+import json
 import logging
+import os
+from sys import intern
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import List, Dict, Set, Tuple, Optional, Any, Union
+from typing import List, Dict, Iterator, Set, Tuple, Optional, Any, Union
+
+import config
+from py_safe_scan.cache.cache_manager import CacheManager
+from py_safe_scan.core.records import (
+    ArgRecord, CallRecord, FileResult, FunctionRecord, KeywordRecord, ParamRecord, StringRecord
+)
+from py_safe_scan.utils.file_discovery import discover_python_files
+from py_safe_scan.utils.file_utils import FileUtils
 
 logger = logging.getLogger(__name__)
 
@@ -20,13 +35,14 @@ class ASTAnalyzer(ast.NodeVisitor):
             internal_packages: 内部包名集合
         """
         self.file_path = file_path
+        self.file = intern(str(file_path))  # 所有记录共享的路径字符串
         self.internal_packages = internal_packages or set()
         
         # 提取结果
-        self.external_api_calls: List[Dict] = []  # 外部API调用
-        self.internal_functions: List[Dict] = []  # 内部函数定义
-        self.imports: Dict[str, str] = {}          # 导入映射: alias -> full_name
-        self.string_literals: List[Dict] = []      # 字符串常量
+        self.external_api_calls: List[CallRecord] = []    # 外部API调用
+        self.internal_functions: List[FunctionRecord] = []  # 内部函数定义
+        self.imports: Dict[str, str] = {}                  # 导入映射: alias -> full_name
+        self.string_literals: List[StringRecord] = []      # 字符串常量
         
         # 当前上下文
         self.current_class = None
@@ -41,17 +57,13 @@ class ASTAnalyzer(ast.NodeVisitor):
             'sum', 'min', 'max', 'abs', 'round', 'sorted', 'reversed'
         }
         
-    def analyze(self) -> Dict:
+    def analyze(self) -> FileResult:
         """
         分析文件，提取API调用和函数参数
         
         Returns:
-            {
-                "external_apis": [...],  # 外部API调用
-                "internal_functions": [...] # 内部函数参数
-                "string_literals": [...]    # 字符串常量
-                "file": "path/to/file.py"
-            }
+            FileResult（external_apis / internal_functions / string_literals，
+            需要字典时调用 to_dict()）
         """
         try:
             with open(self.file_path, 'r', encoding='utf-8') as f:
@@ -60,40 +72,17 @@ class ASTAnalyzer(ast.NodeVisitor):
             tree = ast.parse(content)
             self.visit(tree)
             
-            return {
-                "external_apis": self.external_api_calls,
-                "internal_functions": self.internal_functions,
-                "string_literals": self.string_literals,
-                "file": str(self.file_path)
-            }
+            return FileResult(self.file, self.external_api_calls, self.internal_functions, self.string_literals)
             
         except SyntaxError as e:
             logger.error(f"语法错误 {self.file_path}: {e}")
-            return {
-                "external_apis": [], 
-                "internal_functions": [],
-                "string_literals": [],
-                "file": str(self.file_path),
-                "error": str(e)
-            }
+            return FileResult(self.file, error=str(e))
         except UnicodeDecodeError as e:
             logger.error(f"编码错误 {self.file_path}: {e}")
-            return {
-                "external_apis": [], 
-                "internal_functions": [],
-                "string_literals": [],
-                "file": str(self.file_path),
-                "error": str(e)
-            }
+            return FileResult(self.file, error=str(e))
         except Exception as e:
             logger.error(f"分析失败 {self.file_path}: {e}")
-            return {
-                "external_apis": [], 
-                "internal_functions": [],
-                "string_literals": [],
-                "file": str(self.file_path),
-                "error": str(e)
-            }
+            return FileResult(self.file, error=str(e))
     
     def visit_Import(self, node: ast.Import):
         """处理 import x"""
@@ -148,59 +137,29 @@ class ASTAnalyzer(ast.NodeVisitor):
         logger.debug(f"处理函数: {node.name}")
         
         # 记录内部函数参数
-        func_info = {
-            "name": node.name,
-            "line": node.lineno,
-            "params": [],
-            "class": self.current_class,
-            "file": str(self.file_path),
-            "decorators": self._get_decorator_names(node.decorator_list)
-        }
-        
-        # 提取参数
         args = node.args
-        pos_args = args.args
-        kw_args = args.kwarg
-        var_args = args.vararg
+        params = []
         
         # 位置参数
-        for arg in pos_args:
-            param_info = {
-                "name": arg.arg,
-                "line": node.lineno,
-                "type": self._get_annotation_name(arg.annotation) if arg.annotation else None,
-                "function": node.name,
-                "class": self.current_class,
-                "file": str(self.file_path),
-                "kind": "positional"
-            }
-            func_info["params"].append(param_info)
+        for arg in args.args:
+            params.append(self._param_record(arg, node, "positional"))
         
         # 可变参数 (*args)
-        if var_args:
-            param_info = {
-                "name": var_args.arg,
-                "line": node.lineno,
-                "type": self._get_annotation_name(var_args.annotation) if var_args.annotation else None,
-                "function": node.name,
-                "class": self.current_class,
-                "file": str(self.file_path),
-                "kind": "varargs"
-            }
-            func_info["params"].append(param_info)
+        if args.vararg:
+            params.append(self._param_record(args.vararg, node, "varargs"))
         
         # 关键字参数 (**kwargs)
-        if kw_args:
-            param_info = {
-                "name": kw_args.arg,
-                "line": node.lineno,
-                "type": self._get_annotation_name(kw_args.annotation) if kw_args.annotation else None,
-                "function": node.name,
-                "class": self.current_class,
-                "file": str(self.file_path),
-                "kind": "kwargs"
-            }
-            func_info["params"].append(param_info)
+        if args.kwarg:
+            params.append(self._param_record(args.kwarg, node, "kwargs"))
+        
+        func_info = FunctionRecord(
+            name=node.name,
+            line=node.lineno,
+            params=params,
+            class_name=self.current_class,
+            file=self.file,
+            decorators=self._get_decorator_names(node.decorator_list)
+        )
         
         self.internal_functions.append(func_info)
         
@@ -208,6 +167,18 @@ class ASTAnalyzer(ast.NodeVisitor):
         self.generic_visit(node)
         self.current_function = old_function
     
+    def _param_record(self, arg: ast.arg, node, kind: str) -> ParamRecord:
+        """函数参数记录"""
+        return ParamRecord(
+            name=arg.arg,
+            line=node.lineno,
+            type=self._get_annotation_name(arg.annotation) if arg.annotation else None,
+            function=node.name,
+            class_name=self.current_class,
+            file=self.file,
+            kind=kind
+        )
+    
     def visit_Call(self, node: ast.Call):
         """处理函数调用"""
         self.current_line = node.lineno
@@ -219,35 +190,25 @@ class ASTAnalyzer(ast.NodeVisitor):
             # 判断是外部API还是内部函数
             if self._is_external_api(func_info["full_name"]):
                 # 外部API调用
-                call_info = {
-                    "package": func_info["package"],
-                    "class": func_info["class"],
-                    "method": func_info["method"],
-                    "full_name": func_info["full_name"],
-                    "line": node.lineno,
-                    "args": [],
-                    "keywords": [],
-                    "file": str(self.file_path),
-                    "code": self._get_code_snippet(node),
-                    "context": {
-                        "function": self.current_function,
-                        "class": self.current_class
-                    }
-                }
-                
-                # 提取位置参数信息
-                for i, arg in enumerate(node.args):
-                    arg_info = self._extract_argument_info(arg, i)
-                    call_info["args"].append(arg_info)
-                
-                # 提取关键字参数
-                for kw in node.keywords:
-                    kw_info = {
-                        "name": kw.arg,
-                        "value": self._extract_argument_info(kw.value, -1),
-                        "line": getattr(kw.value, 'lineno', node.lineno)
-                    }
-                    call_info["keywords"].append(kw_info)
+                call_info = CallRecord(
+                    package=func_info["package"],
+                    class_name=func_info["class"],
+                    method=func_info["method"],
+                    full_name=func_info["full_name"],
+                    line=node.lineno,
+                    # 提取位置参数信息
+                    args=[self._extract_argument_info(arg, i) for i, arg in enumerate(node.args)],
+                    # 提取关键字参数
+                    keywords=[
+                        KeywordRecord(kw.arg, self._extract_argument_info(kw.value, -1),
+                                      getattr(kw.value, 'lineno', node.lineno))
+                        for kw in node.keywords
+                    ],
+                    file=self.file,
+                    code=self._get_code_snippet(node),
+                    function=self.current_function,
+                    context_class=self.current_class
+                )
                 
                 self.external_api_calls.append(call_info)
                 logger.debug(f"外部API调用: {func_info['full_name']} 在行 {node.lineno}")
@@ -257,15 +218,9 @@ class ASTAnalyzer(ast.NodeVisitor):
     def visit_Constant(self, node: ast.Constant):
         """处理常量"""
         if isinstance(node.value, str):
-            self.string_literals.append({
-                "value": node.value,
-                "line": node.lineno,
-                "file": str(self.file_path),
-                "context": {
-                    "function": self.current_function,
-                    "class": self.current_class
-                }
-            })
+            self.string_literals.append(StringRecord(
+                node.value, node.lineno, self.file, self.current_function, self.current_class
+            ))
         self.generic_visit(node)
     
     def _get_called_function_info(self, node) -> Optional[Dict]:
@@ -340,46 +295,40 @@ class ASTAnalyzer(ast.NodeVisitor):
             return self._get_attribute_base(node.value)
         return None
     
-    def _extract_argument_info(self, node, index: int) -> Dict:
+    def _extract_argument_info(self, node, index: int) -> ArgRecord:
         """提取参数信息"""
-        info = {
-            "index": index,
-            "line": getattr(node, 'lineno', self.current_line),
-            "type": None,
-            "value": None,
-            "is_literal": False
-        }
+        info = ArgRecord(index, getattr(node, 'lineno', self.current_line))
         
         if isinstance(node, ast.Constant):
-            info["type"] = "constant"
-            info["value"] = node.value
-            info["is_literal"] = True
+            info.type = "constant"
+            info.value = node.value
+            info.is_literal = True
             if isinstance(node.value, str):
-                info["literal_type"] = "string"
+                info.literal_type = "string"
             elif isinstance(node.value, (int, float)):
-                info["literal_type"] = "number"
+                info.literal_type = "number"
             elif node.value is None:
-                info["literal_type"] = "none"
+                info.literal_type = "none"
         elif isinstance(node, ast.Name):
-            info["type"] = "variable"
-            info["value"] = node.id
-            info["is_literal"] = False
+            info.type = "variable"
+            info.value = node.id
+            info.is_literal = False
         elif isinstance(node, ast.Call):
-            info["type"] = "call"
-            info["is_literal"] = False
+            info.type = "call"
+            info.is_literal = False
         elif isinstance(node, ast.BinOp):
-            info["type"] = "expression"
-            info["is_literal"] = False
+            info.type = "expression"
+            info.is_literal = False
         elif isinstance(node, ast.List):
-            info["type"] = "list"
-            info["is_literal"] = True
+            info.type = "list"
+            info.is_literal = True
         elif isinstance(node, ast.Dict):
-            info["type"] = "dict"
-            info["is_literal"] = True
+            info.type = "dict"
+            info.is_literal = True
         elif isinstance(node, ast.Attribute):
-            info["type"] = "attribute"
-            info["value"] = self._get_attribute_base(node)
-            info["is_literal"] = False
+            info.type = "attribute"
+            info.value = self._get_attribute_base(node)
+            info.is_literal = False
         
         return info
     
@@ -444,70 +393,194 @@ class ASTAnalyzer(ast.NodeVisitor):
         return True
 
 
+# 提取逻辑或结果格式变化时递增，使旧的AST缓存条目失效
+ANALYZER_VERSION = 2
+
+
+def _analyze_rows(path: str, internal_packages: Set[str]) -> Tuple[list, Optional[str]]:
+    """
+    在工作进程中分析单个文件，返回 (行格式结果, 错误)
+    
+    行格式不含文件路径，回传给父进程后由 FileResult.from_row 还原。
+    """
+    result = ASTAnalyzer(Path(path), internal_packages).analyze()
+    return result.to_row(), result.error
+
+
 class ProjectAnalyzer:
-    """项目级分析器，遍历所有Python文件"""
+    """项目级分析器，遍历所有Python文件
+    
+    jobs > 1 时使用进程池并行解析，结果顺序与串行一致。
+    提供缓存时按 (文件内容哈希, ANALYZER_VERSION, internal_packages) 复用上次的提取结果，
+    只重新解析变化的文件。
+    """
+    
+    # 相对扫描目录的路径子串，命中的目录整体跳过
+    IGNORE_PATTERNS = {
+        'test_', 'tests/', 'venv/', 'env/', '.venv/', '.env/',
+        '__pycache__', 'node_modules', 'dist/', 'build/',
+        'examples/', 'docs/', 'migrations/'
+    }
     
-    def __init__(self, internal_packages: Set[str] = None):
+    def __init__(self, internal_packages: Set[str] = None, jobs: int = None, cache: CacheManager = None):
+        """
+        初始化项目分析器
+        
+        Args:
+            internal_packages: 内部包名集合
+            jobs: 并行进程数，None使用 config.PERFORMANCE_CONFIG["AST_JOBS"]，0表示CPU核数
+            cache: 按文件内容缓存提取结果，None表示不缓存
+        """
         self.internal_packages = internal_packages or set()
-        self.results = []
+        if jobs is None:
+            jobs = config.PERFORMANCE_CONFIG.get("AST_JOBS", 1)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache = cache
+        self.results: List[FileResult] = []
         self.file_count = 0
+        self.cache_hits = 0
         
-    def analyze_directory(self, directory: Path, recursive: bool = True, max_files: int = 1000) -> List[Dict]:
-        """分析目录中的所有Python文件"""
-        if recursive:
-            pattern = '**/*.py'
-        else:
-            pattern = '*.py'
+        packages = "\0".join(sorted(self.internal_packages))
+        self._packages_digest = hashlib.sha256(packages.encode('utf-8')).hexdigest()[:16]
         
-        files_analyzed = 0
-        for py_file in directory.glob(pattern):
-            if files_analyzed >= max_files:
+    def analyze_directory(self, directory: Path, recursive: bool = True, max_files: int = 1000) -> List[FileResult]:
+        """分析目录中的所有Python文件（按路径排序，达到上限时截断结果确定）
+
+        每次调用重新统计，results/file_count/cache_hits 只反映本次扫描
+        """
+        self.results = []
+        self.file_count = 0
+        self.cache_hits = 0
+        files = []
+        for py_file in discover_python_files(directory, recursive, self.IGNORE_PATTERNS):
+            if len(files) >= max_files:
                 logger.warning(f"达到最大文件数限制 ({max_files})")
                 break
-                
-            if py_file.is_file() and not self._should_ignore(py_file):
-                logger.info(f"分析文件 [{files_analyzed+1}/{max_files}]: {py_file}")
-                result = self.analyze_file(py_file)
-                if result["external_apis"] or result["internal_functions"]:
-                    self.results.append(result)
-                files_analyzed += 1
-                self.file_count = files_analyzed
-        
-        logger.info(f"完成分析，共分析 {files_analyzed} 个文件")
+            files.append(py_file)
+        
+        # 内容未变化的文件直接使用缓存结果
+        keys = {}
+        results: Dict[Path, FileResult] = {}
+        if self.cache is not None:
+            for py_file in files:
+                key = self._cache_key(py_file)
+                if key is None:
+                    continue
+                keys[py_file] = key
+                row = self.cache.get(key)
+                if row is not None:
+                    results[py_file] = FileResult.from_row(row, str(py_file))
+            self.cache_hits += len(results)
+            logger.info(f"AST缓存命中: {len(results)}/{len(files)} 个文件")
+        
+        pending = [py_file for py_file in files if py_file not in results]
+        if self.jobs > 1 and len(pending) > 1:
+            analyzed = self._analyze_parallel(pending)
+        else:
+            analyzed = self._analyze_serial(pending, max_files)
+        analyzed = dict(zip(pending, analyzed))
+        results.update(analyzed)
+        
+        if self.cache is not None:
+            self._store(keys, analyzed)
+        
+        for py_file in files:
+            result = results[py_file]
+            if result.external_apis or result.internal_functions:
+                self.results.append(result)
+            self.file_count += 1
+        
+        logger.info(f"完成分析，共分析 {self.file_count} 个文件")
         return self.results
     
-    def analyze_file(self, file_path: Path) -> Dict:
+    def _analyze_serial(self, files: List[Path], max_files: int) -> Iterator[FileResult]:
+        for i, py_file in enumerate(files):
+            logger.info(f"分析文件 [{i+1}/{max_files}]: {py_file}")
+            yield self.analyze_file(py_file)
+    
+    def _analyze_parallel(self, files: List[Path]) -> Iterator[FileResult]:
+        """多进程分析，按块分发文件，结果按文件顺序产出"""
+        jobs = min(self.jobs, len(files))
+        chunksize = max(1, min(64, len(files) // (jobs * 4)))
+        logger.info(f"多进程AST分析: {len(files)} 个文件, {jobs} 个进程, 每块 {chunksize} 个文件")
+        
+        worker = partial(_analyze_rows, internal_packages=self.internal_packages)
+        paths = [str(py_file) for py_file in files]
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for path, (row, error) in zip(paths, executor.map(worker, paths, chunksize=chunksize)):
+                result = FileResult.from_row(row, path)
+                result.error = error
+                yield result
+    
+    def _cache_key(self, file_path: Path) -> Optional[str]:
+        """AST缓存键，文件无法读取时返回None"""
+        content_hash = FileUtils.get_file_hash(file_path)
+        if not content_hash:
+            return None
+        return f"ast:v{ANALYZER_VERSION}:{self._packages_digest}:{content_hash}"
+    
+    def _store(self, keys: Dict[Path, str], analyzed: Dict[Path, FileResult]):
+        """以行格式缓存新解析的结果（分析失败的文件不缓存）"""
+        entries = {
+            keys[py_file]: result.to_row()
+            for py_file, result in analyzed.items()
+            if py_file in keys and result.error is None
+        }
+        if entries:
+            self.cache.set_many(entries)
+    
+    def analyze_file(self, file_path: Path) -> FileResult:
         """分析单个文件"""
         analyzer = ASTAnalyzer(file_path, self.internal_packages)
         return analyzer.analyze()
     
-    def _should_ignore(self, path: Path) -> bool:
-        """判断是否应该忽略该文件"""
-        ignore_patterns = {
-            'test_', 'tests/', 'venv/', 'env/', '.venv/', '.env/',
-            '__pycache__', 'node_modules', 'dist/', 'build/',
-            'examples/', 'docs/', 'migrations/'
-        }
-        str_path = str(path)
-        return any(pattern in str_path for pattern in ignore_patterns)
-    
-    def get_all_external_apis(self) -> List[Dict]:
-        """获取所有外部API调用"""
-        apis = []
+    def iter_external_apis(self) -> Iterator[CallRecord]:
+        """按文件顺序遍历所有外部API调用"""
         for result in self.results:
-            apis.extend(result["external_apis"])
-        return apis
+            yield from result.external_apis
     
-    def get_all_internal_functions(self) -> List[Dict]:
-        """获取所有内部函数"""
-        functions = []
+    def iter_internal_functions(self) -> Iterator[FunctionRecord]:
+        """按文件顺序遍历所有内部函数"""
         for result in self.results:
-            functions.extend(result["internal_functions"])
-        return functions
+            yield from result.internal_functions
     
-    def get_all_string_literals(self) -> List[Dict]:
-        """获取所有字符串常量"""
-        strings = []
+    def iter_string_literals(self) -> Iterator[StringRecord]:
+        """按文件顺序遍历所有字符串常量"""
         for result in self.results:
-            strings.extend(result.get("string_literals", []))
-        return strings
+            yield from result.string_literals
+
+
+def main():
+    """命令行入口：提取项目中的外部API调用和内部函数"""
+    parser = argparse.ArgumentParser(description="AST提取外部API调用、内部函数和字符串常量")
+    parser.add_argument("target", type=str, help="目标目录")
+    parser.add_argument("--max-files", type=int, default=1000, help="最大分析文件数 (默认: 1000)")
+    parser.add_argument("--internal", type=str, nargs="*", default=[], help="内部包名")
+    parser.add_argument("--output", type=str, help="结果JSON文件路径，默认输出统计")
+    parser.add_argument("--no-cache", action="store_true", help="禁用按文件内容的AST结果缓存")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    cache = None if args.no_cache else CacheManager()
+    analyzer = ProjectAnalyzer(set(args.internal), cache=cache)
+    try:
+        analyzer.analyze_directory(Path(args.target), max_files=args.max_files)
+    finally:
+        if cache is not None:
+            cache.close()
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                "files": analyzer.file_count,
+                "results": [result.to_dict() for result in analyzer.results]
+            }, f, ensure_ascii=False, default=repr)
+    
+    counts = [sum(1 for _ in records) for records in (
+        analyzer.iter_external_apis(), analyzer.iter_internal_functions(), analyzer.iter_string_literals()
+    )]
+    print(f"文件 {analyzer.file_count}, 外部API {counts[0]}, 内部函数 {counts[1]}, 字符串常量 {counts[2]}")
+
+
+if __name__ == "__main__":
+    main()
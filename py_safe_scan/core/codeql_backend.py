@@ -0,0 +1,233 @@
+"""CodeQL执行后端 - 每条命令一个子进程，或常驻的 CLI server"""
+
+import atexit
+import json
+import logging
+import queue
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CodeQLBackend(ABC):
+    """CodeQL命令执行后端基类
+
+    run() 的语义与 subprocess.run(check=True) 一致：成功返回 CompletedProcess，
+    失败抛出 CalledProcessError，超时抛出 TimeoutExpired。
+    """
+
+    def __init__(self, codeql_path: str = "codeql"):
+        self.codeql_path = codeql_path
+
+    @abstractmethod
+    def run(self, args: List[str], timeout: float = None) -> subprocess.CompletedProcess:
+        """
+        执行一条CodeQL命令
+
+        Args:
+            args: 命令参数（不含codeql可执行文件本身）
+            timeout: 超时时间（秒）
+        """
+
+    def close(self):
+        """释放后端资源"""
+
+
+class SubprocessBackend(CodeQLBackend):
+    """每条命令启动一个新的codeql进程（原有行为，也用作测试替身）"""
+
+    def run(self, args: List[str], timeout: float = None) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [self.codeql_path] + list(args),
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=timeout
+        )
+
+
+class CliServerBackend(CodeQLBackend):
+    """常驻的 `codeql execute cli-server` 进程
+
+    JVM、已编译查询和谓词缓存在同一进程内的多次查询/多次扫描之间保持热状态。
+    协议：stdin 写入 JSON 编码的参数数组并以 NUL 结尾，stdout 返回命令输出并以 NUL 结尾。
+    """
+
+    FATAL_MARKER = "A fatal error occurred"
+    STDERR_SETTLE_SECONDS = 0.02  # stdout结束后等待stderr收尾的静默时间
+    STDERR_SETTLE_MAX_SECONDS = 0.2  # 等待stderr收尾的总时长上限
+
+    def __init__(self, codeql_path: str = "codeql"):
+        super().__init__(codeql_path)
+        self.process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._stdout_queue: "queue.Queue[bytes]" = queue.Queue()
+        self._stderr_lines: List[str] = []
+        self._stderr_lock = threading.Lock()
+        self._stderr_activity = threading.Event()
+
+    def _start(self):
+        """启动CLI server进程"""
+        logger.info("启动CodeQL CLI server")
+        self.process = subprocess.Popen(
+            [self.codeql_path, "execute", "cli-server"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        # 每个进程一个独立队列：旧进程的读线程只会写入它自己的队列，不会混入新进程的输出
+        self._stdout_queue = queue.Queue()
+        threading.Thread(target=self._pump_stdout, args=(self.process, self._stdout_queue), daemon=True).start()
+        threading.Thread(target=self._pump_stderr, args=(self.process,), daemon=True).start()
+
+    @staticmethod
+    def _pump_stdout(process: subprocess.Popen, stdout_queue: "queue.Queue[bytes]"):
+        """后台读取stdout，进程退出时放入空块作为结束标记"""
+        while True:
+            chunk = process.stdout.read1(65536)
+            stdout_queue.put(chunk)
+            if not chunk:
+                break
+
+    def _pump_stderr(self, process: subprocess.Popen):
+        """后台收集stderr"""
+        for raw_line in iter(process.stderr.readline, b""):
+            with self._stderr_lock:
+                self._stderr_lines.append(raw_line.decode('utf-8', errors='replace'))
+            self._stderr_activity.set()
+
+    def _take_stderr(self) -> str:
+        with self._stderr_lock:
+            text = "".join(self._stderr_lines)
+            self._stderr_lines = []
+        return text
+
+    @staticmethod
+    def _output_paths(args: List[str]) -> List[Path]:
+        """命令参数中的 --output 路径"""
+        paths = []
+        for i, arg in enumerate(args):
+            if arg.startswith("--output="):
+                paths.append(Path(arg[len("--output="):]))
+            elif arg == "--output" and i + 1 < len(args):
+                paths.append(Path(args[i + 1]))
+        return paths
+
+    def run(self, args: List[str], timeout: float = None) -> subprocess.CompletedProcess:
+        with self._lock:
+            if self.process is None or self.process.poll() is not None:
+                self._start()
+
+            # cli-server不返回命令的退出码：先删除旧的输出文件，命令结束后以输出文件是否生成判断成败，
+            # 避免失败的命令让调用方读到上一次的结果
+            outputs = self._output_paths(args)
+            for path in outputs:
+                if path.is_file():
+                    path.unlink()
+
+            self._take_stderr()
+            command = json.dumps(list(args)).encode('utf-8') + b"\0"
+            try:
+                self.process.stdin.write(command)
+                self.process.stdin.flush()
+                stdout = self._read_response(timeout)
+            except subprocess.TimeoutExpired:
+                # 无法单独取消命令，只能重启server
+                self._stop()
+                raise subprocess.TimeoutExpired(args, timeout, stderr=self._take_stderr())
+            except (BrokenPipeError, EOFError) as e:
+                self._stop()
+                raise subprocess.CalledProcessError(-1, args, stderr=f"CLI server异常退出: {e}\n{self._take_stderr()}")
+
+            # stderr与stdout是两条管道，等stderr静默后再收集（总时长有上限）
+            settle_deadline = time.monotonic() + self.STDERR_SETTLE_MAX_SECONDS
+            while True:
+                remaining = settle_deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._stderr_activity.clear()
+                if not self._stderr_activity.wait(min(self.STDERR_SETTLE_SECONDS, remaining)):
+                    break
+
+            stderr = self._take_stderr()
+            if self.FATAL_MARKER in stderr:
+                raise subprocess.CalledProcessError(1, args, output=stdout, stderr=stderr)
+            missing = [str(path) for path in outputs if not path.exists()]
+            if missing:
+                raise subprocess.CalledProcessError(
+                    1, args, output=stdout, stderr=f"命令未生成输出文件: {', '.join(missing)}\n{stderr}"
+                )
+
+            return subprocess.CompletedProcess(args, 0, stdout=stdout, stderr=stderr)
+
+    def _read_response(self, timeout: float = None) -> str:
+        """读取一条命令的输出（直到NUL结束符），超时按整条命令计算"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        buffer = bytearray()
+        while True:
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            try:
+                chunk = self._stdout_queue.get(timeout=remaining)
+            except queue.Empty:
+                raise subprocess.TimeoutExpired("cli-server", timeout)
+            if not chunk:
+                raise EOFError("stdout已关闭")
+            buffer.extend(chunk)
+            if buffer.endswith(b"\0"):
+                return buffer[:-1].decode('utf-8', errors='replace')
+
+    def _stop(self):
+        """停止server进程"""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.process.kill()
+        self.process = None
+
+    def close(self):
+        with self._lock:
+            if self.process is not None:
+                logger.info("关闭CodeQL CLI server")
+                self._stop()
+
+
+# 同一进程内共享的后端（跨流水线实例复用热JVM）
+_shared_backends: Dict[Tuple[str, str], CodeQLBackend] = {}
+_shared_lock = threading.Lock()
+
+BACKENDS = {
+    "subprocess": SubprocessBackend,
+    "cli-server": CliServerBackend,
+}
+
+
+def get_backend(codeql_path: str = "codeql", kind: str = "cli-server") -> CodeQLBackend:
+    """
+    获取进程内共享的CodeQL后端
+
+    Args:
+        codeql_path: CodeQL可执行文件路径
+        kind: 后端类型，"cli-server" 或 "subprocess"
+    """
+    if kind not in BACKENDS:
+        raise ValueError(f"未知的CodeQL后端: {kind}")
+
+    with _shared_lock:
+        key = (codeql_path, kind)
+        if key not in _shared_backends:
+            _shared_backends[key] = BACKENDS[kind](codeql_path)
+        return _shared_backends[key]
+
+
+@atexit.register
+def _close_shared_backends():
+    for backend in _shared_backends.values():
+        backend.close()
@@ -1,35 +1,65 @@
 """CodeQL管理器 - 负责数据库创建和查询执行"""
 
 import subprocess
-import json
+import hashlib
 import logging
 from pathlib import Path
 from typing import List, Dict, Optional
 
 import config  # 添加这个导入
+from py_safe_scan.cache.directory_cache import DirectoryCache
+from py_safe_scan.core.codeql_backend import CodeQLBackend, get_backend
+from py_safe_scan.core.path_graph import EMPTY_FLOW, PathGraph
+from py_safe_scan.utils.file_utils import FileUtils
+from py_safe_scan.utils.sarif_stream import SarifRef, iter_sarif_result_refs
 
 logger = logging.getLogger(__name__)
 
+
+class CodeQLQueryError(Exception):
+    """CodeQL查询运行失败或超时"""
+
+
 class CodeQLManager:
     """CodeQL管理器"""
     
-    def __init__(self, codeql_path: str = "codeql", workspace_dir: Path = None):
+    def __init__(self, codeql_path: str = "codeql", workspace_dir: Path = None,
+                 db_cache_max_bytes: int = None, backend: CodeQLBackend = None):
         """
         初始化CodeQL管理器
         
         Args:
             codeql_path: CodeQL可执行文件路径
             workspace_dir: 工作目录
+            db_cache_max_bytes: 数据库缓存磁盘预算（字节）
+            backend: 命令执行后端，None表示按配置使用进程内共享的后端
         """
         self.codeql_path = codeql_path
+        self.backend = backend or get_backend(codeql_path, config.CODEQL_BACKEND)
         self.workspace_dir = workspace_dir or Path.cwd() / ".codeql_workspace"
         self.db_dir = self.workspace_dir / "databases"
         self.result_dir = self.workspace_dir / "results"
+        self.codeql_version = "unknown"
         
         # 创建目录
         self.db_dir.mkdir(parents=True, exist_ok=True)
         self.result_dir.mkdir(parents=True, exist_ok=True)
         
+        # 数据库缓存（按源码内容哈希寻址），显式传入的0只保留最近使用的数据库
+        if db_cache_max_bytes is None:
+            db_cache_max_bytes = config.CODEQL_DB_CACHE_MAX_BYTES
+        self.db_cache = DirectoryCache(
+            self.db_dir / "cache",
+            max_bytes=db_cache_max_bytes,
+            suffix=".db"
+        )
+        
+        # 生成查询缓存（按规范集合内容寻址，存放预编译的 .qlx）
+        self.query_cache = DirectoryCache(
+            self.workspace_dir / "query_cache",
+            max_bytes=config.QUERY_CACHE_MAX_BYTES
+        )
+        
         # 检查CodeQL是否可用
         self._check_codeql()
     
@@ -42,26 +72,57 @@ class CodeQLManager:
                 text=True,
                 check=True
             )
-            logger.info(f"CodeQL版本: {result.stdout.splitlines()[0]}")
+            self.codeql_version = result.stdout.splitlines()[0]
+            logger.info(f"CodeQL版本: {self.codeql_version}")
         except (subprocess.CalledProcessError, FileNotFoundError) as e:
             raise Exception(f"CodeQL不可用: {e}. 请确保codeql在PATH中或设置CODEQL_PATH环境变量")
     
-    def create_database(self, source_dir: Path, language: str = "python") -> Path:
+    def get_database_key(self, source_dir: Path, language: str = "python") -> str:
         """
-        创建CodeQL数据库
+        计算数据库缓存键：源码树内容哈希 + CodeQL版本 + 语言
         
         Args:
             source_dir: 源代码目录
             language: 语言
             
+        Returns:
+            缓存键
+        """
+        digest = hashlib.sha256()
+        digest.update(FileUtils.get_tree_hash(source_dir).encode('ascii'))
+        digest.update(self.codeql_version.encode('utf-8'))
+        digest.update(language.encode('utf-8'))
+        return f"{language}-{digest.hexdigest()[:32]}"
+    
+    def create_database(self, source_dir: Path, language: str = "python",
+                        use_cache: bool = None) -> Path:
+        """
+        创建CodeQL数据库（源码未变化时直接复用缓存的数据库）
+        
+        Args:
+            source_dir: 源代码目录
+            language: 语言
+            use_cache: 是否使用数据库缓存，None表示按配置
+            
         Returns:
             数据库路径
         """
-        db_name = f"{source_dir.name}.db"
-        db_path = self.db_dir / db_name
+        if use_cache is None:
+            use_cache = config.CODEQL_DB_CACHE_ENABLED
+        
+        if use_cache:
+            db_key = self.get_database_key(source_dir, language)
+            cached = self.db_cache.get(db_key)
+            if cached:
+                logger.info(f"数据库缓存命中: {cached}")
+                return cached
+            db_path = self.db_cache.path_for(db_key)
+        else:
+            db_key = None
+            db_path = self.db_dir / f"{source_dir.name}.db"
         
         cmd = [
-            self.codeql_path, "database", "create",
+            "database", "create",
             str(db_path),
             f"--language={language}",
             f"--source-root={source_dir}",
@@ -71,20 +132,52 @@ class CodeQLManager:
         logger.info(f"创建CodeQL数据库: {db_path}")
         
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=300  # 5分钟超时
-            )
+            result = self.backend.run(cmd, timeout=300)  # 5分钟超时
             logger.info("数据库创建成功")
-            return db_path
         except subprocess.TimeoutExpired:
             raise Exception("数据库创建超时")
         except subprocess.CalledProcessError as e:
             logger.error(f"数据库创建失败: {e.stderr}")
             raise Exception(f"CodeQL数据库创建失败: {e.stderr}")
+        
+        if db_key:
+            self.db_cache.put(db_key, {
+                "source": str(source_dir),
+                "language": language,
+                "codeql_version": self.codeql_version
+            })
+        
+        return db_path
+    
+    def compile_query(self, query_path: Path) -> Optional[Path]:
+        """
+        预编译查询为 .qlx
+        
+        Args:
+            query_path: 查询文件路径
+            
+        Returns:
+            .qlx文件路径，编译失败返回None（调用方回退到 .ql）
+        """
+        qlx_path = query_path.with_suffix(".qlx")
+        cmd = [
+            "query", "compile",
+            f"--output={qlx_path}",
+            str(query_path)
+        ]
+        
+        logger.info(f"预编译查询: {query_path}")
+        
+        try:
+            self.backend.run(cmd, timeout=config.TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            logger.warning("查询预编译超时，将直接运行 .ql")
+            return None
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"查询预编译失败，将直接运行 .ql: {e.stderr}")
+            return None
+        
+        return qlx_path if qlx_path.exists() else None
     
     def run_builtin_queries(self, db_path: Path) -> Path:
         """
@@ -99,7 +192,7 @@ class CodeQLManager:
         result_path = self.result_dir / f"builtin_results.sarif"
         
         cmd = [
-            self.codeql_path, "database", "analyze",
+            "database", "analyze",
             str(db_path),
             "--format=sarif-latest",
             f"--output={result_path}",
@@ -109,13 +202,7 @@ class CodeQLManager:
         logger.info("运行内置Python安全查询")
         
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=600
-            )
+            result = self.backend.run(cmd, timeout=600)
             logger.info(f"分析完成，结果保存到: {result_path}")
             return result_path
         except subprocess.TimeoutExpired:
@@ -135,29 +222,37 @@ class CodeQLManager:
         Returns:
             SARIF结果文件路径
         """
-        result_path = self.result_dir / f"{query_path.stem}.sarif"
+        return self.run_custom_queries(db_path, [query_path], result_name=query_path.stem)
+    
+    def run_custom_queries(self, db_path: Path, query_paths: List[Path], result_name: str = "multi_query") -> Path:
+        """
+        在一次 database analyze 中运行多个自定义查询
+        
+        Args:
+            db_path: 数据库路径
+            query_paths: 查询文件路径列表
+            result_name: 结果文件名（不含扩展名）
+            
+        Returns:
+            SARIF结果文件路径（各查询结果按ruleId区分）
+        """
+        result_path = self.result_dir / f"{result_name}.sarif"
         
         cmd = [
-            self.codeql_path, "database", "analyze",
+            "database", "analyze",
             str(db_path),
             "--format=sarif-latest",
             f"--output={result_path}",
             "--threads=4",
             "--ram=4096",
-            str(query_path)
+            *[str(query_path) for query_path in query_paths]
         ]
         
-        logger.info(f"运行自定义查询: {query_path.name}")
-        logger.debug(f"命令: {' '.join(cmd)}")
+        logger.info(f"运行自定义查询: {', '.join(q.name for q in query_paths)}")
+        logger.debug(f"命令: codeql {' '.join(cmd)}")
         
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=config.TIMEOUT_SECONDS  # 现在可以访问config了
-            )
+            result = self.backend.run(cmd, timeout=config.TIMEOUT_SECONDS)
             logger.info(f"自定义查询完成: {result_path}")
             
             if result.stderr:
@@ -175,6 +270,60 @@ class CodeQLManager:
                 return result_path
             raise Exception(f"CodeQL自定义查询失败: {e.stderr}")
     
+    def run_table_query(self, db_path: Path, query_path: Path, result_name: str = None) -> Path:
+        """
+        用 query run 运行表格型查询，并把BQRS结果解码为CSV
+
+        Args:
+            db_path: 数据库路径
+            query_path: 查询文件路径（select 列即CSV列，第一行为列名）
+            result_name: 结果文件名前缀（不含扩展名），默认使用查询文件名
+
+        Returns:
+            CSV结果文件路径（按数据库区分，不同数据库上的查询不会互相覆盖结果）
+
+        Raises:
+            CodeQLQueryError: 查询运行或解码失败、超时
+        """
+        db_key = hashlib.sha256(str(Path(db_path).resolve()).encode('utf-8')).hexdigest()[:16]
+        result_name = f"{result_name or query_path.stem}-{db_key}"
+        bqrs_path = self.result_dir / f"{result_name}.bqrs"
+        csv_path = self.result_dir / f"{result_name}.csv"
+
+        commands = [
+            [
+                "query", "run",
+                f"--database={db_path}",
+                f"--output={bqrs_path}",
+                "--threads=4",
+                "--ram=4096",
+                str(query_path)
+            ],
+            [
+                "bqrs", "decode",
+                "--format=csv",
+                "--result-set=#select",
+                f"--output={csv_path}",
+                str(bqrs_path)
+            ]
+        ]
+
+        logger.info(f"运行表格查询: {query_path.name}")
+
+        try:
+            for cmd in commands:
+                logger.debug(f"命令: codeql {' '.join(cmd)}")
+                self.backend.run(cmd, timeout=config.TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            logger.error("表格查询运行超时")
+            raise CodeQLQueryError("表格查询超时")
+        except subprocess.CalledProcessError as e:
+            logger.error(f"表格查询运行失败: {e.stderr}")
+            raise CodeQLQueryError(f"CodeQL表格查询失败: {e.stderr}")
+
+        logger.info(f"表格查询完成: {csv_path}")
+        return csv_path
+
     def _parse_location(self, location: Dict) -> Optional[Dict]:
         """解析位置节点"""
         try:
@@ -200,15 +349,24 @@ class CodeQLManager:
         except:
             return None
 
-    def _parse_result(self, result: Dict, rule_to_cwe: Dict) -> Optional[Dict]:
-        """解析单个结果 - 改进版，提取source和sink信息"""
+    def _parse_result(self, result: Dict, rule_to_cwe: Dict, ref: SarifRef = None,
+                      graph: PathGraph = None) -> List[Dict]:
+        """解析单个结果 - 每条代码流生成一个漏洞，提取source和sink信息
+        
+        路径节点登记到路径图中（相同位置共享节点字典），漏洞的 flow_key 是路径的内容指纹。
+        原始结果不随漏洞保存，需要时通过 sarif_ref.resolve() 从SARIF文件读取。
+        
+        Returns:
+            漏洞列表，没有代码流时只有一个空路径的漏洞，解析失败为空列表
+        """
+        graph = graph if graph is not None else PathGraph()
         try:
             rule_id = result.get("ruleId")
             message = result.get("message", {}).get("text", "")
             
             locations = result.get("locations", [])
             if not locations:
-                return None
+                return []
             
             # 获取sink位置（漏洞发生的位置）
             sink_loc = locations[0]
@@ -216,39 +374,34 @@ class CodeQLManager:
             sink_artifact = sink_physical.get("artifactLocation", {})
             sink_region = sink_physical.get("region", {})
             
-            # 提取污点路径
-            path_nodes = []
-            code_flows = result.get("codeFlows", [])
-            for flow in code_flows:
-                thread_flows = flow.get("threadFlows", [])
-                for thread_flow in thread_flows:
+            # 提取污点路径：每个threadFlow是一条独立的source→sink路径
+            flow_ids = []
+            for flow in result.get("codeFlows", []):
+                for thread_flow in flow.get("threadFlows", []):
+                    location_ids = []
                     for loc in thread_flow.get("locations", []):
                         node = self._parse_location(loc)
                         if node:
-                            path_nodes.append(node)
+                            location_ids.append(graph.intern_location(**node))
+                    if location_ids:
+                        flow_ids.append(graph.add_flow(location_ids))
+            
+            # 结果内重复的路径只保留一条
+            flow_ids = list(dict.fromkeys(flow_ids)) or [EMPTY_FLOW]
             
-            # 提取source信息（从path_nodes的第一个节点）
-            source_info = {}
-            if path_nodes:
-                first_node = path_nodes[0]
-                source_info = {
-                    "file": first_node.get("file", ""),
-                    "line": first_node.get("line", 0),
-                    "code": first_node.get("code", "")
+            # 没有路径时，尝试从relatedLocations获取source信息
+            related_source = {}
+            related_locations = result.get("relatedLocations", [])
+            if related_locations:
+                first_rel = related_locations[0]
+                phys = first_rel.get("physicalLocation", {})
+                art = phys.get("artifactLocation", {})
+                reg = phys.get("region", {})
+                related_source = {
+                    "file": art.get("uri", ""),
+                    "line": reg.get("startLine", 0),
+                    "code": reg.get("snippet", {}).get("text", "")
                 }
-            else:
-                # 如果没有path_nodes，尝试从relatedLocations获取
-                related_locations = result.get("relatedLocations", [])
-                if related_locations:
-                    first_rel = related_locations[0]
-                    phys = first_rel.get("physicalLocation", {})
-                    art = phys.get("artifactLocation", {})
-                    reg = phys.get("region", {})
-                    source_info = {
-                        "file": art.get("uri", ""),
-                        "line": reg.get("startLine", 0),
-                        "code": reg.get("snippet", {}).get("text", "")
-                    }
             
             # 获取CWE
             cwe = rule_to_cwe.get(rule_id, "unknown")
@@ -262,25 +415,40 @@ class CodeQLManager:
             else:
                 severity = "low"
             
-            # 构建返回结果
-            vuln = {
-                "cwe": cwe,
-                "rule": rule_id,
-                "message": message,
-                "file": sink_artifact.get("uri", ""),
-                "line": sink_region.get("startLine", 0),
-                "code": sink_region.get("snippet", {}).get("text", ""),
-                "severity": severity,
-                "path": path_nodes,
-                "source": source_info,  # 添加source字段
-                "raw": result
-            }
+            # 构建返回结果（每条路径一个）
+            vulns = []
+            for flow_id in flow_ids:
+                source_id = graph.source(flow_id)
+                if source_id is not None:
+                    # source取路径的第一个节点
+                    first_node = graph.location(source_id)
+                    source_info = {
+                        "file": first_node["file"],
+                        "line": first_node["line"],
+                        "code": first_node["code"]
+                    }
+                else:
+                    source_info = dict(related_source)
+                
+                vulns.append({
+                    "cwe": cwe,
+                    "rule": rule_id,
+                    "message": message,
+                    "file": sink_artifact.get("uri", ""),
+                    "line": sink_region.get("startLine", 0),
+                    "code": sink_region.get("snippet", {}).get("text", ""),
+                    "severity": severity,
+                    "path": graph.flow_path(flow_id),
+                    "flow_key": graph.fingerprint(flow_id),
+                    "source": source_info,  # 添加source字段
+                    "sarif_ref": ref
+                })
             
-            return vuln
+            return vulns
             
         except Exception as e:
             logger.debug(f"解析单个结果失败: {e}")
-            return None
+            return []
 
     def _should_ignore_path(self, vuln: Dict) -> bool:
         """启发式规则：判断路径是否应该被忽略"""
@@ -300,9 +468,13 @@ class CodeQLManager:
                 return True
         return False
 
-    def extract_results(self, sarif_path: Path) -> List[Dict]:
+    def extract_results(self, sarif_path: Path, rule_to_cwe: Dict[str, str] = None) -> List[Dict]:
         """
         从SARIF文件提取漏洞结果
+        
+        Args:
+            sarif_path: SARIF文件路径
+            rule_to_cwe: 额外的 ruleId -> CWE 映射（多CWE扫描时用于按规则拆分结果）
         """
         vulnerabilities = []
         
@@ -311,29 +483,30 @@ class CodeQLManager:
             return vulnerabilities
         
         try:
-            with open(sarif_path, 'r', encoding='utf-8') as f:
-                sarif = json.load(f)
-            
             rule_to_cwe = {
                 "py/sql-injection": "CWE-89",
                 "py/path-injection": "CWE-22",
                 "py/command-line-injection": "CWE-78",
                 "py/xss": "CWE-79",
+                **(rule_to_cwe or {})
             }
             
-            # 用文件+行号简单去重
+            # 按 (source, sink, 路径指纹) 去重：共享sink的不同路径各自保留
+            graph = PathGraph()
             seen = set()
             
-            for run in sarif.get("runs", []):
-                for result in run.get("results", []):
-                    vuln = self._parse_result(result, rule_to_cwe)
-                    if vuln:
-                        key = f"{vuln.get('file')}:{vuln.get('line')}"
-                        if key not in seen:
-                            seen.add(key)
-                            vulnerabilities.append(vuln)
+            # 逐条读取结果，内存占用不随SARIF文件大小增长
+            for result, ref in iter_sarif_result_refs(sarif_path):
+                for vuln in self._parse_result(result, rule_to_cwe, ref, graph):
+                    source = vuln["source"]
+                    key = (vuln["cwe"], vuln["file"], vuln["line"],
+                           source.get("file"), source.get("line"), vuln["flow_key"])
+                    if key not in seen:
+                        seen.add(key)
+                        vulnerabilities.append(vuln)
             
-            logger.info(f"从SARIF文件中提取了 {len(vulnerabilities)} 个唯一漏洞")
+            logger.info(f"从SARIF文件中提取了 {len(vulnerabilities)} 条唯一路径 "
+                        f"(位置 {graph.location_count} 个, 路径节点 {graph.node_count} 个)")
             return vulnerabilities
             
         except Exception as e:
@@ -0,0 +1,130 @@
+"""污点路径图 - 以共享前缀的形式保存CodeQL结果中的所有代码流
+
+每个位置（文件、行号、代码）只保存一份，路径节点以位置ID引用；路径存放在前缀树中，
+共享 source 和前几步的路径只保存一次公共前缀。每条路径用前缀树中末尾节点的ID表示，
+同一图内位置序列相同的路径ID相同；跨图比较或随漏洞保存时使用 fingerprint() 的内容指纹。
+"""
+
+import hashlib
+import logging
+from array import array
+from sys import intern
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 空路径（结果没有代码流）的ID
+EMPTY_FLOW = -1
+
+
+class PathGraph:
+    """共享前缀的路径图"""
+
+    def __init__(self):
+        # 位置表：ID -> 位置字典（同一位置的所有路径节点共享同一个字典，调用方不应修改）
+        self._locations: List[Dict] = []
+        self._location_ids: Dict[Tuple, int] = {}
+        # 前缀树：节点ID -> 父节点ID / 位置ID / 深度（从1开始）
+        self._parent = array('i')
+        self._location = array('i')
+        self._depth = array('i')
+        self._children: Dict[Tuple[int, int], int] = {}
+        self._fingerprints: Dict[int, str] = {}
+
+    @property
+    def location_count(self) -> int:
+        return len(self._locations)
+
+    @property
+    def node_count(self) -> int:
+        return len(self._parent)
+
+    def intern_location(self, file: str, line: int, code: str = "", step: int = 0) -> int:
+        """
+        登记位置，返回位置ID（相同位置返回同一ID）
+
+        Args:
+            file: 文件路径
+            line: 行号
+            code: 代码文本
+            step: SARIF中的步骤编号
+        """
+        key = (file, line, code, step)
+        location_id = self._location_ids.get(key)
+        if location_id is None:
+            location_id = len(self._locations)
+            self._locations.append({"file": intern(file), "line": line, "code": code, "step": step})
+            self._location_ids[key] = location_id
+        return location_id
+
+    def location(self, location_id: int) -> Dict:
+        """位置ID对应的位置字典"""
+        return self._locations[location_id]
+
+    def add_flow(self, location_ids: Iterable[int]) -> int:
+        """
+        添加一条路径
+
+        Args:
+            location_ids: 按顺序排列的位置ID
+
+        Returns:
+            路径ID（末尾节点），空路径返回 EMPTY_FLOW
+        """
+        node = EMPTY_FLOW
+        for location_id in location_ids:
+            child = self._children.get((node, location_id))
+            if child is None:
+                child = len(self._parent)
+                self._parent.append(node)
+                self._location.append(location_id)
+                self._depth.append(self._depth[node] + 1 if node != EMPTY_FLOW else 1)
+                self._children[(node, location_id)] = child
+            node = child
+        return node
+
+    def depth(self, flow_id: int) -> int:
+        """路径长度"""
+        return self._depth[flow_id] if flow_id != EMPTY_FLOW else 0
+
+    def flow_locations(self, flow_id: int) -> List[int]:
+        """路径上按顺序排列的位置ID"""
+        location_ids = []
+        node = flow_id
+        while node != EMPTY_FLOW:
+            location_ids.append(self._location[node])
+            node = self._parent[node]
+        location_ids.reverse()
+        return location_ids
+
+    def flow_path(self, flow_id: int) -> List[Dict]:
+        """路径节点列表（节点字典在路径之间共享）"""
+        return [self._locations[location_id] for location_id in self.flow_locations(flow_id)]
+
+    def source(self, flow_id: int) -> Optional[int]:
+        """路径起点的位置ID，空路径返回None"""
+        node = self.prefix(flow_id, 1)
+        return self._location[node] if node != EMPTY_FLOW else None
+
+    def prefix(self, flow_id: int, depth: int) -> int:
+        """路径前 depth 步对应的前缀节点（路径更短时返回路径本身）"""
+        node = flow_id
+        while node != EMPTY_FLOW and self._depth[node] > depth:
+            node = self._parent[node]
+        return node
+
+    def fingerprint(self, flow_id: int) -> str:
+        """
+        路径的内容指纹（各节点 文件:行号:代码 的哈希），与图无关，可随漏洞保存和跨图比较
+
+        Returns:
+            十六进制哈希，空路径为空串
+        """
+        if flow_id == EMPTY_FLOW:
+            return ""
+        fingerprint = self._fingerprints.get(flow_id)
+        if fingerprint is None:
+            parts = (f"{node['file']}:{node['line']}:{node['code']}" for node in self.flow_path(flow_id))
+            fingerprint = hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:32]
+            self._fingerprints[flow_id] = fingerprint
+        return fingerprint
@@ -0,0 +1,272 @@
+"""路径切片 - 为每条污点路径构建最小的LLM验证上下文
+
+只保留路径经过的语句、所在函数的签名和包住这些语句的控制结构头（if/for/while/with/try/except），
+预算允许时再补充 source 和 sink 所在函数的完整函数体。各文件的行去重后按原顺序输出，
+省略的部分用 ... 表示，路径上的行以 → 标记。
+
+切片文本不含绝对行号：在路径之外插入或删除代码不会改变切片，LLM请求缓存键随之稳定。
+"""
+
+import ast
+import logging
+import threading
+import weakref
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import config
+from py_safe_scan.utils.source_index import SourceFile, SourceIndex, get_source_index
+
+logger = logging.getLogger(__name__)
+
+_CONTROL_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try, ast.ExceptHandler)
+if hasattr(ast, "TryStar"):
+    _CONTROL_NODES += (ast.TryStar,)
+if hasattr(ast, "match_case"):
+    _CONTROL_NODES += (ast.match_case,)
+
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计token数：ASCII约4个字符一个token，其他字符（如中文）按一个token计"""
+    ascii_chars = sum(1 for char in text if char < "\x80")
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+class _Block:
+    """带头部的代码块（函数或控制结构）"""
+
+    __slots__ = ("start", "end", "header_end")
+
+    def __init__(self, start: int, end: int, header_end: int):
+        self.start = start
+        self.end = end
+        self.header_end = header_end
+
+    def header(self) -> range:
+        return range(self.start, self.header_end + 1)
+
+    def contains(self, line: int) -> bool:
+        return self.start <= line <= self.end
+
+
+class _Outline:
+    """单个文件的AST轮廓：函数、控制结构和简单语句的行范围"""
+
+    def __init__(self, tree: Optional[ast.AST]):
+        self.functions: List[_Block] = []
+        self.controls: List[_Block] = []
+        self.statements: List[Tuple[int, int]] = []
+        if tree is not None:
+            self._collect(tree)
+
+    def _collect(self, tree: ast.AST):
+        for node in ast.walk(tree):
+            end = getattr(node, "end_lineno", None)
+            if isinstance(node, _FUNCTION_NODES):
+                self.functions.append(_Block(node.lineno, end, self._header_end(node)))
+            elif isinstance(node, _CONTROL_NODES):
+                # match_case 没有位置信息，使用模式和分支体的位置
+                if end is None:
+                    start, end = node.pattern.lineno, node.body[-1].end_lineno
+                else:
+                    start = node.lineno
+                # 块范围包括 else/elif 分支：分支内的语句同样受条件约束
+                self.controls.append(_Block(start, end, self._header_end(node, start)))
+            elif isinstance(node, ast.stmt) and not hasattr(node, "body"):
+                self.statements.append((node.lineno, end))
+
+    @staticmethod
+    def _header_end(node: ast.AST, start: int = None) -> int:
+        """头部最后一行（多行签名或条件），即函数体/块体第一条语句的前一行"""
+        start = start or node.lineno
+        body = getattr(node, "body", None)
+        if body:
+            return max(start, body[0].lineno - 1)
+        return start
+
+    def statement(self, line: int) -> range:
+        """包含该行的最内层简单语句的行范围（多行调用等），找不到时只有该行"""
+        best = None
+        for start, end in self.statements:
+            if start <= line <= end and (best is None or end - start < best[1] - best[0]):
+                best = (start, end)
+        return range(best[0], best[1] + 1) if best else range(line, line + 1)
+
+    def function(self, line: int) -> Optional[_Block]:
+        """包含该行的最内层函数"""
+        best = None
+        for block in self.functions:
+            if block.contains(line) and (best is None or block.start > best.start):
+                best = block
+        return best
+
+    def enclosing_controls(self, line: int, function: Optional[_Block]) -> List[_Block]:
+        """同一函数内包住该行的控制结构（该行本身是头部时也包括）"""
+        return [
+            block for block in self.controls
+            if block.contains(line) and (function is None or function.contains(block.start))
+        ]
+
+
+class PathSlice:
+    """一条路径的切片"""
+
+    __slots__ = ("text", "source", "sink", "tokens", "truncated")
+
+    def __init__(self, text: str, source: str, sink: str, tokens: int, truncated: bool):
+        """
+        Args:
+            text: 完整切片（所有文件）
+            source: source语句及其所在函数签名、控制结构头
+            sink: sink语句及其所在函数签名、控制结构头
+            tokens: 切片的估计token数
+            truncated: 是否因预算省略了路径中间的语句
+        """
+        self.text = text
+        self.source = source
+        self.sink = sink
+        self.tokens = tokens
+        self.truncated = truncated
+
+
+class PathSlicer:
+    """路径切片器"""
+
+    def __init__(self, source_index: SourceIndex = None, token_budget: int = None):
+        """
+        初始化切片器
+
+        Args:
+            source_index: 源文件索引，默认使用进程内共享索引
+            token_budget: 切片的token预算，默认 IRIS_CONFIG["SLICE_TOKEN_BUDGET"]
+        """
+        self.index = source_index or get_source_index()
+        self.token_budget = token_budget or config.IRIS_CONFIG.get("SLICE_TOKEN_BUDGET", 1200)
+        # 轮廓随源文件对象释放（源文件索引 reset 后自动失效）
+        self._outlines: "weakref.WeakKeyDictionary[SourceFile, _Outline]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _outline(self, source: SourceFile) -> _Outline:
+        with self._lock:
+            outline = self._outlines.get(source)
+        if outline is not None:
+            return outline
+
+        try:
+            tree = ast.parse("\n".join(source.lines(1, source.line_count)))
+        except (SyntaxError, ValueError) as e:
+            logger.debug(f"解析源文件失败，只按行切片 {source.path}: {e}")
+            tree = None
+        outline = _Outline(tree)
+        with self._lock:
+            self._outlines[source] = outline
+        return outline
+
+    @staticmethod
+    def _steps(vuln: Dict) -> List[Tuple[str, int]]:
+        """路径上的位置（source、中间节点、sink），按顺序去重"""
+        source = vuln.get("source") or {}
+        steps = [(source.get("file", ""), source.get("line", 0))]
+        steps += [(node.get("file", ""), node.get("line", 0)) for node in vuln.get("path", [])]
+        steps.append((vuln.get("file", ""), vuln.get("line", 0)))
+        return [step for step in dict.fromkeys(steps) if step[0] and step[1]]
+
+    def _core_lines(self, file_path: str, line: int) -> Set[int]:
+        """一个路径位置必须保留的行：语句本身、所在函数签名、包住它的控制结构头"""
+        source = self.index.get(file_path)
+        if source is None:
+            return {line}
+        outline = self._outline(source)
+        lines = set(outline.statement(line))
+        function = outline.function(line)
+        if function is not None:
+            lines.update(function.header())
+        for block in outline.enclosing_controls(line, function):
+            lines.update(block.header())
+        return lines
+
+    def _function_lines(self, file_path: str, line: int) -> Set[int]:
+        """位置所在函数的全部行（不在函数内时为空）"""
+        source = self.index.get(file_path)
+        if source is None:
+            return set()
+        function = self._outline(source).function(line)
+        return set(range(function.start, function.end + 1)) if function is not None else set()
+
+    def _render(self, selected: Dict[str, Set[int]], marked: Set[Tuple[str, int]],
+                fallback: Dict[Tuple[str, int], str]) -> str:
+        """按文件输出选中的行，不连续处用 ... 分隔，不含行号"""
+        blocks = []
+        for file_path, lines in selected.items():
+            if not lines:
+                continue
+            source = self.index.get(file_path)
+            out = [f"# {file_path}"]
+            previous = None
+            for line in sorted(lines):
+                if source is not None:
+                    text = next(iter(source.lines(line, line)), None)
+                else:
+                    text = fallback.get((file_path, line))
+                if text is None:
+                    continue
+                if previous is not None and line != previous + 1:
+                    out.append("  ...")
+                prefix = "→ " if (file_path, line) in marked else "  "
+                out.append(f"{prefix}{text}".rstrip())
+                previous = line
+            blocks.append("\n".join(out))
+        return "\n\n".join(blocks)
+
+    def slice(self, vuln: Dict) -> PathSlice:
+        """
+        构建路径切片
+
+        优先级：source和sink语句 > 中间路径语句（按路径顺序）> source/sink所在函数的完整函数体；
+        超出预算的中间语句被省略，函数体只在预算内时加入。
+
+        Args:
+            vuln: 漏洞（需要 source、file、line，path 可选）
+
+        Returns:
+            路径切片
+        """
+        steps = self._steps(vuln)
+        marked = set(steps)
+        fallback = {(node.get("file", ""), node.get("line", 0)): node.get("code", "")
+                    for node in vuln.get("path", []) if node.get("code")}
+        selected: Dict[str, Set[int]] = {file_path: set() for file_path, _ in steps}
+
+        def render_with(extra: Iterable[Tuple[str, Set[int]]]) -> str:
+            trial = {file_path: set(lines) for file_path, lines in selected.items()}
+            for file_path, lines in extra:
+                trial[file_path].update(lines)
+            return self._render(trial, marked, fallback)
+
+        def fits(extra: Iterable[Tuple[str, Set[int]]]) -> bool:
+            return estimate_tokens(render_with(extra)) <= self.token_budget
+
+        # source和sink总是保留
+        ends = [steps[0], steps[-1]] if steps else []
+        for file_path, line in ends:
+            selected[file_path].update(self._core_lines(file_path, line))
+
+        truncated = False
+        for file_path, line in steps[1:-1]:
+            core = self._core_lines(file_path, line)
+            if fits([(file_path, core)]):
+                selected[file_path].update(core)
+            else:
+                truncated = True
+
+        if not truncated:
+            for file_path, line in ends:
+                body = self._function_lines(file_path, line)
+                if body and fits([(file_path, body)]):
+                    selected[file_path].update(body)
+
+        text = self._render(selected, marked, fallback)
+        source_text = self._render({ends[0][0]: self._core_lines(*ends[0])}, marked, fallback) if ends else ""
+        sink_text = self._render({ends[-1][0]: self._core_lines(*ends[-1])}, marked, fallback) if ends else ""
+        return PathSlice(text, source_text, sink_text, estimate_tokens(text), truncated)
@@ -1,61 +1,83 @@
 """主流水线 - 完整实现IRIS四阶段（带动态查询生成）"""
 
+import hashlib
 import logging
+import re
 import time
 import json
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterable, Optional, Any, Tuple
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 from py_safe_scan.core.codeql_manager import CodeQLManager
-from py_safe_scan.core.spec_extractor import SpecExtractor
+from py_safe_scan.core.path_slicer import PathSlicer
+from py_safe_scan.core.spec_extractor import APIGroup, SpecExtractor, fan_out_labels, group_call_sites
 from py_safe_scan.llm.deepseek_client import DeepSeekClient
+from py_safe_scan.llm.label_store import APILabelStore
 from py_safe_scan.llm.prompts import CWE_DESCRIPTIONS, FEW_SHOT_EXAMPLES
 from py_safe_scan.cache.cache_manager import CacheManager
+from py_safe_scan.cache.scan_manifest import ScanManifest
 from py_safe_scan.utils.file_utils import FileUtils
 from py_safe_scan.utils.sarif_parser import SARIFParser
+from py_safe_scan.utils.sarif_stream import json_default
+from py_safe_scan.utils.source_index import SourceIndex
 
 import config
 
 logger = logging.getLogger(__name__)
 
+# 持久化验证结论的格式版本，键的计算方式变化时递增
+VERDICT_CACHE_VERSION = 2
+
 
 class IRISPipeline:
     """IRIS论文完整实现的主流水线（带动态查询生成）"""
     
-    def __init__(self, cwe_type: str = None, use_cache: bool = True):
+    def __init__(self, cwe_type: str = None, use_cache: bool = True, incremental: bool = False,
+                 source_index: SourceIndex = None):
         """
         初始化分析流水线
         
         Args:
             cwe_type: CWE类型 (如 "CWE-89")，如果为None则检测所有类型
             use_cache: 是否使用缓存
+            incremental: 增量模式，复用上次扫描中未变化文件的规范和验证结果
+            source_index: 源文件索引，默认每个流水线独立创建（并发的流水线互不重置对方的源码根目录）
         """
         self.cwe_type = cwe_type
         self.use_cache = use_cache
+        self.incremental = incremental
         
         # 初始化组件
         self.codeql = CodeQLManager(
             codeql_path=config.CODEQL_PATH,
             workspace_dir=config.CODEQL_WORKSPACE
         )
-        self.deepseek = DeepSeekClient()
         self.cache = CacheManager() if use_cache else None
+        label_store = APILabelStore() if use_cache and config.LABEL_STORE_ENABLED else None
+        self.deepseek = DeepSeekClient(label_store=label_store, cache=self.cache)
         self.sarif_parser = SARIFParser()
-        self.file_utils = FileUtils()
-        self.spec_extractor = SpecExtractor(self.codeql)
+        self.source_index = source_index or SourceIndex()
+        self.file_utils = FileUtils(self.source_index)
+        self.path_slicer = PathSlicer(self.source_index)
+        self.spec_extractor = SpecExtractor(self.codeql, self.file_utils)
         
         # 统计信息
         self.stats = {
             "files_scanned": 0,
             "external_apis_found": 0,
+            "unique_apis": 0,
             "source_candidates": 0,
             "sink_candidates": 0,
-            "llm_calls": 0,
+            "llm_calls": 0,           # 实际发出的LLM API请求
+            "llm_cache_hits": 0,      # 由LLM响应缓存直接返回的请求
             "cache_hits": 0,
             "vulnerabilities_found": 0,
             "vulnerabilities_filtered": 0,
             "vulnerabilities_confirmed": 0,
+            "files_changed": 0,
+            "specs_reused": 0,
             "start_time": None,
             "end_time": None
         }
@@ -65,7 +87,15 @@ class IRISPipeline:
         self.sink_cache = set()        # 已知安全的sink
         self.fp_sources = set()        # 已知误报的source
         self.fp_sinks = set()          # 已知误报的sink
+        self._fingerprints: Dict[Tuple[str, int, int], str] = {}  # (文件, 行, 上下文) -> 代码切片哈希
+        self._recalled_verdicts = set()  # 本次已查询过持久缓存的 (命名空间, 键)
+        self._stored_verdicts = set()    # 已在持久缓存中的 (命名空间, 键)，保存时跳过
         self.batch_size = 10            # 批处理大小
+        
+        # 增量模式状态（每次分析时重新加载）
+        self._manifest: Optional[ScanManifest] = None
+        self._file_hashes: Dict[str, str] = {}
+        self._unchanged_files = set()
 
     def _heuristic_filter(self, vuln: Dict) -> bool:
         """启发式过滤：判断是否应该跳过此路径"""
@@ -184,6 +214,11 @@ class IRISPipeline:
         logger.info(f"开始IRIS分析: {directory}")
         logger.info(f"CWE类型: {self.cwe_type or '全部'}")
         
+        self.source_index.reset([directory])
+        self._load_verdicts()
+        if self.incremental:
+            self._load_manifest(directory)
+        
         # ============ 阶段1: 创建CodeQL数据库 ============
         logger.info("="*60)
         logger.info("阶段1/4: 创建CodeQL数据库")
@@ -191,17 +226,205 @@ class IRISPipeline:
         db_path = self._create_database(directory)
         
         # ============ 阶段2: 提取候选API + LLM分类 ============
+        api_dicts, sources, sinks = self._extract_and_classify_apis(db_path)
+        
+        # ============ 阶段3: 动态生成查询并运行 ============
+        raw_vulnerabilities = self._run_taint_analysis(db_path, sources, sinks)
+        
+        self.stats["vulnerabilities_found"] = len(raw_vulnerabilities)
+        logger.info(f"发现 {len(raw_vulnerabilities)} 个潜在漏洞")
+        
+        # ============ 阶段4: LLM路径验证 ============
+        logger.info("="*60)
+        logger.info("阶段4/4: LLM路径验证")
+        logger.info("="*60)
+        
+        confirmed_vulnerabilities = self._validate_paths(raw_vulnerabilities)
+        self.stats["vulnerabilities_confirmed"] = len(confirmed_vulnerabilities)
+        
+        logger.info(f"验证通过: {len(confirmed_vulnerabilities)}/{len(raw_vulnerabilities)} 个漏洞")
+        
+        self.stats["end_time"] = time.time()
+        
+        # 生成报告
+        results = {
+            "cwe": self.cwe_type or "all",
+            "target": str(directory),
+            "vulnerabilities": confirmed_vulnerabilities,
+            "raw_vulnerabilities": raw_vulnerabilities[:10] if len(raw_vulnerabilities) > 10 else raw_vulnerabilities,
+            "stats": self.stats.copy(),
+            "specs": {
+                "sources": sources[:20],
+                "sinks": sinks[:20]
+            }
+        }
+        
+        # 保存结果
+        self._save_results(results)
+        self._save_verdicts()
+        
+        if self._manifest is not None:
+            self._manifest.update(self._file_hashes, api_dicts, self.path_cache)
+            self._manifest.save()
+        
+        # 打印统计
+        self._print_summary()
+        
+        return results
+    
+    def analyze_directory_multi(self, directory: Path, cwe_types: List[str] = None) -> Dict:
+        """
+        多CWE单遍分析 - 数据库、API提取和LLM分类只做一次
+        
+        每个API在一次LLM调用中同时标注所有CWE的角色，所有CWE的污点查询
+        在一次 database analyze 中运行，再按ruleId把结果拆回各CWE。
+        
+        Args:
+            directory: 目标目录
+            cwe_types: CWE类型列表，None表示 config.SUPPORTED_CWES
+            
+        Returns:
+            分析结果（by_cwe 中为各CWE的结果）
+        """
+        cwe_types = cwe_types or list(config.SUPPORTED_CWES)
+        self.stats["start_time"] = time.time()
+        self.source_index.reset([directory])
+        
+        logger.info(f"开始IRIS多CWE分析: {directory}")
+        logger.info(f"CWE类型: {', '.join(cwe_types)}")
+        
+        # ============ 阶段1: 创建CodeQL数据库（一次） ============
+        logger.info("="*60)
+        logger.info("阶段1/4: 创建CodeQL数据库")
+        logger.info("="*60)
+        db_path = self._create_database(directory)
+        
+        # ============ 阶段2: 提取候选API + 一遍LLM分类 ============
+        logger.info("="*60)
+        logger.info("阶段2/4: 候选API提取与多CWE LLM分类")
+        logger.info("="*60)
+        api_dicts = [api.to_dict() for api in self.spec_extractor.iter_candidate_apis(db_path)]
+        logger.info(f"提取到 {len(api_dicts)} 个候选API")
+        groups = self._group_call_sites(api_dicts)
+        self.deepseek.infer_multi_cwe_specs([group.representative for group in groups], cwe_types)
+        fan_out_labels(groups)
+        
+        specs_by_cwe = {}
+        for cwe in cwe_types:
+            labeled = [(api, api.get("llm_labels", {}).get(cwe)) for api in api_dicts]
+            sources = [
+                {**api, "llm_label": "source", "llm_confidence": label["confidence"]}
+                for api, label in labeled
+                if label and label["type"] == "source" and label.get("confidence", 0) > 60
+            ]
+            sinks = [
+                {**api, "llm_label": "sink", "llm_confidence": label["confidence"], "sink_args": label.get("sink_args", [])}
+                for api, label in labeled
+                if label and label["type"] == "sink" and label.get("confidence", 0) > 60
+            ]
+            specs_by_cwe[cwe] = (sources, sinks)
+            logger.info(f"  - {cwe}: {len(sources)} sources, {len(sinks)} sinks")
+        
+        self.stats["source_candidates"] = sum(len(s) for s, _ in specs_by_cwe.values())
+        self.stats["sink_candidates"] = sum(len(k) for _, k in specs_by_cwe.values())
+        
+        # ============ 阶段3: 所有CWE查询一次运行，按ruleId拆分 ============
+        logger.info("="*60)
+        logger.info("阶段3/4: 多CWE污点查询")
+        logger.info("="*60)
+        
+        query_paths = []
+        rule_to_cwe = {}
+        for cwe, (sources, sinks) in specs_by_cwe.items():
+            if sources or sinks:
+                query_paths.append(self._generate_cwe_query(sources, sinks, cwe))
+                rule_to_cwe[self._query_rule_id(cwe)] = cwe
+        
+        vulns_by_cwe = defaultdict(list)
+        if query_paths:
+            results_path = self.codeql.run_custom_queries(db_path, query_paths)
+            for vuln in self.codeql.extract_results(results_path, rule_to_cwe):
+                if vuln.get("cwe") in specs_by_cwe:
+                    vulns_by_cwe[vuln["cwe"]].append(vuln)
+                else:
+                    logger.warning(f"无法识别的规则 {vuln.get('rule')}，已忽略")
+        else:
+            logger.warning("没有找到source或sink，跳过污点分析")
+        
+        self.stats["vulnerabilities_found"] = sum(len(v) for v in vulns_by_cwe.values())
+        logger.info(f"发现 {self.stats['vulnerabilities_found']} 个潜在漏洞")
+        
+        # ============ 阶段4: 按CWE分别验证 ============
+        logger.info("="*60)
+        logger.info("阶段4/4: LLM路径验证")
+        logger.info("="*60)
+        
+        by_cwe = {}
+        all_confirmed = []
+        original_state = (self.cwe_type, self.path_cache, self.source_cache, self.sink_cache,
+                          self.fp_sources, self.fp_sinks)
+        try:
+            for cwe in cwe_types:
+                # 验证缓存按CWE隔离，避免一个CWE的误报结论影响其他CWE
+                self.cwe_type = cwe
+                self.path_cache, self.source_cache, self.sink_cache = {}, set(), set()
+                self.fp_sources, self.fp_sinks = set(), set()
+                self._load_verdicts()
+                
+                raw = vulns_by_cwe.get(cwe, [])
+                confirmed = self._validate_paths(raw)
+                all_confirmed.extend(confirmed)
+                self._save_verdicts()
+                
+                sources, sinks = specs_by_cwe[cwe]
+                by_cwe[cwe] = {
+                    "vulnerabilities": confirmed,
+                    "raw_vulnerabilities": raw[:10],
+                    "specs": {"sources": sources[:20], "sinks": sinks[:20]}
+                }
+        finally:
+            (self.cwe_type, self.path_cache, self.source_cache, self.sink_cache,
+             self.fp_sources, self.fp_sinks) = original_state
+        
+        self.stats["vulnerabilities_confirmed"] = len(all_confirmed)
+        self.stats["end_time"] = time.time()
+        
+        results = {
+            "cwe": "multi",
+            "cwes": cwe_types,
+            "target": str(directory),
+            "vulnerabilities": all_confirmed,
+            "by_cwe": by_cwe,
+            "stats": self.stats.copy()
+        }
+        
+        self._save_results(results)
+        self._print_summary()
+        
+        return results
+    
+    def _extract_and_classify_apis(self, db_path: Path, per_file: bool = False) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """
+        阶段2: 提取候选API并用LLM分类
+        
+        Args:
+            db_path: 数据库路径
+            per_file: 按文件分别合并调用点（同一API在不同文件中按各自的上下文分类）
+        
+        Returns:
+            (全部候选API, sources, sinks)
+        """
         logger.info("="*60)
         logger.info("阶段2/4: 候选API提取与LLM分类")
         logger.info("="*60)
         
         # 2.1 提取所有候选API（不区分source/sink）
         logger.info("提取所有候选API...")
-        candidate_apis = self.spec_extractor.extract_candidate_apis(db_path)
+        api_dicts = [api.to_dict() for api in self.spec_extractor.iter_candidate_apis(db_path)]
+        logger.info(f"提取到 {len(api_dicts)} 个候选API")
         
         # 2.2 LLM分类
         logger.info("用LLM分类API为source/sink...")
-        api_dicts = [api.to_dict() for api in candidate_apis]
         
         sources = []
         sinks = []
@@ -209,12 +432,17 @@ class IRISPipeline:
             cwe_desc = CWE_DESCRIPTIONS.get(self.cwe_type, "")
             few_shot = FEW_SHOT_EXAMPLES.get(self.cwe_type, [])
             
-            classified_apis = self.deepseek.infer_source_sink_specs(
-                apis=api_dicts,
+            # 增量模式下只推断变化文件中的API，相同API只推断一次后回填到每个调用点
+            pending_apis = self._reuse_previous_specs(api_dicts)
+            groups = self._group_call_sites(pending_apis, per_file)
+            self.deepseek.infer_source_sink_specs(
+                apis=[group.representative for group in groups],
                 cwe_type=self.cwe_type,
                 cwe_description=cwe_desc,
                 few_shot_examples=few_shot
             )
+            fan_out_labels(groups)
+            classified_apis = api_dicts
             
             # 分类结果
             sources = [a for a in classified_apis if a.get("llm_label") == "source" and a.get("llm_confidence", 0) > 60]
@@ -227,60 +455,27 @@ class IRISPipeline:
             logger.info(f"  - Sources: {len(sources)}个")
             logger.info(f"  - Sinks: {len(sinks)}个")
         
-        # ============ 阶段3: 动态生成查询并运行 ============
+        return api_dicts, sources, sinks
+    
+    def _run_taint_analysis(self, db_path: Path, sources: List[Dict], sinks: List[Dict]) -> List[Dict]:
+        """阶段3: 动态生成污点查询并运行，返回原始漏洞列表"""
         logger.info("="*60)
         logger.info("阶段3/4: 动态生成污点查询")
         logger.info("="*60)
         
-        if sources or sinks:
-            # 3.1 生成完整查询
-            query_path = self._generate_cwe_query(sources, sinks, self.cwe_type)
-            
-            # 3.2 运行查询
-            logger.info("运行动态生成的污点查询...")
-            results_path = self.codeql.run_custom_query(db_path, query_path)
-            
-            # 3.3 解析结果
-            raw_vulnerabilities = self.codeql.extract_results(results_path)
-        else:
+        if not (sources or sinks):
             logger.warning("没有找到source或sink，跳过污点分析")
-            raw_vulnerabilities = []
-        
-        self.stats["vulnerabilities_found"] = len(raw_vulnerabilities)
-        logger.info(f"发现 {len(raw_vulnerabilities)} 个潜在漏洞")
-        
-        # ============ 阶段4: LLM路径验证 ============
-        logger.info("="*60)
-        logger.info("阶段4/4: LLM路径验证")
-        logger.info("="*60)
-        
-        confirmed_vulnerabilities = self._validate_paths(raw_vulnerabilities)
-        self.stats["vulnerabilities_confirmed"] = len(confirmed_vulnerabilities)
-        
-        logger.info(f"验证通过: {len(confirmed_vulnerabilities)}/{len(raw_vulnerabilities)} 个漏洞")
-        
-        self.stats["end_time"] = time.time()
-        
-        # 生成报告
-        results = {
-            "cwe": self.cwe_type or "all",
-            "target": str(directory),
-            "vulnerabilities": confirmed_vulnerabilities,
-            "raw_vulnerabilities": raw_vulnerabilities[:10] if len(raw_vulnerabilities) > 10 else raw_vulnerabilities,
-            "stats": self.stats.copy(),
-            "specs": {
-                "sources": sources[:20],
-                "sinks": sinks[:20]
-            }
-        }
+            return []
         
-        # 保存结果
-        self._save_results(results)
+        # 3.1 生成完整查询
+        query_path = self._generate_cwe_query(sources, sinks, self.cwe_type)
         
-        # 打印统计
-        self._print_summary()
+        # 3.2 运行查询
+        logger.info("运行动态生成的污点查询...")
+        results_path = self.codeql.run_custom_query(db_path, query_path)
         
-        return results
+        # 3.3 解析结果
+        return self.codeql.extract_results(results_path)
     
     def analyze_file(self, file_path: Path) -> Dict:
         """分析单个文件 - 为基准测试优化"""
@@ -295,91 +490,279 @@ class IRISPipeline:
         finally:
             shutil.rmtree(temp_dir, ignore_errors=True)
     
-    def _create_database(self, directory: Path) -> Path:
-        """创建CodeQL数据库"""
+    def analyze_files(self, file_paths: List[Path]) -> Dict[str, Dict]:
+        """
+        批量分析多个文件 - 所有文件共享一个CodeQL数据库
+        
+        建库、API提取、规范推断和污点查询只执行一次，然后按SARIF中的
+        artifact URI把结果拆回各文件，逐文件做路径验证。
+        
+        结果与逐个 analyze_file 保持一致：规范推断按文件合并调用点，同一API在各文件中
+        按自己的上下文分类；污点查询使用所有文件规范的并集，拆回各文件时丢弃只能由
+        其他文件的规范解释、或经过其他文件的路径。
+        
+        Args:
+            file_paths: 文件路径列表
+            
+        Returns:
+            {文件路径: 与 analyze_file 结构相同的结果}
+        """
+        import tempfile
+        import shutil
+        
+        if not file_paths:
+            return {}
+        
+        self.stats["start_time"] = time.time()
+        self._load_verdicts()
+        temp_dir = Path(tempfile.mkdtemp(prefix="benchmark_batch_"))
+        self.source_index.reset([temp_dir])
+        
         try:
-            return self.codeql.create_database(directory, language="python")
-        except Exception as e:
-            logger.error(f"创建数据库失败: {e}")
-            raise
+            # 复制文件，同名文件放到编号子目录，记录 artifact URI -> 原文件
+            uri_to_file = {}
+            for i, file_path in enumerate(file_paths):
+                uri = file_path.name
+                if uri in uri_to_file:
+                    uri = f"{i}/{file_path.name}"
+                    (temp_dir / str(i)).mkdir()
+                shutil.copy2(file_path, temp_dir / uri)
+                uri_to_file[uri] = file_path
+            
+            logger.info(f"开始IRIS批量分析: {len(file_paths)} 个文件")
+            self.stats["files_scanned"] = len(file_paths)
+            
+            # ============ 阶段1-3: 共享数据库，只运行一次 ============
+            logger.info("="*60)
+            logger.info("阶段1/4: 创建CodeQL数据库（批量共享）")
+            logger.info("="*60)
+            db_path = self._create_database(temp_dir)
+            api_dicts, sources, sinks = self._extract_and_classify_apis(db_path, per_file=True)
+            raw_vulnerabilities = self._run_taint_analysis(db_path, sources, sinks)
+            
+            apis_by_uri = defaultdict(list)
+            for api in api_dicts:
+                apis_by_uri[api.get("file", "")].append(api)
+            
+            vulns_by_uri = defaultdict(list)
+            for vuln in raw_vulnerabilities:
+                uri = vuln.get("file", "")
+                if self._explained_by_file_specs(vuln, apis_by_uri[uri]):
+                    vulns_by_uri[uri].append(vuln)
+            
+            self.stats["vulnerabilities_found"] = sum(len(vulns) for vulns in vulns_by_uri.values())
+            logger.info(f"发现 {self.stats['vulnerabilities_found']} 个潜在漏洞 "
+                        f"(丢弃 {len(raw_vulnerabilities) - self.stats['vulnerabilities_found']} 个跨文件规范的路径)")
+            
+            # ============ 阶段4: 逐文件验证 ============
+            logger.info("="*60)
+            logger.info("阶段4/4: LLM路径验证（逐文件）")
+            logger.info("="*60)
+            
+            all_results = {}
+            total_confirmed = 0
+            total_cache_hits = 0
+            for uri, file_path in uri_to_file.items():
+                file_vulns = vulns_by_uri.get(uri, [])
+                file_sources = [a for a in sources if a.get("file") == uri]
+                file_sinks = [a for a in sinks if a.get("file") == uri]
+                
+                llm_calls_before = self.stats["llm_calls"]
+                llm_cache_hits_before = self.stats["llm_cache_hits"]
+                self.stats["cache_hits"] = 0
+                confirmed = self._validate_paths(file_vulns)
+                total_confirmed += len(confirmed)
+                total_cache_hits += self.stats["cache_hits"]
+                
+                file_stats = self.stats.copy()
+                file_stats.update({
+                    "files_scanned": 1,
+                    "source_candidates": len(file_sources),
+                    "sink_candidates": len(file_sinks),
+                    "llm_calls": self.stats["llm_calls"] - llm_calls_before,
+                    "llm_cache_hits": self.stats["llm_cache_hits"] - llm_cache_hits_before,
+                    "vulnerabilities_found": len(file_vulns),
+                    "vulnerabilities_confirmed": len(confirmed),
+                    "end_time": time.time()
+                })
+                
+                all_results[str(file_path)] = {
+                    "cwe": self.cwe_type or "all",
+                    "target": str(file_path),
+                    "vulnerabilities": confirmed,
+                    "raw_vulnerabilities": file_vulns[:10],
+                    "stats": file_stats,
+                    "specs": {
+                        "sources": file_sources[:20],
+                        "sinks": file_sinks[:20]
+                    }
+                }
+            
+            self.stats["vulnerabilities_confirmed"] = total_confirmed
+            self.stats["cache_hits"] = total_cache_hits
+            self.stats["end_time"] = time.time()
+            
+            self._save_results({
+                "cwe": self.cwe_type or "all",
+                "targets": [str(p) for p in file_paths],
+                "results": all_results,
+                "stats": self.stats.copy()
+            })
+            self._save_verdicts()
+            self._print_summary()
+            
+            return all_results
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
     
-    def _generate_qll_files(self, sources: List[Dict], sinks: List[Dict], output_dir: Path):
-        """生成MySources.qll和MySinks.qll文件"""
+    def _load_manifest(self, directory: Path):
+        """增量模式：对比上次扫描清单，预加载未变化文件的验证结果"""
+        self._manifest = ScanManifest.load(directory, self.cwe_type)
+        self._file_hashes = FileUtils.get_tree_hashes(directory)
         
-        import re
+        changed = self._manifest.diff(self._file_hashes)
+        self._unchanged_files = set(self._file_hashes) - changed
+        self.stats["files_changed"] = len(changed)
         
-        # 生成MySources.qll
-        sources_content = "import python\nimport semmle.python.ApiGraphs\n\n"
-        sources_content += "class MySources extends DataFlow::Node {\n"
-        sources_content += "  MySources() {\n    exists(API::CallNode call |\n"
+        if self._manifest.is_empty:
+            logger.info("增量模式: 没有上次扫描记录，执行全量扫描")
+            return
         
-        source_rules = []
-        for src in sources:
-            method = src.get('method', '')
-            # 提取纯方法名
-            if 'Found API call:' in method:
-                method = method.replace('Found API call:', '').strip()
-            # 去掉括号
-            method = method.split('(')[0].strip()
-            
-            if method:
-                source_rules.append(
-                    f'      call = API::moduleImport("builtins").getMember("{method}").getACall()'
-                )
+        logger.info(f"增量模式: {len(changed)} 个文件变化, {len(self._unchanged_files)} 个未变化")
+        
+        # 涉及文件全部未变化的路径直接复用上次的验证结论
+        self.path_cache.update(self._manifest.reusable_verdicts(self._unchanged_files))
+    
+    def _reuse_previous_specs(self, api_dicts: List[Dict]) -> List[Dict]:
+        """增量模式：为未变化文件中的API复用上次的分类结果，返回仍需LLM推断的API"""
+        if self._manifest is None or self._manifest.is_empty:
+            return api_dicts
+        
+        previous = self._manifest.reusable_specs(self._unchanged_files)
+        pending = []
+        reused = 0
+        for api in api_dicts:
+            spec = previous.get(ScanManifest.api_key(api))
+            if spec:
+                for field in ScanManifest.SPEC_FIELDS:
+                    api[field] = spec.get(field)
+                reused += 1
+            else:
+                pending.append(api)
+        
+        self.stats["specs_reused"] = reused
+        logger.info(f"增量模式: 复用 {reused} 个API分类, 需要推断 {len(pending)} 个")
+        return pending
+    
+    def _group_call_sites(self, api_dicts: List[Dict], per_file: bool = False) -> List[APIGroup]:
+        """
+        按 (package, class, method) 合并调用点，LLM提示词规模随API种类而非调用次数增长
         
-        if source_rules:
-            sources_content += " or\n".join(source_rules)
-            sources_content += "\n    )\n  }\n}\n"
+        Args:
+            api_dicts: 候选API
+            per_file: 只合并同一文件内的调用点
+        """
+        max_contexts = config.IRIS_CONFIG.get("API_CONTEXT_SAMPLES", 3)
+        if per_file:
+            by_file = defaultdict(list)
+            for api in api_dicts:
+                by_file[api.get("file", "")].append(api)
+            groups = [group for apis in by_file.values() for group in group_call_sites(apis, max_contexts)]
         else:
-            sources_content += "      none()\n    )\n  }\n}\n"
+            groups = group_call_sites(api_dicts, max_contexts)
+        self.stats["external_apis_found"] = len(api_dicts)
+        self.stats["unique_apis"] = len(groups)
+        logger.info(f"合并调用点: {len(api_dicts)} 个调用点 -> {len(groups)} 个唯一API")
+        return groups
+    
+    def _explained_by_file_specs(self, vuln: Dict, file_apis: List[Dict]) -> bool:
+        """
+        批量模式：路径能否只用所在文件自己的规范解释（单独分析该文件时也会报告）
         
-        # 生成MySinks.qll
-        sinks_content = "import python\nimport semmle.python.ApiGraphs\n\n"
-        sinks_content += "class MySinks extends DataFlow::Node {\n"
-        sinks_content += "  MySinks() {\n    exists(API::CallNode call |\n"
+        路径不能经过其他文件；source/sink行上有候选API调用时，其中至少一个在本文件中
+        被分类为source/sink（行上没有候选API时无法判断，保留）。
+        """
+        uri = vuln.get("file", "")
+        if self._path_files(vuln) not in ([uri], []):
+            return False
         
-        sink_rules = []
-        for snk in sinks:
-            method = snk.get('method', '')
+        ends = (("source", (vuln.get("source") or {}).get("line")), ("sink", vuln.get("line")))
+        for label, line in ends:
+            calls = [api for api in file_apis if api.get("line") == line]
+            labelled = [api for api in calls
+                        if api.get("llm_label") == label and api.get("llm_confidence", 0) > 60]
+            if calls and not labelled:
+                return False
+        return True
+    
+    @staticmethod
+    def _path_files(vuln: Dict) -> List[str]:
+        """路径涉及的所有文件"""
+        files = {vuln.get("file", ""), vuln.get("source", {}).get("file", "")}
+        files.update(node.get("file", "") for node in vuln.get("path", []))
+        files.discard("")
+        return sorted(files)
+    
+    def _create_database(self, directory: Path) -> Path:
+        """创建CodeQL数据库"""
+        try:
+            return self.codeql.create_database(directory, language="python")
+        except Exception as e:
+            logger.error(f"创建数据库失败: {e}")
+            raise
+    
+    @staticmethod
+    def _normalize_spec_methods(specs: List[Dict]) -> List[str]:
+        """提取规范中的纯方法名，去重排序（同一规范集合总是生成相同的查询）"""
+        methods = set()
+        for spec in specs:
+            method = spec.get('method', '')
             # 提取纯方法名
             if 'Found API call:' in method:
                 method = method.replace('Found API call:', '').strip()
             # 去掉括号
             method = method.split('(')[0].strip()
-            
             if method:
-                sink_rules.append(
-                    f'      call = API::moduleImport("builtins").getMember("{method}").getACall()'
-                )
+                methods.add(method)
+        return sorted(methods)
+    
+    @staticmethod
+    def _build_qll_content(class_name: str, methods: List[str]) -> str:
+        """生成MySources/MySinks类定义"""
+        content = "import python\nimport semmle.python.ApiGraphs\n\n"
+        content += f"class {class_name} extends DataFlow::Node {{\n"
+        content += f"  {class_name}() {{\n    exists(API::CallNode call |\n"
+        
+        rules = [
+            f'      call = API::moduleImport("builtins").getMember("{method}").getACall()'
+            for method in methods
+        ]
         
-        if sink_rules:
-            sinks_content += " or\n".join(sink_rules)
-            sinks_content += "\n    )\n  }\n}\n"
+        if rules:
+            content += " or\n".join(rules)
+            content += "\n    )\n  }\n}\n"
         else:
-            sinks_content += "      none()\n    )\n  }\n}\n"
+            content += "      none()\n    )\n  }\n}\n"
+        return content
+    
+    def _generate_qll_files(self, sources: List[Dict], sinks: List[Dict], output_dir: Path):
+        """生成MySources.qll和MySinks.qll文件"""
+        source_methods = self._normalize_spec_methods(sources)
+        sink_methods = self._normalize_spec_methods(sinks)
         
         # 保存文件
         output_dir.mkdir(parents=True, exist_ok=True)
         with open(output_dir / "MySources.qll", 'w', encoding='utf-8') as f:
-            f.write(sources_content)
+            f.write(self._build_qll_content("MySources", source_methods))
         with open(output_dir / "MySinks.qll", 'w', encoding='utf-8') as f:
-            f.write(sinks_content)
+            f.write(self._build_qll_content("MySinks", sink_methods))
         
         logger.info(f"生成QLL文件: {output_dir}")
-        logger.info(f"  - Sources规则: {len(source_rules)}")
-        logger.info(f"  - Sinks规则: {len(sink_rules)}")
+        logger.info(f"  - Sources规则: {len(source_methods)}")
+        logger.info(f"  - Sinks规则: {len(sink_methods)}")
     
-    def _generate_cwe_query(self, sources: List[Dict], sinks: List[Dict], cwe_type: str) -> Path:
-        """为指定CWE生成完整查询"""
-        
-        # 1. 创建临时目录存放qll文件
-        import tempfile
-        qll_dir = Path(tempfile.mkdtemp(prefix=f"qll_{cwe_type}_"))
-        
-        # 2. 生成qll文件
-        self._generate_qll_files(sources, sinks, qll_dir)
-        
-        # 3. 获取模板路径
+    def _get_query_template(self, cwe_type: str) -> str:
+        """读取CWE查询模板"""
         cwe_lower = cwe_type.lower().replace('-', '')
         template_path = Path(f"/home/hanahanarange/PySafeScan/custom-queries/{cwe_lower}_template.ql")
         
@@ -387,11 +770,39 @@ class IRISPipeline:
             template_path = Path("/home/hanahanarange/PySafeScan/custom-queries/cwe22_template.ql")
             logger.warning(f"未找到模板 {cwe_lower}_template.ql，使用cwe22_template.ql代替")
         
-        # 4. 读取模板
         with open(template_path, 'r', encoding='utf-8') as f:
-            query = f.read()
+            return f.read()
+    
+    def _generate_cwe_query(self, sources: List[Dict], sinks: List[Dict], cwe_type: str) -> Path:
+        """
+        为指定CWE生成完整查询
+        
+        查询包按（规范化的source/sink集合, CWE模板）内容寻址缓存，
+        相同规范集合直接复用已生成并预编译的查询。
+        """
+        import hashlib
         
-        # 5. 创建qll文件包（在qll_dir下创建qlpack.yml）
+        # 1. 计算查询包的内容哈希
+        cwe_lower = cwe_type.lower().replace('-', '')
+        query = self._get_query_template(cwe_type)
+        query_key = hashlib.sha256(json.dumps({
+            "cwe": cwe_type,
+            "template": query,
+            "sources": self._normalize_spec_methods(sources),
+            "sinks": self._normalize_spec_methods(sinks)
+        }, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+        
+        cached_dir = self.codeql.query_cache.get(query_key)
+        if cached_dir:
+            query_path = self._select_query_file(cached_dir)
+            logger.info(f"查询缓存命中: {query_path}")
+            return query_path
+        
+        # 2. 在缓存目录中生成qll文件
+        qll_dir = self.codeql.query_cache.path_for(query_key)
+        self._generate_qll_files(sources, sinks, qll_dir)
+        
+        # 3. 创建qll文件包（在qll_dir下创建qlpack.yml）
         qlpack_path = qll_dir / "qlpack.yml"
         with open(qlpack_path, 'w', encoding='utf-8') as f:
             f.write(f"""
@@ -401,7 +812,7 @@ dependencies:
   codeql/python-all: '*'
 """)
         
-        # 6. 添加import语句（使用相对路径）
+        # 4. 添加import语句（使用相对路径）
         import_stmt = f'import MySources\nimport MySinks\n'
         
         # 在最后一个import之后插入
@@ -418,53 +829,32 @@ dependencies:
         
         modified_query = '\n'.join(lines)
         
-        # 7. 保存完整查询
+        # 统一规则ID，多CWE扫描时按ruleId拆分结果
+        modified_query = re.sub(r'@id\s+\S+', f'@id {self._query_rule_id(cwe_type)}', modified_query, count=1)
+        
+        # 5. 保存完整查询并预编译
         query_path = qll_dir / "final.ql"
         with open(query_path, 'w', encoding='utf-8') as f:
             f.write(modified_query)
         
+        self.codeql.compile_query(query_path)
+        self.codeql.query_cache.put(query_key, {"cwe": cwe_type})
+        
+        query_path = self._select_query_file(qll_dir)
         logger.info(f"生成完整查询: {query_path}")
         return query_path
     
-    def _cluster_paths(self, vulnerabilities: List[Dict]) -> List[Dict]:
-        """按路径特征聚类，每类只选一个代表"""
-        clusters = {}
-        
-        for vuln in vulnerabilities:
-            # 提取source位置
-            source = vuln.get("source", {})
-            source_file = source.get("file", "")
-            source_line = source.get("line", 0)
-            
-            # 提取sink位置
-            sink_file = vuln.get("file", "")
-            sink_line = vuln.get("line", 0)
-            
-            # 提取关键函数（从path中）
-            path = vuln.get("path", [])
-            key_functions = []
-            for node in path[:3]:  # 只取前3个
-                code = node.get("code", "")
-                if any(f in code for f in ["request", "get", "open", "execute"]):
-                    key_functions.append(code[:20])
-            
-            # 生成聚类key
-            cluster_key = (
-                f"{source_file}:{source_line}",
-                f"{sink_file}:{sink_line}",
-                len(path),
-                tuple(key_functions)
-            )
-            
-            clusters.setdefault(cluster_key, []).append(vuln)
-        
-        # 每类只取第一个
-        representatives = [cluster[0] for cluster in clusters.values()]
-        logger.info(f"路径聚类: {len(vulnerabilities)} → {len(representatives)}")
-        
-        return representatives
-
-
+    @staticmethod
+    def _query_rule_id(cwe_type: str) -> str:
+        """生成查询的规则ID"""
+        return f"pysafescan/{cwe_type.lower().replace('-', '')}"
+    
+    @staticmethod
+    def _select_query_file(query_dir: Path) -> Path:
+        """优先使用预编译的 .qlx，否则使用 .ql 源文件"""
+        qlx_path = query_dir / "final.qlx"
+        return qlx_path if qlx_path.exists() else query_dir / "final.ql"
+    
     def _validate_paths(self, vulnerabilities: List[Dict]) -> List[Dict]:
         """验证漏洞路径 - IRIS方式：每组只验证一次"""
         if not vulnerabilities:
@@ -472,109 +862,263 @@ dependencies:
 
         from collections import defaultdict
 
-        # ============ 第1层：按真实source-sink对聚类 ============
+        # ============ 第1层：按 (source, sink, 路径指纹) 聚类 ============
         path_groups = defaultdict(list)
         for vuln in vulnerabilities:
-            # 从path中找真实source
-            path = vuln.get("path", [])
-            real_source = "unknown:0"
-            for node in path:
-                node_msg = node.get("message", "")
-                if any(key in node_msg for key in ["request", "cookies", "args", "get", "param"]):
-                    real_source = f"{node.get('file')}:{node.get('line')}"
-                    break
+            # source是路径的第一个节点（每条代码流单独成为一个漏洞）；
+            # 同一source-sink对之间的不同路径（如一条经过消毒函数、一条没有）分别验证
+            source = vuln.get("source") or {}
+            real_source = f"{source.get('file') or 'unknown'}:{source.get('line') or 0}"
             
             sink_file = vuln.get("file", "")
             sink_line = vuln.get("line", 0)
-            group_key = f"{real_source}->{sink_file}:{sink_line}"
+            group_key = f"{real_source}->{sink_file}:{sink_line}#{self._flow_key(vuln)[:12]}"
             path_groups[group_key].append(vuln)
 
         print(f"\n聚类前: {len(vulnerabilities)}条, 聚类后: {len(path_groups)}组")
 
-        # ============ 第2层：每组只验证一次 ============
-        confirmed = []
+        # ============ 第2层：每组只验证一次（并发） ============
+        groups = list(path_groups.items())
+        outcomes: List[Optional[List[Dict]]] = [None] * len(groups)
         cache_hits = 0
-        
-        for group_key, group in path_groups.items():
-            # 取组内第一条作为代表
-            rep_vuln = group[0]
+        # 本次已经给出结论的 source-sink 对：同一对的其他路径不因该对的误报被跳过
+        judged_pairs = set()
+        
+        # 分轮处理：某组只有在与它共享 source/sink/路径键的前序组都已有结论后才能判定，
+        # 因此每轮把无依赖的组并发送去验证，再按组顺序写回缓存，结果与串行一致
+        while any(outcome is None for outcome in outcomes):
+            pending_keys = set()
+            to_validate = []
             
-            # 检查source/sink缓存
-            source = rep_vuln.get("source", {})
-            sink_file = rep_vuln.get("file", "")
-            sink_line = rep_vuln.get("line", 0)
-            source_key = f"{source.get('file')}:{source.get('line')}"
-            sink_key = f"{sink_file}:{sink_line}"
+            for index, (group_key, group) in enumerate(groups):
+                if outcomes[index] is not None:
+                    continue
+                
+                keys = self._group_keys(group[0])
+                self._recall_verdicts(keys)
+                if pending_keys.isdisjoint(keys):
+                    source_key, sink_key, cache_key = (key for _, key in keys)
+                    
+                    # 检查路径缓存（这条路径本身的结论优先于source/sink级的误报推断）
+                    if cache_key in self.path_cache:
+                        # 整组都算确认
+                        outcomes[index] = group if self.path_cache[cache_key].get("is_vulnerable", False) else []
+                        judged_pairs.add((source_key, sink_key))
+                        cache_hits += 1
+                        print(f"缓存命中: {group_key}")
+                        continue
+                    
+                    # 检查source/sink缓存（同一source-sink对的其他路径仍然单独验证）
+                    if ((source_key in self.source_cache or sink_key in self.sink_cache)
+                            and (source_key, sink_key) not in judged_pairs):
+                        print(f"跳过已知误报: {group_key}")
+                        outcomes[index] = []
+                        continue
+                    
+                    print(f"验证代表: {group_key}")
+                    to_validate.append(index)
+                
+                pending_keys.update(keys)
             
-            if source_key in self.source_cache or sink_key in self.sink_cache:
-                print(f"跳过已知误报: {group_key}")
-                continue
+            usage_before = self._llm_usage()
+            results = self._validate_representatives([groups[index][1][0] for index in to_validate])
+            self._add_llm_usage(usage_before)
             
-            # 检查路径缓存
-            cache_key = self._get_path_key(rep_vuln)
-            if cache_key in self.path_cache:
-                if self.path_cache[cache_key].get("is_vulnerable", False):
+            for index, result in zip(to_validate, results):
+                group = groups[index][1]
+                rep_vuln = group[0]
+                source_key, sink_key, cache_key = (key for _, key in self._group_keys(rep_vuln))
+                judged_pairs.add((source_key, sink_key))
+                
+                # 保存缓存
+                self.path_cache[cache_key] = {
+                    "is_vulnerable": result.get("is_vulnerable", False),
+                    "files": self._path_files(rep_vuln)
+                }
+                
+                if result.get("is_vulnerable", False):
                     # 整组都算确认
-                    confirmed.extend(group)
-                cache_hits += 1
-                print(f"缓存命中: {group_key}")
-                continue
-            
-            # 验证代表路径
-            print(f"验证代表: {group_key}")
-            result = self._validate_single(rep_vuln)
-            
-            # 保存缓存
-            self.path_cache[cache_key] = {"is_vulnerable": result.get("is_vulnerable", False)}
-            
-            if result.get("is_vulnerable", False):
-                # 整组都算确认
-                confirmed.extend(group)
-            else:
-                # 记录误报，整组跳过
-                self.source_cache.add(source_key)
-                self.sink_cache.add(sink_key)
+                    outcomes[index] = group
+                else:
+                    # 记录误报，整组跳过
+                    outcomes[index] = []
+                    self.source_cache.add(source_key)
+                    self.sink_cache.add(sink_key)
+        
+        confirmed = [vuln for outcome in outcomes for vuln in outcome]
         
         self.stats["cache_hits"] = cache_hits
         print(f"缓存命中: {cache_hits}, 最终确认: {len(confirmed)}")
         
         return confirmed
 
-    def _validate_single(self, vuln: Dict) -> Dict:
-        """验证单个漏洞路径"""
-        source, source_context = self._extract_source_info(vuln)
-        sink_context = self._extract_sink_info(vuln)
+    def _llm_usage(self) -> Tuple[int, int]:
+        """DeepSeek客户端累计的 (实际API请求数, 响应缓存命中数)"""
+        stats = self.deepseek.get_stats()
+        return stats.get("calls", 0), stats.get("cache_hits", 0)
+    
+    def _add_llm_usage(self, before: Tuple[int, int]):
+        """把 before 之后的LLM请求计入统计：只有实际API请求计为 llm_calls"""
+        calls, cache_hits = self._llm_usage()
+        self.stats["llm_calls"] += calls - before[0]
+        self.stats["llm_cache_hits"] += cache_hits - before[1]
+    
+    @staticmethod
+    def _flow_key(vuln: Dict) -> str:
+        """路径指纹：extract_results 生成的 flow_key，没有时按路径节点的位置和代码计算"""
+        if vuln.get("flow_key") is not None:
+            return vuln["flow_key"]
+        parts = (f"{node.get('file')}:{node.get('line')}:{node.get('code', '')}" for node in vuln.get("path", []))
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:32]
+
+    def _group_keys(self, rep_vuln: Dict) -> Tuple[Tuple[str, str], ...]:
+        """代表路径在误报缓存和路径缓存中使用的键（带命名空间）"""
+        source = rep_vuln.get("source", {})
+        source_key = self._site_key(source.get("file"), source.get("line"))
+        sink_key = self._site_key(rep_vuln.get("file", ""), rep_vuln.get("line", 0))
+        return (("source", source_key), ("sink", sink_key), ("path", self._get_path_key(rep_vuln)))
+
+    def _validate_representatives(self, vulns: List[Dict]) -> List[Dict]:
+        """并发验证多条代表路径，结果与输入顺序一致"""
+        if not vulns:
+            return []
         
-        path = vuln.get("path", [])
+        max_workers = config.IRIS_CONFIG.get("VALIDATION_WORKERS", 4)
+        timeout = config.IRIS_CONFIG.get("VALIDATION_TIMEOUT")
+        if len(vulns) == 1 or max_workers <= 1:
+            return [self._validate_single(vuln, timeout) for vuln in vulns]
         
-        code_snippets = {
-            "source": source_context,
-            "sink": sink_context
-        }
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(vulns))) as executor:
+            return list(executor.map(lambda vuln: self._validate_single(vuln, timeout), vulns))
+
+    def _validate_single(self, vuln: Dict, timeout: float = None) -> Dict:
+        """验证单个漏洞路径（可在工作线程中调用，不修改流水线状态）"""
+        source, code_snippets = self._code_snippets(vuln)
+        path = vuln.get("path", [])
         
-        result = self.deepseek.validate_vulnerability_path(
+        return self.deepseek.validate_vulnerability_path(
             source=source,
-            sink=source,
+            sink=self._sink_location(vuln),
             path=path,
             cwe_type=self.cwe_type or vuln.get("cwe", "unknown"),
-            code_snippets=code_snippets
+            code_snippets=code_snippets,
+            timeout=timeout
         )
-        
-        self.stats["llm_calls"] += 1
-        return result
 
     def _get_path_key(self, vuln: Dict) -> str:
-        """生成路径缓存key"""
+        """
+        生成路径缓存key
+        
+        由CWE、source/sink代码切片和路径各节点代码行的哈希组成，不含行号，
+        插入或删除无关代码导致行号变化时键保持不变。
+        """
         source = vuln.get("source", {})
-        source_file = source.get("file", "unknown")
-        source_line = source.get("line", 0)
+        parts = [
+            self.cwe_type or vuln.get("cwe", "unknown"),
+            self._site_key(source.get("file", "unknown"), source.get("line", 0)),
+            self._site_key(vuln.get("file", "unknown"), vuln.get("line", 0)),
+        ]
+        for node in vuln.get("path", []):
+            parts.append(self._code_fingerprint(node.get("file", ""), node.get("line", 0), context=0))
+        parts.append(vuln.get("message", "")[:50])
         
-        sink_file = vuln.get("file", "unknown")
-        sink_line = vuln.get("line", 0)
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+    
+    def _site_key(self, file_path: str, line: int) -> str:
+        """source/sink位置的内容键（所在文件 + 前后各2行代码切片的哈希）"""
+        return self._code_fingerprint(file_path, line, context=2)
+    
+    def _code_fingerprint(self, file_path: str, line: int, context: int = 2) -> str:
+        """
+        代码切片指纹
         
-        msg = vuln.get("message", "")[:50]
+        切片逐行去掉首尾空白后与文件的相对路径一起哈希，读不到源码时退回 文件:行号。
         
-        return f"{source_file}:{source_line}->{sink_file}:{sink_line}:{msg}"
+        Args:
+            file_path: 结果中的文件路径（相对源码根目录）
+            line: 行号
+            context: 前后上下文行数
+            
+        Returns:
+            十六进制哈希
+        """
+        file_path = file_path or ""
+        line = line or 0
+        cache_key = (file_path, line, context)
+        fingerprint = self._fingerprints.get(cache_key)
+        if fingerprint is None:
+            lines = self.file_utils.get_code_lines(file_path, line - context, line + context) if line > 0 else []
+            if lines:
+                content = "\n".join(code.strip() for code in lines)
+            else:
+                content = f"@{line}"
+            digest = hashlib.sha256(f"{file_path}\0{content}".encode("utf-8")).hexdigest()
+            fingerprint = self._fingerprints[cache_key] = digest[:32]
+        return fingerprint
+    
+    def _verdict_cache_key(self, namespace: str, key: str) -> str:
+        """单条验证结论的持久缓存键（按CWE隔离）"""
+        return f"verdicts:v{VERDICT_CACHE_VERSION}:{self.cwe_type or 'all'}:{namespace}:{key}"
+    
+    def _persist_verdicts(self) -> bool:
+        return self.cache is not None and config.IRIS_CONFIG.get("PERSIST_VERDICTS", True)
+    
+    def _load_verdicts(self):
+        """
+        开始新一轮验证：清空代码切片哈希和持久缓存查询记录
+        
+        验证结论按路径/位置键逐条存放在持久缓存中，验证时由 _recall_verdicts 按需读取，
+        不再整体加载。
+        """
+        self._fingerprints.clear()
+        self._recalled_verdicts = set()
+        self._stored_verdicts = set()
+    
+    def _recall_verdicts(self, keys: Iterable[Tuple[str, str]]):
+        """
+        从持久缓存读取这些键上已有的验证结论，合并到路径缓存和误报source/sink缓存
+        
+        Args:
+            keys: (命名空间, 键)，命名空间为 "source"、"sink" 或 "path"
+        """
+        if not self._persist_verdicts():
+            return
+        
+        for namespace, key in keys:
+            if (namespace, key) in self._recalled_verdicts:
+                continue
+            self._recalled_verdicts.add((namespace, key))
+            
+            value = self.cache.get(self._verdict_cache_key(namespace, key))
+            if value is None:
+                continue
+            if namespace == "path":
+                self.path_cache.setdefault(key, value)
+            elif namespace == "source":
+                self.source_cache.add(key)
+            elif namespace == "sink":
+                self.sink_cache.add(key)
+            self._stored_verdicts.add((namespace, key))
+    
+    def _save_verdicts(self):
+        """把本次新得到的验证结论逐条写回持久缓存（一个事务）"""
+        if not self._persist_verdicts():
+            return
+        
+        entries = [("path", key, value) for key, value in self.path_cache.items()]
+        entries += [("source", key, True) for key in self.source_cache]
+        entries += [("sink", key, True) for key in self.sink_cache]
+        entries += [("fp_source", key, True) for key in self.fp_sources]
+        entries += [("fp_sink", key, True) for key in self.fp_sinks]
+        
+        items = {
+            self._verdict_cache_key(namespace, key): value
+            for namespace, key, value in entries
+            if (namespace, key) not in self._stored_verdicts
+        }
+        if items and self.cache.set_many(items):
+            self._stored_verdicts.update((namespace, key) for namespace, key, _ in entries)
+            logger.info(f"保存验证结论: {len(items)} 条")
 
     def _validate_batch(self, batch: List[Dict]) -> List[Dict]:
         """批量验证一组漏洞 - 带缓存"""
@@ -591,6 +1135,7 @@ dependencies:
         
         for vuln in batch:
             key = self._get_path_key(vuln)
+            self._recall_verdicts([("path", key)])
             
             # ============ 检查缓存 ============
             if key in self.path_cache:
@@ -607,26 +1152,19 @@ dependencies:
             
             # ============ 缓存未命中，调用LLM ============
             # 提取source和sink信息
-            source, source_context = self._extract_source_info(vuln)
-            sink_context = self._extract_sink_info(vuln)
-            
+            source, code_snippets = self._code_snippets(vuln)
             path = vuln.get("path", [])
             
-            code_snippets = {
-                "source": source_context,
-                "sink": sink_context
-            }
-            
             # 调用LLM验证
+            usage_before = self._llm_usage()
             validation_result = self.deepseek.validate_vulnerability_path(
                 source=source,
-                sink=source,
+                sink=self._sink_location(vuln),
                 path=path,
                 cwe_type=self.cwe_type or vuln.get("cwe", "unknown"),
                 code_snippets=code_snippets
             )
-            
-            self.stats["llm_calls"] += 1
+            self._add_llm_usage(usage_before)
             
             # 保存到缓存
             self.path_cache[key] = validation_result
@@ -643,45 +1181,55 @@ dependencies:
             else:
                 # 记录误报的source/sink
                 source = vuln.get("source", {})
-                self.fp_sources.add(f"{source.get('file')}:{source.get('line')}")
-                self.fp_sinks.add(f"{vuln.get('file')}:{vuln.get('line')}")
+                self.fp_sources.add(self._site_key(source.get("file"), source.get("line")))
+                self.fp_sinks.add(self._site_key(vuln.get("file"), vuln.get("line")))
             
             results.append(result_vuln)
         
         return results
 
     
-    def _extract_source_info(self, vuln: Dict) -> tuple:
-        """提取source信息和上下文"""
-        if "source" in vuln:
-            source = vuln["source"]
+    def _code_snippets(self, vuln: Dict) -> Tuple[Dict, Dict[str, str]]:
+        """
+        构建验证用的source信息和代码上下文
+        
+        启用路径切片时，source/sink上下文是切片中对应的语句、函数签名和控制结构头，
+        "slice" 为整条路径的切片；否则使用source和sink前后各5行的代码片段。
+        
+        Returns:
+            (source信息, {"source": ..., "sink": ..., ["slice": ...]})
+        """
+        source = self._source_location(vuln)
+        if not config.IRIS_CONFIG.get("PATH_SLICING", True):
             source_context = self.file_utils.get_code_snippet(
-                source.get("file", ""), 
+                source.get("file", ""),
                 source.get("line", 0),
                 context_lines=5
             )
-        else:
-            path = vuln.get("path", [])
-            if path and len(path) > 0:
-                source = path[0]
-                source_context = self.file_utils.get_code_snippet(
-                    source.get("file", ""),
-                    source.get("line", 0),
-                    context_lines=5
-                )
-            else:
-                source = {
-                    "file": vuln.get("file", ""),
-                    "line": vuln.get("line", 0),
-                    "code": vuln.get("code", "")
-                }
-                source_context = self.file_utils.get_code_snippet(
-                    vuln.get("file", ""),
-                    vuln.get("line", 0),
-                    context_lines=5
-                )
+            return source, {"source": source_context, "sink": self._extract_sink_info(vuln)}
         
-        return source, source_context
+        path_slice = self.path_slicer.slice(vuln)
+        logger.debug(f"路径切片: 约 {path_slice.tokens} tokens{'（已截断）' if path_slice.truncated else ''}")
+        return source, {"source": path_slice.source, "sink": path_slice.sink, "slice": path_slice.text}
+    
+    @staticmethod
+    def _source_location(vuln: Dict) -> Dict:
+        """路径的source位置：结果中的source，其次是路径第一个节点，都没有时使用sink本身"""
+        if "source" in vuln:
+            return vuln["source"]
+        path = vuln.get("path", [])
+        if path:
+            return path[0]
+        return IRISPipeline._sink_location(vuln)
+    
+    @staticmethod
+    def _sink_location(vuln: Dict) -> Dict:
+        """路径的sink位置（即结果所在位置）"""
+        return {
+            "file": vuln.get("file", ""),
+            "line": vuln.get("line", 0),
+            "code": vuln.get("code", "")
+        }
     
     def _extract_sink_info(self, vuln: Dict) -> str:
         """提取sink上下文"""
@@ -704,7 +1252,7 @@ dependencies:
         """保存结果"""
         output_file = config.OUTPUT_DIR / f"iris_results_{int(time.time())}.json"
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, default=str)
+            json.dump(results, f, indent=2, default=json_default)
         logger.info(f"结果已保存到: {output_file}")
     
     def _print_summary(self):
@@ -716,7 +1264,7 @@ dependencies:
         print(f"{'='*60}")
         print(f"Source候选: {self.stats['source_candidates']}个")
         print(f"Sink候选: {self.stats['sink_candidates']}个")
-        print(f"LLM调用次数: {self.stats['llm_calls']}次")
+        print(f"LLM调用次数: {self.stats['llm_calls']}次 (响应缓存命中 {self.stats['llm_cache_hits']}次)")
         print(f"缓存命中: {self.stats['cache_hits']}次")
         print(f"原始漏洞数: {self.stats['vulnerabilities_found']}个")
         print(f"确认漏洞数: {self.stats['vulnerabilities_confirmed']}个")
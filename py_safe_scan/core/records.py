@@ -0,0 +1,302 @@
+"""AST提取结果的紧凑记录类型
+
+每条记录使用 __slots__，文件路径、包名、类名、函数名等重复出现的字符串经过 intern，
+同一文件的所有记录共享一个路径对象。字典只在JSON边界（输出结果、写入缓存）生成：
+to_dict() 生成与原字典结果相同结构的输出，to_row()/from_row() 是缓存使用的
+不含文件路径的行格式。
+"""
+
+import ast
+import math
+from sys import intern
+from typing import Any, Dict, List, Optional
+
+# 行格式中以源码字面量保存的常量（bytes、复数、省略号等JSON无法表示的值）
+PACKED_CONSTANT = "__const__"
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return intern(value) if isinstance(value, str) else value
+
+
+def _is_json_scalar(value: Any) -> bool:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return -2 ** 63 <= value < 2 ** 64
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return value is None or isinstance(value, (str, bool))
+
+
+class _Record:
+    """按 __slots__ 比较和显示的记录基类"""
+
+    __slots__ = ()
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self._values() == other._values()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class ArgRecord(_Record):
+    """调用参数"""
+
+    __slots__ = ("index", "line", "type", "value", "is_literal", "literal_type")
+
+    def __init__(self, index: int, line: int, type: Optional[str] = None, value: Any = None,
+                 is_literal: bool = False, literal_type: Optional[str] = None):
+        self.index = index
+        self.line = line
+        self.type = _intern(type)
+        self.value = value
+        self.is_literal = is_literal
+        self.literal_type = _intern(literal_type)
+
+    def to_dict(self) -> Dict:
+        info = {
+            "index": self.index,
+            "line": self.line,
+            "type": self.type,
+            "value": self.value,
+            "is_literal": self.is_literal
+        }
+        if self.literal_type is not None:
+            info["literal_type"] = self.literal_type
+        return info
+
+    def to_row(self) -> list:
+        value = self.value
+        if not _is_json_scalar(value):
+            value = {PACKED_CONSTANT: ast.unparse(ast.Constant(value))}
+        return [self.index, self.line, self.type, value, self.is_literal, self.literal_type]
+
+    @classmethod
+    def from_row(cls, row: list) -> "ArgRecord":
+        index, line, type_, value, is_literal, literal_type = row
+        if isinstance(value, dict) and PACKED_CONSTANT in value:
+            value = ast.literal_eval(value[PACKED_CONSTANT])
+        return cls(index, line, type_, value, is_literal, literal_type)
+
+
+class KeywordRecord(_Record):
+    """关键字参数"""
+
+    __slots__ = ("name", "value", "line")
+
+    def __init__(self, name: Optional[str], value: ArgRecord, line: int):
+        self.name = _intern(name)
+        self.value = value
+        self.line = line
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "value": self.value.to_dict(), "line": self.line}
+
+    def to_row(self) -> list:
+        return [self.name, self.value.to_row(), self.line]
+
+    @classmethod
+    def from_row(cls, row: list) -> "KeywordRecord":
+        name, value, line = row
+        return cls(name, ArgRecord.from_row(value), line)
+
+
+class CallRecord(_Record):
+    """外部API调用"""
+
+    __slots__ = ("package", "class_name", "method", "full_name", "line", "args", "keywords",
+                 "file", "code", "function", "context_class")
+
+    def __init__(self, package: Optional[str], class_name: Optional[str], method: Optional[str],
+                 full_name: str, line: int, args: List[ArgRecord], keywords: List[KeywordRecord],
+                 file: str, code: str, function: Optional[str], context_class: Optional[str]):
+        self.package = _intern(package)
+        self.class_name = _intern(class_name)
+        self.method = _intern(method)
+        self.full_name = _intern(full_name)
+        self.line = line
+        self.args = args
+        self.keywords = keywords
+        self.file = file
+        self.code = code
+        self.function = _intern(function)
+        self.context_class = _intern(context_class)
+
+    def to_dict(self) -> Dict:
+        return {
+            "package": self.package,
+            "class": self.class_name,
+            "method": self.method,
+            "full_name": self.full_name,
+            "line": self.line,
+            "args": [arg.to_dict() for arg in self.args],
+            "keywords": [kw.to_dict() for kw in self.keywords],
+            "file": self.file,
+            "code": self.code,
+            "context": {
+                "function": self.function,
+                "class": self.context_class
+            }
+        }
+
+    def to_row(self) -> list:
+        return [self.package, self.class_name, self.method, self.full_name, self.line,
+                [arg.to_row() for arg in self.args], [kw.to_row() for kw in self.keywords],
+                self.code, self.function, self.context_class]
+
+    @classmethod
+    def from_row(cls, row: list, file: str) -> "CallRecord":
+        package, class_name, method, full_name, line, args, keywords, code, function, context_class = row
+        return cls(package, class_name, method, full_name, line,
+                   [ArgRecord.from_row(arg) for arg in args],
+                   [KeywordRecord.from_row(kw) for kw in keywords],
+                   file, code, function, context_class)
+
+
+class ParamRecord(_Record):
+    """内部函数参数"""
+
+    __slots__ = ("name", "line", "type", "function", "class_name", "file", "kind")
+
+    def __init__(self, name: str, line: int, type: Optional[str], function: str,
+                 class_name: Optional[str], file: str, kind: str):
+        self.name = _intern(name)
+        self.line = line
+        self.type = _intern(type)
+        self.function = _intern(function)
+        self.class_name = _intern(class_name)
+        self.file = file
+        self.kind = _intern(kind)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "line": self.line,
+            "type": self.type,
+            "function": self.function,
+            "class": self.class_name,
+            "file": self.file,
+            "kind": self.kind
+        }
+
+    def to_row(self) -> list:
+        return [self.name, self.line, self.type, self.kind]
+
+
+class FunctionRecord(_Record):
+    """内部函数定义"""
+
+    __slots__ = ("name", "line", "params", "class_name", "file", "decorators")
+
+    def __init__(self, name: str, line: int, params: List[ParamRecord], class_name: Optional[str],
+                 file: str, decorators: List[str]):
+        self.name = _intern(name)
+        self.line = line
+        self.params = params
+        self.class_name = _intern(class_name)
+        self.file = file
+        self.decorators = [intern(name) for name in decorators]
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "line": self.line,
+            "params": [param.to_dict() for param in self.params],
+            "class": self.class_name,
+            "file": self.file,
+            "decorators": list(self.decorators)
+        }
+
+    def to_row(self) -> list:
+        # 参数的 function/class/file 与所在函数相同，不重复保存
+        return [self.name, self.line, [param.to_row() for param in self.params],
+                self.class_name, self.decorators]
+
+    @classmethod
+    def from_row(cls, row: list, file: str) -> "FunctionRecord":
+        name, line, params, class_name, decorators = row
+        return cls(name, line,
+                   [ParamRecord(p_name, p_line, p_type, name, class_name, file, kind)
+                    for p_name, p_line, p_type, kind in params],
+                   class_name, file, decorators)
+
+
+class StringRecord(_Record):
+    """字符串常量"""
+
+    __slots__ = ("value", "line", "file", "function", "class_name")
+
+    def __init__(self, value: str, line: int, file: str, function: Optional[str], class_name: Optional[str]):
+        self.value = value
+        self.line = line
+        self.file = file
+        self.function = _intern(function)
+        self.class_name = _intern(class_name)
+
+    def to_dict(self) -> Dict:
+        return {
+            "value": self.value,
+            "line": self.line,
+            "file": self.file,
+            "context": {
+                "function": self.function,
+                "class": self.class_name
+            }
+        }
+
+    def to_row(self) -> list:
+        return [self.value, self.line, self.function, self.class_name]
+
+    @classmethod
+    def from_row(cls, row: list, file: str) -> "StringRecord":
+        value, line, function, class_name = row
+        return cls(value, line, file, function, class_name)
+
+
+class FileResult(_Record):
+    """单个文件的提取结果"""
+
+    __slots__ = ("file", "external_apis", "internal_functions", "string_literals", "error")
+
+    def __init__(self, file: str, external_apis: List[CallRecord] = None,
+                 internal_functions: List[FunctionRecord] = None,
+                 string_literals: List[StringRecord] = None, error: Optional[str] = None):
+        self.file = intern(file)
+        self.external_apis = external_apis or []
+        self.internal_functions = internal_functions or []
+        self.string_literals = string_literals or []
+        self.error = error
+
+    def to_dict(self) -> Dict:
+        result = {
+            "external_apis": [call.to_dict() for call in self.external_apis],
+            "internal_functions": [func.to_dict() for func in self.internal_functions],
+            "string_literals": [literal.to_dict() for literal in self.string_literals],
+            "file": self.file
+        }
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+    def to_row(self) -> list:
+        """不含文件路径的行格式（用于缓存）"""
+        return [
+            [call.to_row() for call in self.external_apis],
+            [func.to_row() for func in self.internal_functions],
+            [literal.to_row() for literal in self.string_literals]
+        ]
+
+    @classmethod
+    def from_row(cls, row: list, file: str) -> "FileResult":
+        file = intern(file)
+        calls, functions, literals = row
+        return cls(
+            file,
+            [CallRecord.from_row(call, file) for call in calls],
+            [FunctionRecord.from_row(func, file) for func in functions],
+            [StringRecord.from_row(literal, file) for literal in literals]
+        )
@@ -1,16 +1,23 @@
 """规范提取器 - 从CodeQL结果中提取候选API"""
 
-import json
+import csv
 import logging
+from sys import intern
 from pathlib import Path
-from typing import List, Dict, Optional, Any
-from dataclasses import dataclass
+from typing import List, Dict, Optional, Any, Iterable, Iterator, Tuple
+from dataclasses import dataclass, field
+
+import config
+from py_safe_scan.core.codeql_manager import CodeQLQueryError
+from py_safe_scan.utils.sarif_stream import iter_sarif_results
 
 logger = logging.getLogger(__name__)
 
 @dataclass
 class API:
-    """API信息"""
+    """API信息（__slots__，名称和路径字符串经过intern）"""
+    __slots__ = ("package", "class_name", "method", "file", "line", "context")
+    
     package: str
     class_name: str
     method: str
@@ -28,42 +35,153 @@ class API:
             "context": self.context
         }
 
+@dataclass
+class APIGroup:
+    """同一API（包、类、方法）的所有调用点"""
+    key: Tuple[str, str, str]
+    representative: Dict
+    sites: List[Dict] = field(default_factory=list)
+
+
+# 由LLM分类结果写入、需要回填到每个调用点的字段
+LABEL_FIELDS = ("llm_label", "llm_confidence", "sink_args", "explanation", "llm_labels")
+
+
+def api_key(api: Dict) -> Tuple[str, str, str]:
+    """API的规范化键 (package, class, method)"""
+    return (api.get("package") or "unknown", api.get("class") or "", api.get("method") or "")
+
+
+def group_call_sites(apis: Iterable[Dict], max_contexts: int = 3) -> List[APIGroup]:
+    """
+    按 (package, class, method) 合并调用点
+    
+    每组生成一个代表API，附带最多 max_contexts 个不同的上下文样本
+    （优先取不同文件），只有代表API会发送给LLM。
+    
+    Args:
+        apis: 候选API字典（每个调用点一个）
+        max_contexts: 每组保留的上下文样本数
+        
+    Returns:
+        按首次出现顺序排列的API分组
+    """
+    groups: Dict[Tuple[str, str, str], APIGroup] = {}
+    for api in apis:
+        key = api_key(api)
+        if key not in groups:
+            groups[key] = APIGroup(key=key, representative={}, sites=[])
+        groups[key].sites.append(api)
+    
+    for group in groups.values():
+        contexts = _sample_contexts(group.sites, max_contexts)
+        group.representative = {
+            **group.sites[0],
+            "context": contexts[0] if contexts else group.sites[0].get("context", ""),
+            "contexts": contexts,
+            "call_sites": len(group.sites)
+        }
+    
+    return list(groups.values())
+
+
+def _sample_contexts(sites: List[Dict], max_contexts: int) -> List[str]:
+    """选取不重复的上下文样本，先保证文件多样性再按顺序补足"""
+    samples = []
+    seen_files = set()
+    for prefer_new_file in (True, False):
+        for site in sites:
+            context = site.get("context", "")
+            if len(samples) >= max_contexts:
+                return samples
+            if not context or context in samples:
+                continue
+            if prefer_new_file and site.get("file") in seen_files:
+                continue
+            seen_files.add(site.get("file"))
+            samples.append(context)
+    return samples
+
+
+def fan_out_labels(groups: Iterable[APIGroup]):
+    """把代表API的分类结果回填到组内每个调用点"""
+    for group in groups:
+        labels = {name: group.representative[name] for name in LABEL_FIELDS if name in group.representative}
+        for site in group.sites:
+            site.update(labels)
+
+
+def iter_csv_rows(csv_path: Path) -> Iterator[List[str]]:
+    """逐行读取 bqrs decode 输出的CSV（跳过列名行），字段内的逗号和引号由csv模块处理"""
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        yield from reader
+
+
 class SpecExtractor:
     """从CodeQL结果中提取候选API（IRIS第一阶段）"""
     
-    def __init__(self, codeql_manager):
+    def __init__(self, codeql_manager, file_utils=None):
+        """
+        Args:
+            codeql_manager: CodeQL管理器
+            file_utils: 读取调用上下文使用的文件工具（决定源文件索引），默认使用共享索引
+        """
+        from py_safe_scan.utils.file_utils import FileUtils
         self.codeql = codeql_manager
+        self.file_utils = file_utils or FileUtils()
     
     def extract_candidate_apis(self, db_path: Path) -> List[API]:
         """
         提取所有候选API（不再区分source/sink）
         这是IRIS论文的第一阶段：候选提取
         """
+        apis = list(self.iter_candidate_apis(db_path))
+        logger.info(f"提取到 {len(apis)} 个候选API")
+        return apis
+    
+    def iter_candidate_apis(self, db_path: Path) -> Iterator[API]:
+        """
+        逐个产出候选API
+        
+        优先运行表格查询（query run + bqrs decode），按CSV行流式读取带类型的列；
+        表格查询不可用时回退到SARIF查询并解析消息文本。
+        """
+        query_path = Path(config.API_EXTRACT_QUERY)
+        logger.info("运行API提取查询...")
+        try:
+            csv_path = self.codeql.run_table_query(db_path, query_path)
+        except CodeQLQueryError as e:
+            # 只有CodeQL本身失败才回退；回退结果缺少完全限定名，分类质量会明显下降
+            logger.error(f"API提取表格查询失败，回退到SARIF提取（候选API将缺少完全限定名）: {e}")
+            yield from self._iter_sarif_apis(db_path)
+            return
+        
+        for row in iter_csv_rows(csv_path):
+            api = self._parse_api_from_row(row)
+            if api:
+                yield api
+    
+    def _iter_sarif_apis(self, db_path: Path) -> Iterator[API]:
+        """通过 database analyze 的SARIF结果提取候选API（旧方式）"""
         # 先创建自定义查询文件
         query_path = self._ensure_extract_query()
         
         # 运行自定义查询
-        logger.info("运行API提取查询...")
         results_path = self.codeql.run_custom_query(db_path, query_path)
+        if not results_path or not results_path.exists():
+            return
         
-        apis = []
-        if results_path and results_path.exists():
-            with open(results_path, 'r', encoding='utf-8') as f:
-                sarif = json.load(f)
-            
-            for run in sarif.get("runs", []):
-                for result in run.get("results", []):
-                    api = self._parse_api_from_result(result)
-                    if api:
-                        apis.append(api)
-        
-        logger.info(f"提取到 {len(apis)} 个候选API")
-        return apis
+        for result in iter_sarif_results(results_path):
+            api = self._parse_api_from_result(result)
+            if api:
+                yield api
     
     def _ensure_extract_query(self) -> Path:
-        """确保提取API的查询文件存在"""
-        query_dir = Path("/home/hanahanarange/PySafeScan/custom-queries")
-        query_dir.mkdir(exist_ok=True)
+        """确保提取API的查询文件存在（生成在CodeQL工作目录下）"""
+        query_dir = self.codeql.workspace_dir / "queries"
+        query_dir.mkdir(parents=True, exist_ok=True)
         
         query_path = query_dir / "extract_apis.ql"
         
@@ -89,6 +207,45 @@ select call.getLocation().getFile().getBaseName(),
         
         return query_path
     
+    def _parse_api_from_row(self, row: List[str]) -> Optional[API]:
+        """
+        从表格查询的一行解析API信息
+        
+        Args:
+            row: [file, line, qualified_name, callee, call_text]
+        """
+        try:
+            file_path, line, qualified_name, callee = row[:4]
+            line = int(line)
+        except ValueError as e:
+            logger.debug(f"解析API行失败: {row}: {e}")
+            return None
+        
+        if qualified_name:
+            # 导入路径解析成功: os.path.join -> (os, path, join)
+            # 中间段全部保留: flask.request.args.get -> (flask, request.args, get)
+            parts = qualified_name.split('.')
+            package = parts[0]
+            class_name = '.'.join(parts[1:-1])
+            method = parts[-1]
+        elif callee:
+            # 无法解析到导入（本地函数、方法调用等）: self.db.execute -> (unknown, db, execute)
+            parts = callee.split('.')
+            package = "unknown"
+            class_name = parts[-2] if len(parts) >= 2 else ""
+            method = parts[-1]
+        else:
+            return None
+        
+        return API(
+            package=intern(package),
+            class_name=intern(class_name),
+            method=intern(method),
+            file=intern(file_path),
+            line=line,
+            context=self._get_context(file_path, line)
+        )
+    
     def _parse_api_from_result(self, result: Dict) -> Optional[API]:
         """从SARIF结果中解析API信息"""
         try:
@@ -129,10 +286,10 @@ select call.getLocation().getFile().getBaseName(),
             context = self._get_context(file_path, line)
             
             return API(
-                package=package,
-                class_name=class_name,
-                method=method,
-                file=file_path,
+                package=intern(package),
+                class_name=intern(class_name),
+                method=intern(method),
+                file=intern(file_path),
                 line=line,
                 context=context
             )
@@ -142,5 +299,4 @@ select call.getLocation().getFile().getBaseName(),
     
     def _get_context(self, file_path: str, line: int) -> str:
         """获取代码上下文"""
-        from py_safe_scan.utils.file_utils import FileUtils
-        return FileUtils.get_code_snippet(file_path, line, 3)
+        return self.file_utils.get_code_snippet(file_path, line, 3)
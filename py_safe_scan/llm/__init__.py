@@ -1,18 +1,22 @@
 """LLM模块"""
 from py_safe_scan.llm.deepseek_client import DeepSeekClient
+from py_safe_scan.llm.label_store import APILabelStore
 from py_safe_scan.llm.prompts import (
     CWE_DESCRIPTIONS, 
     FEW_SHOT_EXAMPLES, 
     SYSTEM_PROMPT_SPEC_INFERENCE,
     SYSTEM_PROMPT_PATH_VALIDATION,
-    SYSTEM_PROMPTS
+    SYSTEM_PROMPTS,
+    PROMPT_VERSION
 )
 
 __all__ = [
     'DeepSeekClient', 
+    'APILabelStore',
     'CWE_DESCRIPTIONS', 
     'FEW_SHOT_EXAMPLES',
     'SYSTEM_PROMPT_SPEC_INFERENCE',
     'SYSTEM_PROMPT_PATH_VALIDATION',
-    'SYSTEM_PROMPTS'
+    'SYSTEM_PROMPTS',
+    'PROMPT_VERSION'
 ]
@@ -1,12 +1,18 @@
 """DeepSeek API客户端 - 增强版支持多轮推理和上下文分析"""
 
+import asyncio
+import hashlib
 import json
 import logging
+import threading
 import time
-from typing import List, Dict, Optional, Any
-from openai import OpenAI
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from openai import AsyncOpenAI, OpenAI
 
 import config
+from py_safe_scan.cache.cache_manager import CacheManager
+from py_safe_scan.llm.label_store import APILabelStore, fq_api_name
+from py_safe_scan.llm.rate_limiter import TokenBucket, retry_with_backoff
 from py_safe_scan.llm.prompts import (
     SYSTEM_PROMPT_SPEC_INFERENCE, 
     SYSTEM_PROMPT_PATH_VALIDATION,
@@ -20,16 +26,26 @@ logger = logging.getLogger(__name__)
 class DeepSeekClient:
     """DeepSeek API客户端，用于推断污点规范和验证路径"""
     
-    def __init__(self, api_key: str = None, model: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        model: str = None,
+        label_store: APILabelStore = None,
+        cache: CacheManager = None
+    ):
         """
         初始化DeepSeek客户端
         
         Args:
             api_key: DeepSeek API密钥
             model: 模型名称
+            label_store: API标签库，规范推断时优先查询
+            cache: 请求级响应缓存，None表示不缓存
         """
         self.api_key = api_key or config.DEEPSEEK_API_KEY
         self.model = model or config.DEEPSEEK_MODEL
+        self.label_store = label_store
+        self.cache = cache
         
         if not self.api_key:
             raise ValueError("请设置DEEPSEEK_API_KEY环境变量")
@@ -43,8 +59,11 @@ class DeepSeekClient:
         self.stats = {
             "calls": 0,
             "tokens": 0,
-            "total_time": 0
+            "total_time": 0,
+            "cache_hits": 0,
+            "label_store_hits": 0
         }
+        self._stats_lock = threading.Lock()
     
     def infer_source_sink_specs(
         self, 
@@ -62,44 +81,87 @@ class DeepSeekClient:
             return []
         
         batch_size = batch_size or config.BATCH_SIZE
-        all_results = []
         
         logger.info(f"=== IRIS第二阶段: LLM规范推断 ===")
         logger.info(f"CWE类型: {cwe_type}")
         logger.info(f"API数量: {len(apis)}")
         
+        # 先查询API标签库，只把未命中的API发送给LLM
+        pending = self._apply_stored_labels(apis, cwe_type)
+        
         # 分批处理
-        for i in range(0, len(apis), batch_size):
-            batch = apis[i:i+batch_size]
-            logger.info(f"处理批次 {i//batch_size + 1}/{(len(apis)-1)//batch_size + 1}")
-            
-            try:
-                batch_results = self._infer_batch(
-                    batch, cwe_type, cwe_description, few_shot_examples
-                )
-                all_results.extend(batch_results)
-                
-                # 统计本批次结果
-                sources = [r for r in batch_results if r.get("llm_label") == "source"]
-                sinks = [r for r in batch_results if r.get("llm_label") == "sink"]
-                logger.info(f"  批次结果: {len(sources)} sources, {len(sinks)} sinks")
-                
-            except Exception as e:
-                logger.error(f"批次处理失败: {e}")
-                for api in batch:
-                    api["llm_label"] = "unknown"
-                    api["llm_confidence"] = 0
-                    all_results.append(api)
+        batches = [pending[i:i+batch_size] for i in range(0, len(pending), batch_size)]
+        
+        if self._use_async(len(batches)):
+            logger.info(f"并发处理 {len(batches)} 个批次 (并发数: {config.PERFORMANCE_CONFIG.get('MAX_WORKERS', 4)})")
+            batch_results_list = asyncio.run(
+                self._infer_batches_async(batches, cwe_type, cwe_description, few_shot_examples)
+            )
+        else:
+            batch_results_list = (
+                self._infer_batch_or_unknown(batch, index, len(batches), cwe_type, cwe_description, few_shot_examples)
+                for index, batch in enumerate(batches)
+            )
+        
+        # 推断结果写回原字典，按批次输出统计
+        for batch_results in batch_results_list:
+            sources = [r for r in batch_results if r.get("llm_label") == "source"]
+            sinks = [r for r in batch_results if r.get("llm_label") == "sink"]
+            logger.info(f"  批次结果: {len(sources)} sources, {len(sinks)} sinks")
+        
+        self._store_labels(pending, cwe_type)
         
         # 最终统计
-        total_sources = [r for r in all_results if r.get("llm_label") == "source"]
-        total_sinks = [r for r in all_results if r.get("llm_label") == "sink"]
+        total_sources = [r for r in apis if r.get("llm_label") == "source"]
+        total_sinks = [r for r in apis if r.get("llm_label") == "sink"]
         logger.info(f"=== 规范推断完成 ===")
-        logger.info(f"总API数: {len(all_results)}")
+        logger.info(f"总API数: {len(apis)}")
         logger.info(f"Sources: {len(total_sources)}")
         logger.info(f"Sinks: {len(total_sinks)}")
         
-        return all_results
+        return apis
+    
+    def _apply_stored_labels(self, apis: List[Dict], cwe_type: str) -> List[Dict]:
+        """用标签库中的结果填充API，返回仍需LLM推断的API"""
+        if self.label_store is None:
+            return apis
+        
+        pending = []
+        for api in apis:
+            api_name = fq_api_name(api)
+            # 包名未解析的API不查询标签库（局部名在不同项目中含义不同）
+            stored = self.label_store.lookup(api_name, cwe_type) if api_name else None
+            if stored:
+                api["llm_label"] = stored["label"]
+                api["llm_confidence"] = stored["confidence"]
+                api["sink_args"] = stored["sink_args"]
+                api["explanation"] = stored["explanation"]
+            else:
+                pending.append(api)
+        
+        self.stats["label_store_hits"] += len(apis) - len(pending)
+        logger.info(f"API标签库命中 {len(apis) - len(pending)} 个, 需要LLM推断 {len(pending)} 个")
+        return pending
+    
+    def _store_labels(self, apis: List[Dict], cwe_type: str):
+        """把LLM推断结果写入标签库（推断失败的unknown和包名未解析的API不写入）"""
+        if self.label_store is None:
+            return
+        
+        records = [
+            {
+                "api": fq_api_name(api),
+                "cwe": cwe_type,
+                "label": api["llm_label"],
+                "confidence": api.get("llm_confidence", 0),
+                "sink_args": api.get("sink_args", []),
+                "explanation": api.get("explanation", "")
+            }
+            for api in apis
+            if api.get("llm_label") in ("source", "sink", "none") and fq_api_name(api)
+        ]
+        if records:
+            self.label_store.put_many(records)
     
     def cross_validate_specs(
         self,
@@ -177,20 +239,10 @@ CWE描述: {cwe_description}
 }}"""
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个严谨的安全专家，擅长分析代码中的安全漏洞。"},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=config.MAX_TOKENS,
-                response_format={"type": "json_object"}
+            content = self._chat_completion(
+                "你是一个严谨的安全专家，擅长分析代码中的安全漏洞。", user_prompt
             )
             
-            self.stats["calls"] += 1
-            content = response.choices[0].message.content
-            
             # 解析响应
             results = self._parse_response(content, apis)
             
@@ -280,19 +332,7 @@ CWE类型: {cwe_type}
 }}"""
             
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "你是一个安全专家，擅长分析代码上下文。"},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.1,
-                    max_tokens=config.MAX_TOKENS,
-                    response_format={"type": "json_object"}
-                )
-                
-                self.stats["calls"] += 1
-                content = response.choices[0].message.content
+                content = self._chat_completion("你是一个安全专家，擅长分析代码上下文。", user_prompt)
                 
                 # 清理响应
                 if content.startswith("```json"):
@@ -336,19 +376,49 @@ CWE类型: {cwe_type}
     ) -> List[Dict]:
         """处理单个批次 - 让LLM自己学习判断"""
         
+        user_prompt = self._build_infer_prompt(apis, cwe_type, cwe_description, few_shot_examples)
+        
+        start_time = time.time()
+        
+        try:
+            logger.info("="*60)
+            logger.info("🔍 LLM请求内容:")
+            logger.info(f"用户提示词:\n{user_prompt}")
+            logger.info("="*60)
+
+            content = self._chat_completion(
+                "你是一个专业的安全专家，擅长分析代码中的安全漏洞。", user_prompt
+            )
+
+            logger.info("="*60)
+            logger.info("📝 LLM响应内容:")
+            logger.info(f"{content}")
+            logger.info("="*60)
+            
+            elapsed = time.time() - start_time
+            
+            # 解析响应
+            logger.debug(f"LLM原始响应: {content[:200]}...")
+            results = self._parse_response(content, apis)
+            
+            logger.debug(f"批次处理完成，耗时 {elapsed:.2f}s")
+            return results
+            
+        except Exception as e:
+            logger.error(f"DeepSeek API调用失败: {e}")
+            raise
+    
+    def _build_infer_prompt(
+        self,
+        apis: List[Dict],
+        cwe_type: str,
+        cwe_description: str,
+        few_shot_examples: List[Dict] = None
+    ) -> str:
+        """构建规范推断的用户提示词（同步与异步路径共用）"""
+        
         # 构建API列表文本，只提供原始信息，不预设任何标签
-        api_text = ""
-        for i, api in enumerate(apis, 1):
-            api_text += f"API {i}:\n"
-            api_text += f"  包: {api.get('package', 'unknown')}\n"
-            if api.get('class'):
-                api_text += f"  类: {api['class']}\n"
-            api_text += f"  方法: {api.get('method', 'unknown')}()\n"
-            api_text += f"  文件: {api.get('file', '')}\n"
-            api_text += f"  行号: {api.get('line', 0)}\n"
-            if api.get('context'):
-                api_text += f"  上下文: {api['context'][:200]}\n"
-            api_text += "\n"
+        api_text = self._format_api_text(apis)
         
         # 构建示例文本
         examples_text = ""
@@ -395,49 +465,338 @@ CWE描述: {cwe_description}
     ]
 }}"""
         
-        start_time = time.time()
+        return user_prompt
+    
+    @staticmethod
+    def _mark_unknown(batch: List[Dict]) -> List[Dict]:
+        """推断失败的批次标记为unknown"""
+        for api in batch:
+            api["llm_label"] = "unknown"
+            api["llm_confidence"] = 0
+        return batch
+    
+    def _infer_batch_or_unknown(
+        self,
+        batch: List[Dict],
+        index: int,
+        total: int,
+        cwe_type: str,
+        cwe_description: str,
+        few_shot_examples: List[Dict] = None
+    ) -> List[Dict]:
+        """顺序路径：处理单个批次，失败时标记为unknown"""
+        logger.info(f"处理批次 {index + 1}/{total}")
+        try:
+            return self._infer_batch(batch, cwe_type, cwe_description, few_shot_examples)
+        except Exception as e:
+            logger.error(f"批次处理失败: {e}")
+            return self._mark_unknown(batch)
+    
+    @staticmethod
+    def _use_async(batch_count: int) -> bool:
+        """
+        是否使用异步并发推断
         
+        只有一个批次、未启用并行，或当前线程已有运行中的事件循环时走顺序路径
+        """
+        if batch_count <= 1 or not config.PERFORMANCE_CONFIG.get("ENABLE_PARALLEL", False):
+            return False
         try:
-            logger.info("="*60)
-            logger.info("🔍 LLM请求内容:")
-            logger.info(f"用户提示词:\n{user_prompt}")
-            logger.info("="*60)
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return True
+        logger.debug("已存在运行中的事件循环，回退到顺序推断")
+        return False
+    
+    async def _infer_batches_async(
+        self,
+        batches: List[List[Dict]],
+        cwe_type: str,
+        cwe_description: str,
+        few_shot_examples: List[Dict] = None
+    ) -> List[List[Dict]]:
+        """并发推断所有批次，失败批次标记为unknown"""
+        return await self._run_batches_async(
+            batches,
+            lambda client, bucket, batch: self._infer_batch_async(
+                client, bucket, batch, cwe_type, cwe_description, few_shot_examples
+            ),
+            self._mark_unknown
+        )
+    
+    async def _run_batches_async(
+        self,
+        batches: List[List[Dict]],
+        infer_batch: Callable[[AsyncOpenAI, TokenBucket, List[Dict]], Awaitable[List[Dict]]],
+        on_failure: Callable[[List[Dict]], List[Dict]]
+    ) -> List[List[Dict]]:
+        """
+        并发执行所有批次
+        
+        并发数由 MAX_WORKERS 限制，请求速率由令牌桶限制，
+        429/5xx 错误按指数退避重试。返回结果与输入批次顺序一致。
+        
+        Args:
+            batches: API批次列表
+            infer_batch: 处理单个批次的协程函数 (client, bucket, batch) -> batch
+            on_failure: 批次失败时的处理函数
+        """
+        perf = config.PERFORMANCE_CONFIG
+        max_workers = max(1, perf.get("MAX_WORKERS", 4))
+        semaphore = asyncio.Semaphore(max_workers)
+        bucket = TokenBucket(rate=perf.get("LLM_RATE_LIMIT", 5.0), capacity=max_workers)
+        
+        # 重试由 retry_with_backoff 负责，关闭SDK自带重试以免绕过限流
+        client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=config.DEEPSEEK_API_URL,
+            timeout=config.REQUEST_TIMEOUT,
+            max_retries=0
+        )
+        
+        async def run_batch(index: int, batch: List[Dict]) -> List[Dict]:
+            async with semaphore:
+                logger.info(f"处理批次 {index + 1}/{len(batches)}")
+                try:
+                    return await infer_batch(client, bucket, batch)
+                except Exception as e:
+                    logger.error(f"批次 {index + 1} 处理失败: {e}")
+                    return on_failure(batch)
+        
+        try:
+            return await asyncio.gather(*(run_batch(i, batch) for i, batch in enumerate(batches)))
+        finally:
+            await client.close()
+    
+    async def _infer_batch_async(
+        self,
+        client: AsyncOpenAI,
+        bucket: TokenBucket,
+        apis: List[Dict],
+        cwe_type: str,
+        cwe_description: str,
+        few_shot_examples: List[Dict] = None
+    ) -> List[Dict]:
+        """异步处理单个批次"""
+        user_prompt = self._build_infer_prompt(apis, cwe_type, cwe_description, few_shot_examples)
+        logger.debug(f"用户提示词:\n{user_prompt}")
+        
+        content = await self._chat_completion_async(
+            client, bucket, "你是一个专业的安全专家，擅长分析代码中的安全漏洞。", user_prompt
+        )
+        logger.debug(f"LLM原始响应: {content[:200]}...")
+        return self._parse_response(content, apis)
+    
+    @staticmethod
+    def _format_api_text(apis: List[Dict], context_limit: int = 200) -> str:
+        """构建提示词中的API列表文本"""
+        api_text = ""
+        for i, api in enumerate(apis, 1):
+            api_text += f"API {i}:\n"
+            api_text += f"  包: {api.get('package', 'unknown')}\n"
+            if api.get('class'):
+                api_text += f"  类: {api['class']}\n"
+            api_text += f"  方法: {api.get('method', 'unknown')}()\n"
+            api_text += f"  文件: {api.get('file', '')}\n"
+            api_text += f"  行号: {api.get('line', 0)}\n"
+            if api.get('call_sites', 1) > 1:
+                api_text += f"  调用点数量: {api['call_sites']}\n"
+            if len(api.get('contexts') or []) > 1:
+                # 合并后的API附带多个调用点的上下文样本
+                for j, context in enumerate(api['contexts'], 1):
+                    api_text += f"  上下文{j}: {context[:context_limit]}\n"
+            elif api.get('context'):
+                api_text += f"  上下文: {api['context'][:context_limit]}\n"
+            api_text += "\n"
+        return api_text
+    
+    def infer_multi_cwe_specs(
+        self,
+        apis: List[Dict],
+        cwe_types: List[str],
+        batch_size: int = None
+    ) -> List[Dict]:
+        """
+        一次LLM调用同时推断API在多个CWE下的角色（多CWE单遍扫描）
+        
+        结果写入每个API的 llm_labels 字段:
+            {"CWE-89": {"type": "sink", "confidence": 90, "sink_args": [0]}, ...}
+        未列出的CWE视为none
+        """
+        if not apis or not cwe_types:
+            return apis
+        
+        batch_size = batch_size or config.BATCH_SIZE
+        
+        logger.info(f"=== 多CWE规范推断 ===")
+        logger.info(f"CWE类型: {', '.join(cwe_types)}")
+        logger.info(f"API数量: {len(apis)}")
+        
+        # 先查询API标签库，所有CWE都命中的API不再发送给LLM
+        pending = self._apply_stored_multi_labels(apis, cwe_types)
+        batches = [pending[i:i+batch_size] for i in range(0, len(pending), batch_size)]
+        
+        if self._use_async(len(batches)):
+            logger.info(f"并发处理 {len(batches)} 个批次 (并发数: {config.PERFORMANCE_CONFIG.get('MAX_WORKERS', 4)})")
+            asyncio.run(self._run_batches_async(
+                batches,
+                lambda client, bucket, batch: self._infer_multi_batch_async(client, bucket, batch, cwe_types),
+                self._mark_multi_unknown
+            ))
+        else:
+            for index, batch in enumerate(batches):
+                logger.info(f"处理批次 {index + 1}/{len(batches)}")
+                try:
+                    self._infer_multi_batch(batch, cwe_types)
+                except Exception as e:
+                    logger.error(f"批次处理失败: {e}")
+                    self._mark_multi_unknown(batch)
+        
+        self._store_multi_labels(pending, cwe_types)
+        return apis
+    
+    def _mark_multi_unknown(self, batch: List[Dict]) -> List[Dict]:
+        """多CWE推断失败的批次：没有任何标签，并标记为unknown以免写入标签库"""
+        for api in self._mark_unknown(batch):
+            api["llm_labels"] = {}
+        return batch
+    
+    def _apply_stored_multi_labels(self, apis: List[Dict], cwe_types: List[str]) -> List[Dict]:
+        """用标签库中的结果填充 llm_labels，返回至少有一个CWE未命中、仍需LLM推断的API"""
+        if self.label_store is None:
+            return apis
+        
+        pending = []
+        for api in apis:
+            api_name = fq_api_name(api)
+            stored = {cwe: self.label_store.lookup(api_name, cwe) for cwe in cwe_types} if api_name else {}
+            if stored and all(stored.values()):
+                api["llm_labels"] = {
+                    cwe: {"type": label["label"], "confidence": label["confidence"], "sink_args": label["sink_args"]}
+                    for cwe, label in stored.items()
+                    if label["label"] in ("source", "sink")
+                }
+            else:
+                pending.append(api)
+        
+        self.stats["label_store_hits"] += len(apis) - len(pending)
+        logger.info(f"API标签库命中 {len(apis) - len(pending)} 个, 需要LLM推断 {len(pending)} 个")
+        return pending
+    
+    def _store_multi_labels(self, apis: List[Dict], cwe_types: List[str]):
+        """把多CWE推断结果按CWE写入标签库，未列出的CWE记为none"""
+        if self.label_store is None:
+            return
+        
+        inferred = [api for api in apis if api.get("llm_label") != "unknown"]
+        for cwe in cwe_types:
+            labeled = []
+            for api in inferred:
+                label = api.get("llm_labels", {}).get(cwe)
+                labeled.append({
+                    **api,
+                    "llm_label": label["type"] if label else "none",
+                    "llm_confidence": label["confidence"] if label else 0,
+                    "sink_args": label.get("sink_args", []) if label else []
+                })
+            self._store_labels(labeled, cwe)
+    
+    def _infer_multi_batch(self, apis: List[Dict], cwe_types: List[str]) -> List[Dict]:
+        """处理多CWE推断的单个批次"""
+        user_prompt = self._build_multi_prompt(apis, cwe_types)
+        content = self._chat_completion("你是一个专业的安全专家，擅长分析代码中的安全漏洞。", user_prompt)
+        return self._parse_multi_response(content, apis, cwe_types)
+    
+    async def _infer_multi_batch_async(
+        self,
+        client: AsyncOpenAI,
+        bucket: TokenBucket,
+        apis: List[Dict],
+        cwe_types: List[str]
+    ) -> List[Dict]:
+        """异步处理多CWE推断的单个批次"""
+        user_prompt = self._build_multi_prompt(apis, cwe_types)
+        content = await self._chat_completion_async(
+            client, bucket, "你是一个专业的安全专家，擅长分析代码中的安全漏洞。", user_prompt
+        )
+        return self._parse_multi_response(content, apis, cwe_types)
+    
+    def _build_multi_prompt(self, apis: List[Dict], cwe_types: List[str]) -> str:
+        """构建多CWE推断的用户提示词（同步与异步路径共用）"""
+        cwe_text = "\n".join(
+            f"- {cwe}: {CWE_DESCRIPTIONS.get(cwe, '')}" for cwe in cwe_types
+        )
+        
+        user_prompt = f"""你是一个安全专家。你需要分析以下API列表，判断每个API在下列每种CWE漏洞检测中扮演的角色。
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的安全专家，擅长分析代码中的安全漏洞。"},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=config.MAX_TOKENS,
-                response_format={"type": "json_object"}
-            )
+需要判断的CWE类型:
+{cwe_text}
 
-            logger.info("="*60)
-            logger.info("📝 LLM响应内容:")
-            logger.info(f"{response.choices[0].message.content}")
-            logger.info("="*60)
-            
-            elapsed = time.time() - start_time
-            
-            # 更新统计
-            self.stats["calls"] += 1
-            if hasattr(response, 'usage') and response.usage:
-                self.stats["tokens"] += response.usage.total_tokens
-            self.stats["total_time"] += elapsed
-            
-            # 解析响应
-            content = response.choices[0].message.content
-            logger.debug(f"LLM原始响应: {content[:200]}...")
-            results = self._parse_response(content, apis)
-            
-            logger.debug(f"批次处理完成，耗时 {elapsed:.2f}s")
-            return results
-            
-        except Exception as e:
-            logger.error(f"DeepSeek API调用失败: {e}")
-            raise
+对每个CWE，API可能是：
+- source: 用户输入入口（如HTTP请求参数、文件上传、用户输入）
+- sink: 该CWE对应的危险操作点（如文件操作、命令执行、SQL查询）
+- none: 无关API
+
+**注意**：不要过度分类。对每个API只列出它作为source或sink的CWE，未列出的CWE视为none。
+
+以下是需要分析的API列表：
+
+{self._format_api_text(apis)}
+
+请以JSON格式返回结果，格式为：
+{{
+    "apis": [
+        {{
+            "index": 1,
+            "labels": {{
+                "CWE编号": {{
+                    "type": "source/sink",
+                    "sink_args": [如果type是sink，指出哪些参数是危险的（索引从0开始）],
+                    "confidence": 0-100
+                }}
+            }}
+        }}
+    ]
+}}"""
+        
+        return user_prompt
+    
+    def _parse_multi_response(self, content: str, original_apis: List[Dict], cwe_types: List[str]) -> List[Dict]:
+        """解析多CWE推断响应"""
+        try:
+            content = content.strip()
+            if content.startswith("```json"):
+                content = content[7:]
+            if content.startswith("```"):
+                content = content[3:]
+            if content.endswith("```"):
+                content = content[:-3]
+            data = json.loads(content.strip())
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON解析失败: {e}")
+            data = {}
+        
+        result_by_index = {}
+        for item in data.get("apis", []) if isinstance(data, dict) else []:
+            if isinstance(item, dict) and item.get("index") is not None:
+                result_by_index[item["index"]] = item
+        
+        for idx, api in enumerate(original_apis, 1):
+            labels = {}
+            raw_labels = result_by_index.get(idx, {}).get("labels") or {}
+            for cwe, label in raw_labels.items():
+                if cwe not in cwe_types or not isinstance(label, dict):
+                    continue
+                if label.get("type") not in ("source", "sink"):
+                    continue
+                labels[cwe] = {
+                    "type": label["type"],
+                    "confidence": label.get("confidence", 50),
+                    "sink_args": label.get("sink_args", [])
+                }
+            api["llm_labels"] = labels
+        
+        return original_apis
     
     def _parse_response(self, content: str, original_apis: List[Dict]) -> List[Dict]:
         """解析LLM响应"""
@@ -508,10 +867,13 @@ CWE描述: {cwe_description}
         path: List[Dict],
         cwe_type: str,
         code_snippets: Dict[str, str],
-        symbolic_features: Dict[str, Any]
+        symbolic_features: Dict[str, Any],
+        timeout: float = None
     ) -> Dict:
         """
         增强版路径验证 - 融合符号分析特征
+        
+        timeout 为单次LLM请求的超时时间（秒），默认使用 REQUEST_TIMEOUT
         """
         
         # ============ 最小化的快速规则检查 ============
@@ -596,16 +958,22 @@ CWE描述: {cwe_description}
         
         cwe_hint = cwe_hints.get(cwe_type, "")
         
-        user_prompt = f"""你是一个严谨的安全专家，需要严格判断以下数据流路径是否构成**真实可利用**的漏洞。
-
-【CWE类型】: {cwe_type}
-【CWE描述】: {CWE_DESCRIPTIONS.get(cwe_type, '')}
-{cwe_hint}
+        # ============ 数据流部分 ============
+        path_slice = code_snippets.get('slice')
+        if path_slice:
+            # 路径切片不含行号，代码位置变化不影响提示词（和请求缓存键）
+            flow_section = f"""【源(Source) - 用户输入入口】:
+文件: {source.get('file', '')}
+{source_context}
 
-【符号分析结果】:
-{features_desc}
+【汇(Sink) - 危险函数调用】:
+文件: {sink.get('file', '') if sink else source.get('file', '')}
+{sink_context}
 
-【源(Source) - 用户输入入口】:
+【污点路径切片】（→ 标记路径经过的语句，... 表示省略的无关代码）:
+{path_slice}"""
+        else:
+            flow_section = f"""【源(Source) - 用户输入入口】:
 文件: {source.get('file', '')}
 行号: {source.get('line', '')}
 代码上下文:
@@ -618,7 +986,18 @@ CWE描述: {cwe_description}
 {sink_context}
 
 【完整污点传播路径】:
-{chr(10).join(path_desc) if path_desc else "无详细路径信息"}
+{chr(10).join(path_desc) if path_desc else "无详细路径信息"}"""
+        
+        user_prompt = f"""你是一个严谨的安全专家，需要严格判断以下数据流路径是否构成**真实可利用**的漏洞。
+
+【CWE类型】: {cwe_type}
+【CWE描述】: {CWE_DESCRIPTIONS.get(cwe_type, '')}
+{cwe_hint}
+
+【符号分析结果】:
+{features_desc}
+
+{flow_section}
 
 【判断标准】:
 
@@ -660,18 +1039,7 @@ CWE描述: {cwe_description}
 }}"""
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT_PATH_VALIDATION},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=config.MAX_TOKENS,
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
+            content = self._chat_completion(SYSTEM_PROMPT_PATH_VALIDATION, user_prompt, timeout=timeout)
             
             # 清理响应
             if content.startswith("```json"):
@@ -683,11 +1051,6 @@ CWE描述: {cwe_description}
             
             result = json.loads(content)
             
-            # 更新统计
-            self.stats["calls"] += 1
-            if hasattr(response, 'usage') and response.usage:
-                self.stats["tokens"] += response.usage.total_tokens
-            
             return result
             
         except Exception as e:
@@ -709,7 +1072,8 @@ CWE描述: {cwe_description}
         sink: Dict,
         path: List[Dict],
         cwe_type: str,
-        code_snippets: Dict[str, str]
+        code_snippets: Dict[str, str],
+        timeout: float = None
     ) -> Dict:
         """
         兼容原版接口，调用增强版
@@ -720,9 +1084,153 @@ CWE描述: {cwe_description}
             path=path,
             cwe_type=cwe_type,
             code_snippets=code_snippets,
-            symbolic_features={}
+            symbolic_features={},
+            timeout=timeout
         )
     
+    # ============ LLM请求（带请求级缓存） ============
+    
+    @staticmethod
+    def _normalize_prompt(text: str) -> str:
+        """规范化提示词：去掉行尾空白和多余空行，避免无意义的格式差异导致缓存未命中"""
+        lines = [line.rstrip() for line in text.strip().splitlines()]
+        normalized = []
+        for line in lines:
+            if not line and normalized and not normalized[-1]:
+                continue
+            normalized.append(line)
+        return "\n".join(normalized)
+    
+    def _response_cache_key(self, system_prompt: str, user_prompt: str, temperature: float) -> str:
+        """请求级缓存键：模型、系统提示词、用户提示词和温度的规范化哈希"""
+        payload = json.dumps({
+            "model": self.model,
+            "system": self._normalize_prompt(system_prompt),
+            "user": self._normalize_prompt(user_prompt),
+            "temperature": round(float(temperature), 4)
+        }, ensure_ascii=False, sort_keys=True)
+        return "llm:" + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _cache_enabled(self) -> bool:
+        return self.cache is not None and config.PERFORMANCE_CONFIG.get("CACHE_LLM_RESPONSES", True)
+    
+    def _lookup_response(self, cache_key: str) -> Optional[str]:
+        if not self._cache_enabled():
+            return None
+        content = self.cache.get(cache_key)
+        if content is not None:
+            with self._stats_lock:
+                self.stats["cache_hits"] += 1
+            logger.debug(f"LLM响应缓存命中: {cache_key[:20]}")
+        return content
+    
+    def _store_response(self, cache_key: str, content: str):
+        """缓存响应，只缓存可解析的JSON以免固化错误响应"""
+        if not self._cache_enabled() or not content:
+            return
+        try:
+            json.loads(self._strip_code_fence(content))
+        except json.JSONDecodeError:
+            return
+        self.cache.set(cache_key, content)
+    
+    @staticmethod
+    def _strip_code_fence(content: str) -> str:
+        content = content.strip()
+        if content.startswith("```json"):
+            content = content[7:]
+        if content.startswith("```"):
+            content = content[3:]
+        if content.endswith("```"):
+            content = content[:-3]
+        return content.strip()
+    
+    def _record_usage(self, response, elapsed: float):
+        with self._stats_lock:
+            self.stats["calls"] += 1
+            if hasattr(response, 'usage') and response.usage:
+                self.stats["tokens"] += response.usage.total_tokens
+            self.stats["total_time"] += elapsed
+    
+    def _chat_completion(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.1,
+        timeout: float = None
+    ) -> str:
+        """
+        发起一次JSON模式的对话请求，相同请求直接返回缓存的响应
+        
+        Args:
+            system_prompt: 系统提示词
+            user_prompt: 用户提示词
+            temperature: 温度
+            timeout: 请求超时（秒），默认使用 REQUEST_TIMEOUT
+            
+        Returns:
+            响应内容
+        """
+        cache_key = self._response_cache_key(system_prompt, user_prompt, temperature)
+        cached = self._lookup_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        start_time = time.time()
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature,
+            max_tokens=config.MAX_TOKENS,
+            response_format={"type": "json_object"},
+            timeout=timeout or config.REQUEST_TIMEOUT
+        )
+        self._record_usage(response, time.time() - start_time)
+        
+        content = response.choices[0].message.content
+        self._store_response(cache_key, content)
+        return content
+    
+    async def _chat_completion_async(
+        self,
+        client: AsyncOpenAI,
+        bucket: TokenBucket,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.1
+    ) -> str:
+        """_chat_completion 的异步版本：经过令牌桶限流，429/5xx按指数退避重试"""
+        cache_key = self._response_cache_key(system_prompt, user_prompt, temperature)
+        cached = self._lookup_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        async def request():
+            await bucket.acquire()
+            return await client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=temperature,
+                max_tokens=config.MAX_TOKENS,
+                response_format={"type": "json_object"}
+            )
+        
+        start_time = time.time()
+        response = await retry_with_backoff(
+            request, max_retries=config.PERFORMANCE_CONFIG.get("LLM_MAX_RETRIES", 5)
+        )
+        self._record_usage(response, time.time() - start_time)
+        
+        content = response.choices[0].message.content
+        self._store_response(cache_key, content)
+        return content
+    
     def get_stats(self) -> Dict:
         """获取统计信息"""
         return self.stats.copy()
@@ -0,0 +1,219 @@
+"""API标签知识库 - 跨项目持久化LLM的source/sink分类结果"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def fq_api_name(api: Dict) -> str:
+    """
+    API的全限定名（包.类.方法），忽略空类名
+
+    包名未解析（缺失或 "unknown"）时返回空串：args.get 这类只有局部名的API在不同项目中含义不同，
+    不能作为跨项目标签的键，调用方应跳过标签库。
+    """
+    package = api.get("package")
+    if not package or package == "unknown":
+        return ""
+    parts = [package, api.get("class"), api.get("method")]
+    return ".".join(part for part in parts if part and part != "unknown")
+
+
+class APILabelStore:
+    """SQLite实现的API标签库
+
+    键为 (全限定API名, CWE, 模型, 提示词版本)。模型或提示词变化后旧标签自动失效。
+    人工标注（origin="manual"）对所有模型和提示词版本生效，且不会被LLM结果覆盖；
+    其它来源的标签只有在新结果置信度不低于已有结果时才会覆盖。
+    """
+
+    SCHEMA_VERSION = 1
+    MANUAL = "manual"
+    ANY = "*"  # 人工标注不区分模型和提示词版本
+
+    def __init__(self, db_path: Path = None, model: str = None, prompt_version: str = None):
+        """
+        初始化标签库
+
+        Args:
+            db_path: 数据库文件路径
+            model: 当前使用的模型名称
+            prompt_version: 当前规范推断提示词版本
+        """
+        from py_safe_scan.llm.prompts import PROMPT_VERSION
+
+        self.db_path = Path(db_path or config.LABEL_STORE_PATH)
+        self.model = model or config.DEEPSEEK_MODEL
+        self.prompt_version = prompt_version or PROMPT_VERSION
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._init_schema()
+
+    def _init_schema(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, self.SCHEMA_VERSION):
+            raise Exception(f"API标签库版本不兼容: {version}（期望 {self.SCHEMA_VERSION}）")
+
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS api_labels (
+                    api TEXT NOT NULL,
+                    cwe TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    confidence INTEGER NOT NULL,
+                    sink_args TEXT NOT NULL DEFAULT '[]',
+                    explanation TEXT NOT NULL DEFAULT '',
+                    origin TEXT NOT NULL DEFAULT 'llm',
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (api, cwe, model, prompt_version)
+                )
+            """)
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def lookup(self, api_name: str, cwe: str) -> Optional[Dict]:
+        """
+        查询API标签，人工标注优先
+
+        Returns:
+            标签字典 {label, confidence, sink_args, explanation, origin}，未命中返回None
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT * FROM api_labels
+                   WHERE api = ? AND cwe = ?
+                     AND ((model = ? AND prompt_version = ?) OR origin = ?)
+                   ORDER BY origin = ? DESC LIMIT 1""",
+                (api_name, cwe, self.model, self.prompt_version, self.MANUAL, self.MANUAL)
+            ).fetchall()
+        return self._row_to_label(rows[0]) if rows else None
+
+    def put(self, api_name: str, cwe: str, label: str, confidence: int,
+            sink_args: List = None, explanation: str = "", origin: str = "llm") -> bool:
+        """
+        写入一条标签
+
+        Returns:
+            是否写入（已有更高置信度或人工标注时不覆盖）
+        """
+        return self.put_many([{
+            "api": api_name, "cwe": cwe, "label": label, "confidence": confidence,
+            "sink_args": sink_args or [], "explanation": explanation, "origin": origin
+        }]) == 1
+
+    def put_many(self, records: Iterable[Dict]) -> int:
+        """
+        批量写入标签（单个事务）
+
+        Args:
+            records: 标签记录，字段同 export_labels 的输出；缺省 model/prompt_version 时使用当前值
+
+        Returns:
+            实际写入的条数
+        """
+        written = 0
+        now = time.time()
+        with self._lock, self._conn:
+            for record in records:
+                origin = record.get("origin", "llm")
+                if origin == self.MANUAL:
+                    model, prompt_version = self.ANY, self.ANY
+                else:
+                    model = record.get("model", self.model)
+                    prompt_version = record.get("prompt_version", self.prompt_version)
+
+                # 置信度感知覆盖：人工标注只被人工标注覆盖，其它标签只被不低于它的置信度覆盖
+                cursor = self._conn.execute(
+                    """INSERT INTO api_labels
+                           (api, cwe, model, prompt_version, label, confidence, sink_args, explanation, origin, updated)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (api, cwe, model, prompt_version) DO UPDATE SET
+                           label = excluded.label,
+                           confidence = excluded.confidence,
+                           sink_args = excluded.sink_args,
+                           explanation = excluded.explanation,
+                           origin = excluded.origin,
+                           updated = excluded.updated
+                       WHERE excluded.origin = ?
+                          OR (api_labels.origin != ? AND excluded.confidence >= api_labels.confidence)""",
+                    (
+                        record["api"], record["cwe"], model, prompt_version,
+                        record["label"], int(record.get("confidence", 0)),
+                        json.dumps(record.get("sink_args") or []),
+                        record.get("explanation") or "", origin, record.get("updated", now),
+                        self.MANUAL, self.MANUAL
+                    )
+                )
+                written += cursor.rowcount
+        return written
+
+    def export_labels(self, path: Path = None) -> List[Dict]:
+        """
+        导出全部标签
+
+        Args:
+            path: 导出的JSON文件路径，None表示只返回不写文件
+
+        Returns:
+            标签记录列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM api_labels ORDER BY api, cwe, model, prompt_version"
+            ).fetchall()
+
+        records = []
+        for row in rows:
+            record = {"api": row["api"], "cwe": row["cwe"], "model": row["model"],
+                      "prompt_version": row["prompt_version"], "updated": row["updated"]}
+            record.update(self._row_to_label(row))
+            records.append(record)
+
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False, indent=2)
+            logger.info(f"导出 {len(records)} 条API标签到: {path}")
+        return records
+
+    def import_labels(self, path: Path) -> int:
+        """从JSON文件批量导入标签，返回实际写入条数"""
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        written = self.put_many(records)
+        logger.info(f"从 {path} 导入 {written}/{len(records)} 条API标签")
+        return written
+
+    def get_stats(self) -> Dict:
+        """获取标签库统计"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT origin, COUNT(*) AS count FROM api_labels GROUP BY origin"
+            ).fetchall()
+        by_origin = {row["origin"]: row["count"] for row in rows}
+        return {"db_path": str(self.db_path), "total": sum(by_origin.values()), "by_origin": by_origin}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_to_label(row: sqlite3.Row) -> Dict:
+        return {
+            "label": row["label"],
+            "confidence": row["confidence"],
+            "sink_args": json.loads(row["sink_args"]),
+            "explanation": row["explanation"],
+            "origin": row["origin"]
+        }
@@ -1,5 +1,8 @@
 """LLM提示词模板 - 完整版支持所有CWE类型"""
 
+# 规范推断提示词版本：修改规范推断提示词或示例后递增，API标签库中的旧标签随之失效
+PROMPT_VERSION = "1"
+
 # ============ 系统提示词 - 规范推断 ============
 SYSTEM_PROMPT_SPEC_INFERENCE = """你是一个精通Python安全的专家。你需要分析给定的API列表，判断每个API在安全漏洞检测中扮演的角色。
 
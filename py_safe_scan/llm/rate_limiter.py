@@ -0,0 +1,91 @@
+"""LLM请求限流与重试 - 令牌桶限流器和指数退避重试"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """异步令牌桶限流器：平均速率 rate 个/秒，允许 capacity 个突发"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数，小于等于0表示不限流
+            capacity: 桶容量（最大突发请求数）
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1):
+        """获取令牌，不足时等待"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """判断是否为可重试的错误：429、5xx、连接错误或超时"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+
+    try:
+        from openai import APIConnectionError, APITimeoutError
+        if isinstance(error, (APIConnectionError, APITimeoutError)):
+            return True
+    except ImportError:
+        pass
+
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError))
+
+
+async def retry_with_backoff(
+    func: Callable[[], Awaitable[T]],
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0
+) -> T:
+    """
+    带指数退避的异步重试
+
+    Args:
+        func: 每次重试都重新调用的协程工厂
+        max_retries: 最大重试次数
+        base_delay: 初始退避时间（秒）
+        max_delay: 最大退避时间（秒）
+    """
+    attempt = 0
+    while True:
+        try:
+            return await func()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            delay = min(max_delay, base_delay * (2 ** attempt))
+            delay *= 0.5 + random.random() / 2  # 抖动，避免并发请求同时重试
+            attempt += 1
+            logger.warning(f"LLM请求失败({e})，{delay:.1f}秒后第{attempt}次重试")
+            await asyncio.sleep(delay)
@@ -10,6 +10,8 @@ from typing import List, Optional, Dict
 
 from py_safe_scan.core.pipeline import PySafeScanPipeline
 from py_safe_scan.utils.sarif_generator import SARIFGenerator
+from py_safe_scan.utils.sarif_stream import json_default
+from py_safe_scan.llm.label_store import APILabelStore
 from py_safe_scan.llm.prompts import CWE_DESCRIPTIONS
 import config
 
@@ -46,13 +48,19 @@ def parse_arguments():
 
   # 显示详细漏洞路径
   python -m py_safe_scan.main --target app.py --cwe CWE-89 --verbose
+
+  # 一次扫描覆盖所有支持的CWE
+  python -m py_safe_scan.main --target ./my_project --cwes
+
+  # 导出/导入跨项目共享的API标签库
+  python -m py_safe_scan.main --export-labels labels.json
+  python -m py_safe_scan.main --import-labels labels.json
         """
     )
     
     parser.add_argument(
         "--target", 
         type=str, 
-        required=True,
         help="目标文件或目录路径"
     )
     
@@ -64,6 +72,14 @@ def parse_arguments():
         help="要检测的CWE类型 (默认: CWE-89)"
     )
     
+    parser.add_argument(
+        "--cwes", 
+        type=str, 
+        nargs="*",
+        choices=config.SUPPORTED_CWES,
+        help="多CWE单遍扫描：同时检测多个CWE（不带参数表示全部支持的CWE）"
+    )
+    
     parser.add_argument(
         "--config", 
         type=str,
@@ -100,6 +116,26 @@ def parse_arguments():
         help="禁用缓存"
     )
     
+    parser.add_argument(
+        "--incremental", 
+        action="store_true",
+        help="增量扫描：只重新分析上次扫描后变化的文件"
+    )
+    
+    parser.add_argument(
+        "--import-labels", 
+        type=str,
+        metavar="FILE",
+        help="扫描前把JSON文件中的API标签导入标签库"
+    )
+    
+    parser.add_argument(
+        "--export-labels", 
+        type=str,
+        metavar="FILE",
+        help="把API标签库导出为JSON文件"
+    )
+    
     parser.add_argument(
         "--debug", 
         action="store_true",
@@ -113,7 +149,10 @@ def parse_arguments():
         help="最大分析文件数 (默认: 1000)"
     )
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if not args.target and not (args.import_labels or args.export_labels):
+        parser.error("必须指定 --target")
+    return args
 
 
 def main():
@@ -124,6 +163,11 @@ def main():
         logging.getLogger().setLevel(logging.DEBUG)
         logger.debug("调试模式已启用")
     
+    if args.import_labels or args.export_labels:
+        manage_labels(args)
+        if not args.target:
+            sys.exit(0)
+    
     start_time = time.time()
     
     try:
@@ -131,7 +175,8 @@ def main():
         pipeline = PySafeScanPipeline(
             cwe_type=args.cwe,
             config_path=args.config,
-            use_cache=not args.no_cache
+            use_cache=not args.no_cache,
+            incremental=args.incremental
         )
         
         # 执行分析
@@ -143,7 +188,14 @@ def main():
         logger.info(f"开始分析目标: {target_path} (CWE: {args.cwe})")
         logger.info(f"CWE描述: {CWE_DESCRIPTIONS.get(args.cwe, '未知')}")
         
-        if target_path.is_file() and target_path.suffix == '.py':
+        if args.cwes is not None and not target_path.is_dir():
+            logger.error(f"--cwes 多CWE扫描只支持目录目标: {target_path}")
+            sys.exit(1)
+        
+        if args.cwes is not None:
+            # 多CWE单遍扫描
+            results = pipeline.analyze_directory_multi(target_path, args.cwes or None)
+        elif target_path.is_file() and target_path.suffix == '.py':
             # 分析单个文件
             results = pipeline.analyze_file(target_path)
         elif target_path.is_dir():
@@ -176,9 +228,9 @@ def main():
                 # 保存为JSON
                 with open(output_path, 'w', encoding='utf-8') as f:
                     if args.pretty:
-                        json.dump(results, f, indent=2, default=str, ensure_ascii=False)
+                        json.dump(results, f, indent=2, default=json_default, ensure_ascii=False)
                     else:
-                        json.dump(results, f, default=str, ensure_ascii=False)
+                        json.dump(results, f, default=json_default, ensure_ascii=False)
                 logger.info(f"结果已保存: {output_path}")
         else:
             # 打印到控制台
@@ -201,6 +253,20 @@ def main():
         sys.exit(1)
 
 
+def manage_labels(args):
+    """导入/导出API标签库"""
+    label_store = APILabelStore()
+    try:
+        if args.import_labels:
+            label_store.import_labels(Path(args.import_labels))
+        if args.export_labels:
+            label_store.export_labels(Path(args.export_labels))
+        stats = label_store.get_stats()
+        print(f"API标签库: {stats['total']} 条 ({stats['db_path']})")
+    finally:
+        label_store.close()
+
+
 def print_results(results: dict, verbose: bool):
     """打印分析结果"""
     if not results.get("vulnerabilities"):
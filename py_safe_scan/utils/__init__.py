@@ -1,3 +1,6 @@
 """工具模块"""
 from py_safe_scan.utils.file_utils import FileUtils
+from py_safe_scan.utils.file_discovery import FileDiscovery
 from py_safe_scan.utils.sarif_generator import SARIFGenerator
+from py_safe_scan.utils.source_index import SourceIndex, get_source_index
+from py_safe_scan.utils.sarif_stream import SarifRef, SarifStreamReader, iter_sarif_results
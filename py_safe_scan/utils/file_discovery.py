@@ -0,0 +1,295 @@
+"""文件发现 - 基于 os.scandir 的剪枝目录遍历
+
+被排除的目录在进入前剪枝，支持各级 .gitignore 和 configs/default.yaml 的 exclude 规则。
+子目录列表由线程池预取，结果按路径排序流式产出（与 sorted(路径列表) 顺序一致）。
+"""
+
+import fnmatch
+import logging
+import os
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+try:
+    import yaml
+except ImportError:  # 可选依赖，没有时使用内置排除规则
+    yaml = None
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 与 configs/default.yaml 中的 exclude 一致，配置文件不可用时使用
+DEFAULT_EXCLUDE = {
+    "directories": [".git", "__pycache__", "node_modules", "venv", ".venv"],
+    "files": ["*.pyc", "*.pyo", "*.pyd"],
+    "patterns": ["test_*.py", "*_test.py"]
+}
+
+
+class _Entry(NamedTuple):
+    name: str
+    path: Path
+    is_dir: bool
+
+
+class _Listing(NamedTuple):
+    entries: List[_Entry]
+    gitignore: Optional[str]
+
+
+class GitIgnoreRule:
+    """单条 .gitignore 规则"""
+
+    def __init__(self, pattern: str, base: str):
+        """
+        Args:
+            pattern: 规则文本（已去掉注释和空行）
+            base: .gitignore 所在目录（相对扫描根目录，posix，根目录为空串）
+        """
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        if pattern.startswith("\\"):
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+
+        self.base = base
+        regex = self._translate(pattern)
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        self._regex = re.compile(f"^{regex}$")
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        """把 gitignore 通配符转换为正则（支持 **、*、? 和字符类）"""
+        parts = []
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith("**/", i):
+                parts.append("(?:.*/)?")
+                i += 3
+            elif pattern.startswith("**", i):
+                parts.append(".*")
+                i += 2
+            elif pattern[i] == "*":
+                parts.append("[^/]*")
+                i += 1
+            elif pattern[i] == "?":
+                parts.append("[^/]")
+                i += 1
+            elif pattern[i] == "[":
+                end = pattern.find("]", i + 1)
+                if end == -1:
+                    parts.append(re.escape(pattern[i]))
+                    i += 1
+                else:
+                    body = pattern[i + 1:end]
+                    if body.startswith("!"):
+                        body = "^" + body[1:]
+                    parts.append(f"[{body}]")
+                    i = end + 1
+            else:
+                parts.append(re.escape(pattern[i]))
+                i += 1
+        return "".join(parts)
+
+    def match(self, rel_path: str, is_dir: bool) -> bool:
+        """判断路径（相对扫描根目录）是否命中本规则"""
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        return self._regex.match(rel_path) is not None
+
+
+def parse_gitignore(text: str, base: str = "") -> List[GitIgnoreRule]:
+    """解析 .gitignore 内容"""
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        rules.append(GitIgnoreRule(line, base))
+    return rules
+
+
+def load_exclude_config(config_path: Path = None) -> Dict[str, List[str]]:
+    """
+    读取扫描配置中的 exclude 段
+
+    Args:
+        config_path: 配置文件路径，默认 config.SCAN_CONFIG_FILE
+
+    Returns:
+        {"directories": [...], "files": [...], "patterns": [...]}
+    """
+    config_path = config_path or config.SCAN_CONFIG_FILE
+    if yaml is None or not Path(config_path).exists():
+        return dict(DEFAULT_EXCLUDE)
+
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+    except Exception as e:
+        logger.warning(f"读取扫描配置失败 {config_path}: {e}")
+        return dict(DEFAULT_EXCLUDE)
+
+    exclude = data.get("exclude") or {}
+    return {key: list(exclude.get(key) or []) for key in DEFAULT_EXCLUDE}
+
+
+class FileDiscovery:
+    """目录遍历器
+
+    排除规则（任一命中即排除，目录命中时整棵子树不再遍历）：
+    - exclude.directories: 目录名
+    - exclude.files / exclude.patterns: 文件名通配符
+    - ignore_patterns: 相对路径子串（目录以 / 结尾），兼容旧的过滤方式
+    - 各级 .gitignore（后出现的规则优先，支持 ! 取反）
+    """
+
+    def __init__(
+        self,
+        suffixes: Tuple[str, ...] = (".py",),
+        exclude: Dict[str, List[str]] = None,
+        ignore_patterns: Iterable[str] = None,
+        use_gitignore: bool = True,
+        follow_symlinks: bool = False,
+        workers: int = None
+    ):
+        """
+        初始化遍历器
+
+        Args:
+            suffixes: 需要的文件后缀
+            exclude: exclude 规则，None表示读取扫描配置
+            ignore_patterns: 相对路径子串排除规则
+            use_gitignore: 是否遵守 .gitignore
+            follow_symlinks: 是否进入符号链接目录
+            workers: 预取目录列表的线程数，1为串行，None读取配置
+
+        Raises:
+            ValueError: workers 小于1
+        """
+        exclude = exclude if exclude is not None else load_exclude_config()
+        self.suffixes = suffixes
+        self.exclude_dirs: Set[str] = set(exclude.get("directories", []))
+        self.exclude_files: List[str] = list(exclude.get("files", [])) + list(exclude.get("patterns", []))
+        self.ignore_patterns = list(ignore_patterns or [])
+        self.use_gitignore = use_gitignore
+        self.follow_symlinks = follow_symlinks
+        if workers is None:
+            workers = config.PERFORMANCE_CONFIG.get("DISCOVERY_WORKERS", 8)
+        if workers < 1:
+            raise ValueError(f"workers 必须大于等于1: {workers}")
+        self.workers = workers
+
+    def iter_files(self, directory: Path, recursive: bool = True) -> Iterator[Path]:
+        """
+        按排序顺序产出目录下符合条件的文件
+
+        Args:
+            directory: 扫描根目录
+            recursive: 是否递归
+
+        Yields:
+            文件路径
+        """
+        directory = Path(directory)
+        if not directory.is_dir():
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 and recursive else None
+        try:
+            root = self._submit(executor, directory)
+            yield from self._walk(executor, directory, "", root, [], recursive)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def _walk(self, executor, directory: Path, rel_dir: str, listing: "Future[_Listing]",
+              rules: List[GitIgnoreRule], recursive: bool) -> Iterator[Path]:
+        entries, gitignore = listing.result()
+        if gitignore and self.use_gitignore:
+            rules = rules + parse_gitignore(gitignore, rel_dir)
+
+        # 先为本层保留的子目录提交预取，再按名称顺序产出文件或深入子目录
+        kept = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir:
+                if recursive and not self._excluded_dir(entry.name, rel_path, rules):
+                    kept.append((entry, rel_path, self._submit(executor, entry.path)))
+            elif entry.name.endswith(self.suffixes) and not self._excluded_file(entry.name, rel_path, rules):
+                kept.append((entry, rel_path, None))
+
+        for entry, rel_path, child in kept:
+            if child is None:
+                yield entry.path
+            else:
+                yield from self._walk(executor, entry.path, rel_path, child, rules, recursive)
+
+    def _submit(self, executor, directory: Path) -> "Future[_Listing]":
+        if executor is not None:
+            return executor.submit(self._scan, directory)
+        future = Future()
+        future.set_result(self._scan(directory))
+        return future
+
+    def _scan(self, directory: Path) -> _Listing:
+        """列出目录（在工作线程中执行），返回按名称排序的条目"""
+        entries = []
+        gitignore = None
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                            entries.append(_Entry(entry.name, Path(entry.path), True))
+                        elif entry.is_file():
+                            if entry.name == ".gitignore" and self.use_gitignore:
+                                with open(entry.path, 'r', encoding='utf-8', errors='replace') as f:
+                                    gitignore = f.read()
+                            entries.append(_Entry(entry.name, Path(entry.path), False))
+                    except OSError as e:
+                        logger.debug(f"跳过无法访问的路径 {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"无法读取目录 {directory}: {e}")
+        entries.sort(key=lambda entry: entry.name)
+        return _Listing(entries, gitignore)
+
+    def _excluded_dir(self, name: str, rel_path: str, rules: List[GitIgnoreRule]) -> bool:
+        if name in self.exclude_dirs:
+            return True
+        if any(pattern in rel_path + "/" for pattern in self.ignore_patterns):
+            return True
+        return self._gitignored(rel_path, True, rules)
+
+    def _excluded_file(self, name: str, rel_path: str, rules: List[GitIgnoreRule]) -> bool:
+        if any(fnmatch.fnmatch(name, pattern) for pattern in self.exclude_files):
+            return True
+        if any(pattern in rel_path for pattern in self.ignore_patterns):
+            return True
+        return self._gitignored(rel_path, False, rules)
+
+    @staticmethod
+    def _gitignored(rel_path: str, is_dir: bool, rules: List[GitIgnoreRule]) -> bool:
+        ignored = False
+        for rule in rules:
+            if rule.match(rel_path, is_dir):
+                ignored = not rule.negate
+        return ignored
+
+
+def discover_python_files(directory: Path, recursive: bool = True,
+                          ignore_patterns: Iterable[str] = None) -> Iterator[Path]:
+    """按排序顺序产出目录下的Python文件（使用扫描配置中的排除规则）"""
+    return FileDiscovery(ignore_patterns=ignore_patterns).iter_files(directory, recursive)
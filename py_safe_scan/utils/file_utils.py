@@ -2,16 +2,25 @@
 
 import logging
 from pathlib import Path
-from typing import List, Optional, Set
-import linecache
+from typing import Dict, List, Optional, Set
 import os
 
+from py_safe_scan.utils.file_discovery import discover_python_files
+from py_safe_scan.utils.source_index import SourceIndex, get_source_index
+
 logger = logging.getLogger(__name__)
 
 
 class FileUtils:
     """文件工具类"""
     
+    def __init__(self, source_index: SourceIndex = None):
+        """
+        Args:
+            source_index: 读取结果中源码片段使用的索引，默认使用进程内共享索引
+        """
+        self.source_index = source_index or get_source_index()
+    
     @staticmethod
     def read_file(file_path: Path) -> Optional[str]:
         """
@@ -64,30 +73,43 @@ class FileUtils:
                 'examples/', 'docs/', 'migrations/', '.git/'
             }
         
+        # 忽略模式按相对扫描目录的路径匹配，被忽略的目录不会进入
         python_files = []
-        
-        if recursive:
-            pattern = '**/*.py'
-        else:
-            pattern = '*.py'
-        
-        for py_file in directory.glob(pattern):
+        for py_file in discover_python_files(directory, recursive, ignore_patterns):
             if len(python_files) >= max_files:
                 logger.warning(f"达到最大文件数限制 ({max_files})")
                 break
+            python_files.append(py_file)
+        
+        return python_files
+    
+    def resolve_source_path(self, file_path: str) -> Optional[Path]:
+        """
+        解析结果中的源文件路径（结果中的路径可能相对于数据库源码根目录）
+        
+        Args:
+            file_path: 文件路径
             
-            if py_file.is_file():
-                # 检查是否应该忽略
-                str_path = str(py_file)
-                should_ignore = any(pattern in str_path for pattern in ignore_patterns)
-                
-                if not should_ignore:
-                    python_files.append(py_file)
+        Returns:
+            存在的文件路径，找不到返回None
+        """
+        return self.source_index.resolve(file_path)
+    
+    def get_code_lines(self, file_path: str, start_line: int, end_line: int) -> List[str]:
+        """
+        获取指定行范围的源码（不带行号）
         
-        return sorted(python_files)
+        Args:
+            file_path: 文件路径
+            start_line: 起始行（含，从1开始）
+            end_line: 结束行（含）
+            
+        Returns:
+            源码行列表，文件不存在时为空列表
+        """
+        return self.source_index.get_lines(file_path, start_line, end_line)
     
-    @staticmethod
-    def get_code_snippet(file_path: str, line_number: int, context_lines: int = 5) -> str:
+    def get_code_snippet(self, file_path: str, line_number: int, context_lines: int = 5) -> str:
         """
         获取代码片段
         
@@ -99,41 +121,7 @@ class FileUtils:
         Returns:
             代码片段
         """
-        # 基准测试的基础路径
-        benchmark_base = Path("/home/hanahanarange/PySafeScan/tests/BenchmarkPython/testcode")
-        
-        # 尝试不同的路径组合
-        possible_paths = [
-            Path(file_path),  # 原始路径
-            benchmark_base / Path(file_path).name,  # 基准测试目录下的文件
-            Path.cwd() / "tests" / "BenchmarkPython" / "testcode" / Path(file_path).name,  # 相对路径
-        ]
-        
-        # 查找存在的文件
-        full_path = None
-        for path in possible_paths:
-            if path.exists():
-                full_path = path
-                logger.debug(f"找到文件: {full_path}")
-                break
-        
-        if not full_path:
-            return f"文件不存在: {file_path}"
-        
-        start_line = max(1, line_number - context_lines)
-        end_line = line_number + context_lines
-        
-        lines = []
-        for i in range(start_line, end_line + 1):
-            line = linecache.getline(str(full_path), i)
-            if line:
-                prefix = "→ " if i == line_number else "  "
-                lines.append(f"{prefix}{i:4d}: {line.rstrip()}")
-        
-        if not lines:
-            return f"无法读取文件内容: {file_path}"
-        
-        return "\n".join(lines)
+        return self.source_index.get_snippet(file_path, line_number, context_lines)
     
     @staticmethod
     def is_safe_path(base_path: Path, user_path: str) -> bool:
@@ -166,7 +154,45 @@ class FileUtils:
                 return hashlib.sha256(f.read()).hexdigest()
         except Exception:
             return ""
-    
+
+    @staticmethod
+    def get_tree_hashes(directory: Path, skip_dirs: Set[str] = None) -> Dict[str, str]:
+        """
+        获取目录下所有文件的哈希值
+
+        Args:
+            directory: 目录路径
+            skip_dirs: 跳过的目录名
+
+        Returns:
+            {相对路径(posix): sha256}，按路径排序
+        """
+        if skip_dirs is None:
+            skip_dirs = {'.git', '__pycache__'}
+
+        hashes = {}
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames[:] = sorted(d for d in dirnames if d not in skip_dirs)
+            for name in sorted(filenames):
+                file_path = Path(dirpath) / name
+                rel_path = file_path.relative_to(directory).as_posix()
+                hashes[rel_path] = FileUtils.get_file_hash(file_path)
+
+        return dict(sorted(hashes.items()))
+
+    @staticmethod
+    def get_tree_hash(directory: Path) -> str:
+        """获取整个目录树的内容哈希（路径+内容）"""
+        import hashlib
+
+        digest = hashlib.sha256()
+        for rel_path, file_hash in FileUtils.get_tree_hashes(directory).items():
+            digest.update(rel_path.encode('utf-8'))
+            digest.update(b"\0")
+            digest.update(file_hash.encode('ascii'))
+            digest.update(b"\n")
+        return digest.hexdigest()
+
     @staticmethod
     def ensure_directory(directory: Path):
         """确保目录存在"""
@@ -100,6 +100,7 @@ class SARIFGenerator:
             "properties": {
                 "filesScanned": stats.get("files_scanned", 0),
                 "llmCalls": stats.get("llm_calls", 0),
+                "llmCacheHits": stats.get("llm_cache_hits", 0),
                 "cacheHits": stats.get("cache_hits", 0)
             }
         }
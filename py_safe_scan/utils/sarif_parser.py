@@ -3,7 +3,9 @@
 import json
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator
+
+from py_safe_scan.utils.sarif_stream import SarifRef, SarifStreamReader
 
 logger = logging.getLogger(__name__)
 
@@ -28,14 +30,44 @@ class SARIFParser:
             return []
         
         try:
-            with open(sarif_path, 'r', encoding='utf-8') as f:
-                sarif_data = json.load(f)
-            
-            return self._parse_sarif(sarif_data)
+            return list(self.iter_file(sarif_path))
         except Exception as e:
             logger.error(f"解析SARIF文件失败: {e}")
             return []
     
+    def iter_file(self, sarif_path: Path) -> Iterator[Dict]:
+        """
+        流式解析SARIF文件，逐条产出漏洞（不把整个文档读入内存）
+        
+        Args:
+            sarif_path: SARIF文件路径
+            
+        Yields:
+            漏洞信息
+        """
+        rules = None
+        pending = []
+        reader = SarifStreamReader(sarif_path, capture=("tool",))
+        for kind, _, _, value in reader.events():
+            if kind == "run_start":
+                rules, pending = None, []
+            elif kind == "run_field":
+                rules = self._extract_rules({"tool": value})
+            elif kind == "result":
+                if rules is None:
+                    # tool 出现在 results 之后（非CodeQL输出），先暂存到 run 结束
+                    pending.append((value, reader.result_ref))
+                    continue
+                vuln = self._parse_result(value, rules, reader.result_ref)
+                if vuln:
+                    yield vuln
+            elif kind == "run_end" and pending:
+                for result, ref in pending:
+                    vuln = self._parse_result(result, rules or {}, ref)
+                    if vuln:
+                        yield vuln
+                pending = []
+    
     def parse_string(self, sarif_str: str) -> List[Dict]:
         """解析SARIF字符串"""
         try:
@@ -86,8 +118,8 @@ class SARIFParser:
         
         return rules
     
-    def _parse_result(self, result: Dict, rules: Dict) -> Optional[Dict]:
-        """解析单个结果"""
+    def _parse_result(self, result: Dict, rules: Dict, ref: SarifRef = None) -> Optional[Dict]:
+        """解析单个结果（原始结果通过 sarif_ref 延迟读取，解析字符串时为None）"""
         try:
             rule_id = result.get("ruleId")
             rule_info = rules.get(rule_id, {})
@@ -128,7 +160,7 @@ class SARIFParser:
                 "code": snippet,
                 "severity": severity,
                 "path": path,
-                "raw": result
+                "sarif_ref": ref
             }
         except Exception as e:
             logger.debug(f"解析结果失败: {e}")
@@ -0,0 +1,243 @@
+"""SARIF流式读取 - 逐条产出 runs[*].results[*]，内存占用与文件大小无关
+
+只逐字符扫描文档骨架（顶层对象、runs 数组、run 对象的键），每个值交给
+json.JSONDecoder.raw_decode 一次解码。缓冲区只保留尚未消费的部分，
+峰值内存约为最大的单个结果加一个读块。
+
+每条结果可以附带 SarifRef（文件内字节偏移和长度），需要原始结果时再按引用读取，
+解析后的漏洞信息不必持有整个结果对象。
+"""
+
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = " \t\n\r"
+# 标量（数字、true/false/null）之后允许出现的字符
+_SCALAR_END = re.compile(r"[,}\]\s]")
+
+
+class SarifRef:
+    """SARIF文件中单条结果的延迟引用（在该SARIF文件被下一次查询覆盖前有效）"""
+
+    __slots__ = ("path", "offset", "length")
+
+    def __init__(self, path: Path, offset: int, length: int):
+        """
+        Args:
+            path: SARIF文件路径
+            offset: 结果对象起始字节偏移
+            length: 结果对象字节长度
+        """
+        self.path = Path(path)
+        self.offset = offset
+        self.length = length
+
+    def resolve(self) -> Dict:
+        """读取并解码引用的原始结果"""
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            return json.loads(f.read(self.length).decode('utf-8'))
+
+    def to_dict(self) -> Dict:
+        return {"sarif": str(self.path), "offset": self.offset, "length": self.length}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SarifRef) and (self.path, self.offset, self.length) == (other.path, other.offset, other.length)
+
+    def __repr__(self) -> str:
+        return f"SarifRef({str(self.path)!r}, {self.offset}, {self.length})"
+
+
+def json_default(value: Any) -> Any:
+    """json.dump 的 default：带 to_dict() 的对象（如 SarifRef）输出为字典，其余转为字符串"""
+    to_dict = getattr(value, "to_dict", None)
+    return to_dict() if callable(to_dict) else str(value)
+
+
+class SarifStreamReader:
+    """事件驱动的SARIF读取器
+
+    events() 产出:
+        ("run_start", run_index, None, None)
+        ("run_field", run_index, key, value)   # capture 中的 run 级字段（如 tool）
+        ("result", run_index, result_index, result)
+        ("run_end", run_index, None, None)
+
+    CodeQL 输出中 tool 位于 results 之前，因此处理结果时规则信息已经可用。
+    产出 result 事件后，result_ref 指向该结果在文件中的位置。
+    """
+
+    def __init__(self, sarif_path: Path, capture: Iterable[str] = ("tool",), chunk_size: int = 1 << 16):
+        """
+        初始化读取器
+
+        Args:
+            sarif_path: SARIF文件路径
+            capture: 需要解码并产出的 run 级字段，其余字段解码后丢弃
+            chunk_size: 每次读取的字符数
+        """
+        self.sarif_path = Path(sarif_path)
+        self.capture = set(capture)
+        self.chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._file = None
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        # 字节偏移跟踪：_mark 处字符对应的文件字节偏移为 _mark_bytes
+        self._mark = 0
+        self._mark_bytes = 0
+        self.result_ref: Optional[SarifRef] = None
+
+    # ---------- 缓冲区 ----------
+
+    def _fill(self, size: int = None) -> bool:
+        """读入更多内容，已到文件末尾时返回False"""
+        if self._eof:
+            return False
+        chunk = self._file.read(size or self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # 丢弃已消费的部分，保持缓冲区只含未处理内容
+        self._byte_offset(self._pos)
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        self._mark = 0
+        return True
+
+    def _byte_offset(self, pos: int) -> int:
+        """缓冲区位置对应的文件字节偏移（位置只会单调前进，增量编码计算）"""
+        if pos > self._mark:
+            self._mark_bytes += len(self._buf[self._mark:pos].encode('utf-8'))
+            self._mark = pos
+        return self._mark_bytes
+
+    def _peek(self) -> str:
+        """跳过空白并返回下一个字符，文件结束时返回空串"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(f"SARIF格式错误: 位置附近期望 {chars!r}，实际为 {char!r}")
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        """解码下一个完整的JSON值，内容不完整时扩大读取量后重试"""
+        self._peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill(size):
+                    raise
+                size *= 2
+                continue
+            # 数字或字面量可能在读取块边界处被截断（如 "-2." 被解码为 -2），
+            # 缓冲区中已出现其后的结构字符或空白、或已到文件末尾时才算完整
+            if not isinstance(value, (dict, list, str)):
+                while not _SCALAR_END.search(self._buf, self._pos) and self._fill(size):
+                    # 缓冲区被截去已消费部分，按新位置重新解码
+                    value, end = self._decoder.raw_decode(self._buf, self._pos)
+            self._pos = end
+            return value
+
+    def _result(self) -> Any:
+        """解码一条结果，并记录其字节范围"""
+        self._peek()
+        start = self._byte_offset(self._pos)
+        value = self._value()
+        end = self._byte_offset(self._pos)
+        self.result_ref = SarifRef(self.sarif_path, start, end - start)
+        return value
+
+    def _members(self) -> Iterator[str]:
+        """遍历当前对象的键（调用方负责消费每个键对应的值）"""
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def _elements(self) -> Iterator[int]:
+        """遍历当前数组的元素下标（调用方负责消费每个元素）"""
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self._expect(",]") == "]":
+                return
+
+    # ---------- 事件 ----------
+
+    def events(self) -> Iterator[Tuple[str, int, Any, Any]]:
+        """按文档顺序产出事件"""
+        # newline='' 保留原始换行，字节偏移与文件一致
+        with open(self.sarif_path, 'r', encoding='utf-8', newline='') as f:
+            self._file = f
+            self._buf, self._pos, self._eof = "", 0, False
+            self._mark, self._mark_bytes = 0, 0
+            try:
+                for key in self._members():
+                    if key != "runs":
+                        self._value()
+                        continue
+                    for run_index in self._elements():
+                        yield ("run_start", run_index, None, None)
+                        for run_key in self._members():
+                            if run_key == "results":
+                                for result_index in self._elements():
+                                    yield ("result", run_index, result_index, self._result())
+                            elif run_key in self.capture:
+                                yield ("run_field", run_index, run_key, self._value())
+                            else:
+                                self._value()
+                        yield ("run_end", run_index, None, None)
+            finally:
+                self._file = None
+                self._buf = ""
+
+    def iter_results(self) -> Iterator[Dict]:
+        """逐条产出所有 run 中的结果"""
+        for kind, _, _, value in self.events():
+            if kind == "result":
+                yield value
+
+    def iter_results_with_refs(self) -> Iterator[Tuple[Dict, SarifRef]]:
+        """逐条产出结果及其在文件中的引用"""
+        for result in self.iter_results():
+            yield result, self.result_ref
+
+
+def iter_sarif_results(sarif_path: Path) -> Iterator[Dict]:
+    """逐条读取SARIF文件中的结果"""
+    return SarifStreamReader(sarif_path, capture=()).iter_results()
+
+
+def iter_sarif_result_refs(sarif_path: Path) -> Iterator[Tuple[Dict, SarifRef]]:
+    """逐条读取SARIF文件中的结果及其引用"""
+    return SarifStreamReader(sarif_path, capture=()).iter_results_with_refs()
+
@@ -0,0 +1,216 @@
+"""源文件行索引 - 每个文件只读取一次，按换行偏移切片获取代码片段"""
+
+import logging
+import mmap
+import re
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 基准测试的基础路径（兼容旧的 get_code_snippet 查找逻辑）
+BENCHMARK_BASE = Path("/home/hanahanarange/PySafeScan/tests/BenchmarkPython/testcode")
+
+_NEWLINE = re.compile(b"\n")
+
+
+class SourceFile:
+    """单个源文件的内容和换行偏移"""
+
+    def __init__(self, path: Path, data, offsets: array):
+        """
+        Args:
+            path: 文件路径
+            data: 文件内容（bytes 或 mmap）
+            offsets: 每行起始字节偏移，最后一个元素为文件长度
+        """
+        self.path = path
+        self._data = data
+        self._offsets = offsets
+
+    @classmethod
+    def open(cls, path: Path, mmap_threshold: int) -> "SourceFile":
+        """读取文件并建立行偏移，超过阈值的文件使用mmap
+
+        mmap映射期间文件不应被原地截断（扫描期间源码视为不变，整体替换不受影响）。
+        """
+        with open(path, 'rb') as f:
+            size = f.seek(0, 2)
+            if size >= mmap_threshold:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                f.seek(0)
+                data = f.read()
+
+        offsets = array('q', [0])
+        offsets.extend(match.end() for match in _NEWLINE.finditer(data))
+        if offsets[-1] != len(data):
+            offsets.append(len(data))
+        return cls(path, data, offsets)
+
+    @property
+    def line_count(self) -> int:
+        return len(self._offsets) - 1
+
+    def lines(self, start_line: int, end_line: int) -> List[str]:
+        """
+        获取行范围（含两端，从1开始），超出文件的部分忽略
+
+        Returns:
+            去掉换行符的源码行
+        """
+        start_line = max(1, start_line)
+        end_line = min(end_line, self.line_count)
+        if start_line > end_line:
+            return []
+
+        raw = self._data[self._offsets[start_line - 1]:self._offsets[end_line]]
+        try:
+            text = raw.decode('utf-8')
+        except UnicodeDecodeError:
+            text = raw.decode('latin-1')
+        return [line.rstrip("\r") for line in text.split("\n")[:end_line - start_line + 1]]
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+class SourceIndex:
+    """源文件索引
+
+    结果中的文件路径在一次扫描内只解析一次（包括找不到的路径），
+    文件内容只读取一次，代码片段按行偏移直接切片。
+    扫描开始时调用 reset() 设置源码根目录并丢弃上次扫描的内容。
+    """
+
+    MMAP_THRESHOLD = 1024 * 1024
+
+    def __init__(self, roots: Iterable[Path] = None, mmap_threshold: int = None):
+        """
+        初始化索引
+
+        Args:
+            roots: 解析相对路径时优先使用的源码根目录
+            mmap_threshold: 不小于该字节数的文件使用mmap
+        """
+        self.roots = [Path(root) for root in roots or []]
+        self.mmap_threshold = mmap_threshold or self.MMAP_THRESHOLD
+        self._paths: Dict[str, Optional[Path]] = {}
+        self._files: Dict[Path, Optional[SourceFile]] = {}
+        self._lock = threading.Lock()
+
+    def reset(self, roots: Iterable[Path] = None):
+        """丢弃已缓存的路径和文件内容，并设置新的源码根目录"""
+        with self._lock:
+            for source in self._files.values():
+                if source is not None:
+                    source.close()
+            self._files.clear()
+            self._paths.clear()
+            self.roots = [Path(root) for root in roots or []]
+
+    def _candidates(self, file_path: str) -> List[Path]:
+        path = Path(file_path)
+        candidates = [root / path for root in self.roots] if not path.is_absolute() else []
+        candidates += [
+            path,  # 原始路径
+            BENCHMARK_BASE / path.name,  # 基准测试目录下的文件
+            Path.cwd() / "tests" / "BenchmarkPython" / "testcode" / path.name,  # 相对路径
+        ]
+        return candidates
+
+    def resolve(self, file_path: str) -> Optional[Path]:
+        """
+        解析结果中的文件路径
+
+        Args:
+            file_path: 文件路径（绝对路径或相对源码根目录）
+
+        Returns:
+            存在的文件路径，找不到返回None
+        """
+        if not file_path:
+            return None
+        with self._lock:
+            if file_path in self._paths:
+                return self._paths[file_path]
+
+        resolved = None
+        for candidate in self._candidates(file_path):
+            if candidate.is_file():
+                resolved = candidate
+                logger.debug(f"找到文件: {candidate}")
+                break
+
+        with self._lock:
+            self._paths[file_path] = resolved
+        return resolved
+
+    def get(self, file_path: str) -> Optional[SourceFile]:
+        """获取已索引的源文件，找不到或无法读取时返回None"""
+        path = self.resolve(file_path)
+        if path is None:
+            return None
+
+        with self._lock:
+            if path in self._files:
+                return self._files[path]
+
+        # 在锁外读取文件，其他线程读取别的文件时不会被阻塞
+        try:
+            source = SourceFile.open(path, self.mmap_threshold)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取源文件失败 {path}: {e}")
+            source = None
+
+        with self._lock:
+            existing = self._files.setdefault(path, source)
+        if existing is not source and source is not None:
+            # 其他线程已经先登记了同一文件，使用先登记的版本
+            source.close()
+        return existing
+
+    def get_lines(self, file_path: str, start_line: int, end_line: int) -> List[str]:
+        """获取行范围（含两端），文件不存在时为空列表"""
+        source = self.get(file_path)
+        if source is None:
+            return []
+        return source.lines(start_line, end_line)
+
+    def get_snippet(self, file_path: str, line_number: int, context_lines: int = 5) -> str:
+        """
+        获取带行号的代码片段，目标行以 → 标记
+
+        Args:
+            file_path: 文件路径
+            line_number: 行号
+            context_lines: 上下文行数
+
+        Returns:
+            代码片段，失败时返回说明文字
+        """
+        source = self.get(file_path)
+        if source is None:
+            return f"文件不存在: {file_path}"
+
+        start_line = max(1, line_number - context_lines)
+        lines = []
+        for i, line in enumerate(source.lines(start_line, line_number + context_lines), start_line):
+            prefix = "→ " if i == line_number else "  "
+            lines.append(f"{prefix}{i:4d}: {line.rstrip()}")
+
+        if not lines:
+            return f"无法读取文件内容: {file_path}"
+
+        return "\n".join(lines)
+
+
+_default_index = SourceIndex()
+
+
+def get_source_index() -> SourceIndex:
+    """进程内共享的源文件索引（未注入索引的 FileUtils/PathSlicer 使用）"""
+    return _default_index
@@ -48,6 +48,9 @@ class OWASPBenchmarkEvaluator:
         "redirect": "CWE-601",    # URL重定向
     }
     
+    # 暂不支持的CWE
+    UNSUPPORTED_CWES = ["CWE-328", "CWE-330", "CWE-501", "CWE-798"]
+    
     def __init__(self, test_dir: Path, answer_file: Path, output_dir: Path = None):
         """
         初始化评估器
@@ -156,54 +159,104 @@ class OWASPBenchmarkEvaluator:
             results = pipeline.analyze_file(test_file)
             elapsed = time.time() - start_time
             
-            vulnerabilities = results.get("vulnerabilities", [])
-            detected = len(vulnerabilities) > 0
-            
-            return {
-                "test_name": test_name,
-                "file": str(test_file),
-                "cwe": cwe,
-                "detected": detected,
-                "vulnerabilities": vulnerabilities,
-                "raw_count": results.get("stats", {}).get("vulnerabilities_found", 0),
-                "filtered_count": results.get("stats", {}).get("vulnerabilities_filtered", 0),
-                "confirmed_count": results.get("stats", {}).get("vulnerabilities_confirmed", 0),
-                "llm_calls": results.get("stats", {}).get("llm_calls", 0),
-                "cache_hits": results.get("stats", {}).get("cache_hits", 0),
-                "source_candidates": results.get("stats", {}).get("source_candidates", 0),
-                "sink_candidates": results.get("stats", {}).get("sink_candidates", 0),
-                "time_elapsed": elapsed,
-                "stats": results.get("stats", {}),
-                "success": True
-            }
+            return self._build_test_result(test_name, test_file, cwe, results, elapsed)
             
         except Exception as e:
             logger.error(f"测试失败 {test_name}: {e}")
-            return {
-                "test_name": test_name,
-                "file": str(test_file),
-                "cwe": cwe,
-                "detected": False,
-                "vulnerabilities": [],
-                "raw_count": 0,
-                "filtered_count": 0,
-                "confirmed_count": 0,
-                "llm_calls": 0,
-                "cache_hits": 0,
-                "source_candidates": 0,
-                "sink_candidates": 0,
-                "time_elapsed": 0,
-                "error": str(e),
-                "success": False
-            }
+            return self._build_failed_result(test_name, test_file, cwe, e)
     
-    def run_all_tests(self, categories: List[str] = None, limit: int = None):
+    def run_tests_batch(self, tests: List[Tuple[str, Path, str]], batch_size: int) -> Dict[str, Dict]:
+        """
+        批量运行测试用例 - 同一CWE的文件每 batch_size 个共享一个CodeQL数据库
+        
+        Args:
+            tests: [(test_name, test_file, cwe)]
+            batch_size: 每批文件数
+            
+        Returns:
+            {test_name: 测试结果}
+        """
+        by_cwe = defaultdict(list)
+        for test in tests:
+            by_cwe[test[2]].append(test)
+        
+        batch_results = {}
+        for cwe, cwe_tests in by_cwe.items():
+            for i in range(0, len(cwe_tests), batch_size):
+                chunk = cwe_tests[i:i+batch_size]
+                print(f"📦 批量分析 {cwe}: {len(chunk)} 个文件")
+                
+                start_time = time.time()
+                try:
+                    pipeline = PySafeScanPipeline(cwe_type=cwe, use_cache=True)
+                    results = pipeline.analyze_files([test_file for _, test_file, _ in chunk])
+                except Exception as e:
+                    logger.error(f"批量测试失败 {cwe}: {e}")
+                    for test_name, test_file, _ in chunk:
+                        batch_results[test_name] = self._build_failed_result(test_name, test_file, cwe, e)
+                    continue
+                
+                # 批次耗时平摊到每个文件
+                elapsed = (time.time() - start_time) / len(chunk)
+                for test_name, test_file, _ in chunk:
+                    batch_results[test_name] = self._build_test_result(
+                        test_name, test_file, cwe, results.get(str(test_file), {}), elapsed
+                    )
+        
+        return batch_results
+    
+    def _build_test_result(self, test_name: str, test_file: Path, cwe: str,
+                           results: Dict, elapsed: float) -> Dict:
+        """根据流水线结果构建测试结果"""
+        vulnerabilities = results.get("vulnerabilities", [])
+        detected = len(vulnerabilities) > 0
+        
+        return {
+            "test_name": test_name,
+            "file": str(test_file),
+            "cwe": cwe,
+            "detected": detected,
+            "vulnerabilities": vulnerabilities,
+            "raw_count": results.get("stats", {}).get("vulnerabilities_found", 0),
+            "filtered_count": results.get("stats", {}).get("vulnerabilities_filtered", 0),
+            "confirmed_count": results.get("stats", {}).get("vulnerabilities_confirmed", 0),
+            "llm_calls": results.get("stats", {}).get("llm_calls", 0),
+            "cache_hits": results.get("stats", {}).get("cache_hits", 0),
+            "source_candidates": results.get("stats", {}).get("source_candidates", 0),
+            "sink_candidates": results.get("stats", {}).get("sink_candidates", 0),
+            "time_elapsed": elapsed,
+            "stats": results.get("stats", {}),
+            "success": True
+        }
+    
+    def _build_failed_result(self, test_name: str, test_file: Path, cwe: str, error: Exception) -> Dict:
+        """构建失败的测试结果"""
+        return {
+            "test_name": test_name,
+            "file": str(test_file),
+            "cwe": cwe,
+            "detected": False,
+            "vulnerabilities": [],
+            "raw_count": 0,
+            "filtered_count": 0,
+            "confirmed_count": 0,
+            "llm_calls": 0,
+            "cache_hits": 0,
+            "source_candidates": 0,
+            "sink_candidates": 0,
+            "time_elapsed": 0,
+            "error": str(error),
+            "success": False
+        }
+    
+    def run_all_tests(self, categories: List[str] = None, limit: int = None, batch_size: int = None):
         """
         运行所有测试用例 - 增强版进度显示和统计
         
         Args:
             categories: 要测试的类别列表，None表示全部
             limit: 限制测试数量
+            batch_size: 批量模式下每个共享数据库包含的文件数，None表示逐个运行
         """
         # 收集所有测试文件
         test_files = sorted(self.test_dir.glob("BenchmarkTest*.py"))
@@ -230,6 +283,17 @@ class OWASPBenchmarkEvaluator:
         # 运行测试
         start_time = time.time()
         
+        # 批量模式：预先按CWE分批运行，下面的循环只负责统计和显示
+        batch_results = {}
+        if batch_size:
+            runnable = [
+                (f.stem, f, self.expected_results[f.stem]["cwe"])
+                for f in test_files
+                if f.stem in self.expected_results
+                and self.expected_results[f.stem]["cwe"] not in self.UNSUPPORTED_CWES
+            ]
+            batch_results = self.run_tests_batch(runnable, batch_size)
+        
         print(f"\n{'='*70}")
         print(f"🚀 开始测试 {len(test_files)} 个文件")
         print(f"{'='*70}\n")
@@ -259,8 +323,7 @@ class OWASPBenchmarkEvaluator:
   #              continue
             
             # ============ 跳过不支持的CWE ============
-            unsupported_cwes = ["CWE-328", "CWE-330", "CWE-501", "CWE-798"]
-            if cwe in unsupported_cwes:
+            if cwe in self.UNSUPPORTED_CWES:
                 print(f"[{i:3d}/{len(test_files)}] {test_name:20} ⏭️ 跳过 (CWE不支持)")
                 continue
             # =========================================
@@ -269,7 +332,7 @@ class OWASPBenchmarkEvaluator:
             print(f"[{i:3d}/{len(test_files)}] {test_name:20} ", end="", flush=True)
             
             # 运行测试
-            result = self.run_test(test_name, test_file, cwe)
+            result = batch_results.get(test_name) or self.run_test(test_name, test_file, cwe)
             self.results[test_name] = result
             
             # 更新统计
@@ -598,6 +661,8 @@ def main():
                        help="与原版本比较")
     parser.add_argument("--verbose", action="store_true",
                        help="显示详细信息")
+    parser.add_argument("--batch-size", type=int, default=None,
+                       help="批量模式：每N个同CWE文件共享一个CodeQL数据库")
     
     args = parser.parse_args()
     
@@ -624,7 +689,7 @@ def main():
             print(f"⚠️ CWE {args.cwe} 没有对应的类别，将测试所有")
     
     # 运行测试
-    evaluator.run_all_tests(categories=categories, limit=args.limit)
+    evaluator.run_all_tests(categories=categories, limit=args.limit, batch_size=args.batch_size)
     
     # 如果需要与原版本比较，可以在这里添加
 
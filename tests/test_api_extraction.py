@@ -0,0 +1,93 @@
+"""
+候选API表格提取测试（query run + bqrs decode）
+"""
+
+import csv
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import config
+from py_safe_scan.core.codeql_backend import CodeQLBackend
+from py_safe_scan.core.codeql_manager import CodeQLManager
+from py_safe_scan.core.spec_extractor import SpecExtractor
+
+ROWS = [
+    ["file", "line", "qualified_name", "callee", "call_text"],
+    ["app/views.py", "12", "os.path.join", "os.path.join", "join(...)"],
+    ["app/views.py", "15", "subprocess.run", "run", 'run(["a", "b,c"], shell=True)'],
+    ["app/views.py", "18", "flask.request.args.get", "request.args.get", 'get("q")'],
+    ["app/db.py", "3", "", "self.cursor.execute", 'execute("SELECT a, b FROM t")'],
+    ["app/db.py", "4", "", "", "(...)()"],
+]
+
+
+class _FakeBackend(CodeQLBackend):
+    """记录命令，并在 bqrs decode 时写出CSV"""
+
+    def __init__(self):
+        super().__init__("codeql")
+        self.commands = []
+        self.failure = None
+
+    def run(self, args, timeout=None):
+        self.commands.append(list(args))
+        if args[:2] == ["query", "run"] and self.failure:
+            raise self.failure
+        if args[:2] == ["bqrs", "decode"]:
+            output = next(arg.split("=", 1)[1] for arg in args if arg.startswith("--output="))
+            with open(output, "w", encoding="utf-8", newline="") as f:
+                csv.writer(f).writerows(ROWS)
+
+
+def test_table_query_yields_qualified_apis(tmp_path, monkeypatch):
+    """表格查询结果按行解析为API，调用文本中的逗号不影响解析"""
+    monkeypatch.setattr(CodeQLManager, "_check_codeql", lambda self: None)
+    backend = _FakeBackend()
+    manager = CodeQLManager(workspace_dir=tmp_path, backend=backend)
+    extractor = SpecExtractor(manager)
+
+    apis = [api.to_dict() for api in extractor.iter_candidate_apis(tmp_path / "db")]
+
+    assert [cmd[:2] for cmd in backend.commands] == [["query", "run"], ["bqrs", "decode"]]
+    assert backend.commands[0][-1] == str(config.API_EXTRACT_QUERY)
+    assert [(api["package"], api["class"], api["method"], api["file"], api["line"]) for api in apis] == [
+        ("os", "path", "join", "app/views.py", 12),
+        ("subprocess", "", "run", "app/views.py", 15),
+        ("flask", "request.args", "get", "app/views.py", 18),
+        ("unknown", "cursor", "execute", "app/db.py", 3),
+    ]
+
+
+
+def test_outputs_keyed_by_database_and_only_codeql_failures_fall_back(tmp_path, monkeypatch):
+    """不同数据库的结果文件互不覆盖；只有CodeQL失败才回退到SARIF提取，其他错误照常抛出"""
+    monkeypatch.setattr(CodeQLManager, "_check_codeql", lambda self: None)
+    backend = _FakeBackend()
+    manager = CodeQLManager(workspace_dir=tmp_path, backend=backend)
+    extractor = SpecExtractor(manager)
+
+    first = manager.run_table_query(tmp_path / "db1", Path(config.API_EXTRACT_QUERY))
+    second = manager.run_table_query(tmp_path / "db2", Path(config.API_EXTRACT_QUERY))
+    assert first != second and first.exists() and second.exists()
+
+    fallback = []
+
+    def sarif_apis(db_path):
+        fallback.append(db_path)
+        return iter([])
+
+    monkeypatch.setattr(extractor, "_iter_sarif_apis", sarif_apis)
+    backend.failure = subprocess.CalledProcessError(2, ["query", "run"], stderr="query compilation failed")
+    assert list(extractor.iter_candidate_apis(tmp_path / "db1")) == []
+    assert fallback == [tmp_path / "db1"]
+
+    # 非CodeQL错误（如代码缺陷）不被回退掩盖
+    backend.failure = RuntimeError("bug")
+    with pytest.raises(RuntimeError):
+        list(extractor.iter_candidate_apis(tmp_path / "db1"))
+    assert fallback == [tmp_path / "db1"]
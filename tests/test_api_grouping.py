@@ -0,0 +1,42 @@
+"""
+候选API调用点合并测试
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.core.spec_extractor import fan_out_labels, group_call_sites
+
+
+def _site(method: str, file: str, line: int, context: str, class_name: str = "cursor") -> dict:
+    return {"package": "unknown", "class": class_name, "method": method,
+            "file": file, "line": line, "context": context}
+
+
+def test_group_and_fan_out():
+    """相同API只生成一个代表，分类结果回填到每个调用点"""
+    sites = [
+        _site("execute", "a.py", 1, "ctx-a1"),
+        _site("execute", "a.py", 9, "ctx-a9"),
+        _site("get", "a.py", 2, "ctx-get", class_name="args"),
+        _site("execute", "b.py", 4, "ctx-a1"),
+        _site("execute", "c.py", 7, "ctx-c7"),
+    ]
+
+    groups = group_call_sites(sites, max_contexts=2)
+
+    assert [group.key for group in groups] == [("unknown", "cursor", "execute"), ("unknown", "args", "get")]
+    execute = groups[0].representative
+    assert execute["call_sites"] == 4
+    # 优先取不同文件的上下文，重复上下文只保留一份
+    assert execute["contexts"] == ["ctx-a1", "ctx-c7"]
+
+    execute.update({"llm_label": "sink", "llm_confidence": 90, "sink_args": [0], "explanation": "sql"})
+    groups[1].representative.update({"llm_label": "source", "llm_confidence": 80})
+    fan_out_labels(groups)
+
+    assert [site["llm_label"] for site in sites] == ["sink", "sink", "source", "sink", "sink"]
+    assert all(site["line"] == line for site, line in zip(sites, [1, 9, 2, 4, 7]))
+    assert "contexts" not in sites[0]
@@ -0,0 +1,83 @@
+"""
+SQLite缓存后端与迁移工具测试
+"""
+
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.cache.backends import CacheBackend, SQLiteBackend
+from py_safe_scan.cache.cache_manager import CacheManager
+from py_safe_scan.cache.migrate import migrate_file_cache
+
+
+def test_sqlite_backend_stats_expiry_and_eviction(tmp_path):
+    """统计随写入/删除维护，过期与LRU淘汰走索引"""
+    backend = SQLiteBackend(tmp_path)
+    backend.put_many([("a", b"x" * 100), ("b", b"y" * 100), ("c", b"z" * 100)])
+    backend.put("a", b"x" * 50)  # 覆盖写入只调整字节数
+    assert backend.stats() == {"entries": 3, "bytes": 250}
+
+    backend.get("a")  # a 变为最近使用
+    assert backend.evict(max_bytes=150, keep="c") == 1
+    assert backend.get("b") is None
+    assert backend.stats() == {"entries": 2, "bytes": 150}
+
+    assert backend.expire(before=time.time() + 1) == 2
+    assert backend.stats() == {"entries": 0, "bytes": 0}
+    backend.close()
+
+
+def test_cache_manager_on_sqlite(tmp_path):
+    """默认SQLite后端：批量写入、跨实例读取、统计"""
+    cache = CacheManager(tmp_path, backend=SQLiteBackend(tmp_path))
+    assert cache.set_many({"k1": {"label": "sink"}, "k2": [1, 2, 3]})
+    cache.close()
+
+    reopened = CacheManager(tmp_path, backend=SQLiteBackend(tmp_path))
+    assert reopened.get("k1") == {"label": "sink"}
+    assert reopened.exists("k2")
+    stats = reopened.get_stats()
+    assert stats["entry_count"] == 2
+    assert stats["disk_hits"] == 1
+    reopened.close()
+
+
+def test_migrate_file_cache(tmp_path):
+    """旧 .cache 文件按文件名（键哈希）导入并转换格式，保留写入时间"""
+    legacy = tmp_path / "legacy"
+    legacy.mkdir()
+    key_hash = CacheManager._hash_key("old-key")
+    old_file = legacy / f"{key_hash}.cache"
+    old_file.write_bytes(pickle.dumps({"llm_label": "source"}))
+    written = time.time() - 60
+    os.utime(old_file, (written, written))
+
+    backend = SQLiteBackend(tmp_path / "new")
+    result = migrate_file_cache(legacy, backend, remove=True)
+
+    assert result == {"scanned": 1, "imported": 1, "skipped": 0, "removed": 1}
+    assert not old_file.exists()
+    data, created = backend.get(key_hash)
+    assert not data.startswith(b"\x80")  # 已转换为新格式，不再是pickle
+    assert abs(created - written) < 1
+
+    cache = CacheManager(tmp_path / "new", backend=backend)
+    assert cache.get("old-key") == {"llm_label": "source"}
+    backend.close()
+
+
+def test_backend_base_is_abstract():
+    """未实现全部存取方法的后端无法实例化"""
+    class PartialBackend(CacheBackend):
+        def get(self, key_hash):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialBackend()
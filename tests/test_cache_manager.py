@@ -0,0 +1,80 @@
+"""
+两级缓存管理器测试
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.cache.backends import FileBackend
+from py_safe_scan.cache.cache_manager import CacheManager
+
+
+def test_memory_tier_is_bounded_lru(tmp_path):
+    """内存层超出条目数时淘汰最久未使用的条目，磁盘层仍可命中"""
+    cache = CacheManager(tmp_path, max_entries=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # a 变为最近使用
+    cache.set("c", {"v": 3})
+
+    assert "b" not in cache.memory_cache
+    assert "a" in cache.memory_cache
+    assert cache.get("b") == {"v": 2}  # 从磁盘读回
+
+    stats = cache.get_stats()
+    assert stats["memory_cache_entries"] == 2
+    assert stats["memory_evictions"] >= 1
+    assert stats["memory_hits"] == 1
+    assert stats["disk_hits"] == 1
+
+
+def test_file_backend_budget_and_ttl(tmp_path):
+    """文件后端超出预算时淘汰最久未使用的文件，过期条目视为未命中"""
+    cache = CacheManager(tmp_path, max_entries=1, max_disk_bytes=2500, backend=FileBackend(tmp_path))
+    cache.set("old", "x" * 1000)
+    cache.set("new", "y" * 1000)
+    old_path = cache.backend._path(cache._hash_key("old"))
+    os.utime(old_path, (time.time() - 100, old_path.stat().st_mtime))
+
+    cache.set("newest", "z" * 1000)
+
+    assert not old_path.exists()
+    assert cache.get_stats()["disk_evictions"] == 1
+    assert cache.get("new") == "y" * 1000
+
+    ttl_dir = tmp_path / "ttl"
+    expiring = CacheManager(ttl_dir, ttl=1, backend=FileBackend(ttl_dir))
+    expiring.set("k", "v")
+    expiring.memory_cache.clear()
+    path = expiring.backend._path(expiring._hash_key("k"))
+    os.utime(path, (time.time(), time.time() - 10))
+    assert expiring.get("k") is None
+    assert expiring.get_stats()["expired"] == 1
+
+
+def test_zero_budgets_are_not_replaced_by_defaults(tmp_path):
+    """显式传入0时使用0，而不是回退到配置默认值"""
+    cache = CacheManager(tmp_path, ttl=0, max_entries=0, max_memory_bytes=0, max_disk_bytes=0)
+    assert (cache.ttl, cache.max_disk_bytes) == (0, 0)
+    assert (cache.memory_cache.max_entries, cache.memory_cache.max_bytes) == (0, 0)
+
+    cache.set("k", "v")
+    assert len(cache.memory_cache) == 0
+    time.sleep(0.01)
+    assert cache.get("k") is None
+    assert cache.get_stats()["expired"] == 1
+
+
+def test_set_many_skips_unserializable_entries(tmp_path):
+    """单个条目无法序列化时只跳过该条目，其余条目照常写入"""
+    cache = CacheManager(tmp_path)
+    assert not cache.set_many({"good": {"v": 1}, "bad": lambda: None, "also_good": [1, 2]})
+
+    cache.memory_cache.clear()
+    assert cache.get("good") == {"v": 1}
+    assert cache.get("also_good") == [1, 2]
+    assert cache.get("bad") is None
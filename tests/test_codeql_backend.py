@@ -0,0 +1,137 @@
+"""
+CodeQL CLI server后端测试（使用本地替身脚本模拟 codeql execute cli-server）
+"""
+
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.core.codeql_backend import CliServerBackend, CodeQLBackend, SubprocessBackend
+
+
+FAKE_CODEQL = textwrap.dedent("""\
+    #!{python}
+    import json, sys, time
+
+    if sys.argv[1:] != ["execute", "cli-server"]:
+        print("one-shot " + " ".join(sys.argv[1:]))
+        sys.exit(0)
+
+    # 记录启动次数，验证进程被复用
+    with open({counter!r}, "a") as f:
+        f.write("started\\n")
+
+    buffer = b""
+    while True:
+        chunk = sys.stdin.buffer.read1(4096)
+        if not chunk:
+            break
+        buffer += chunk
+        while b"\\0" in buffer:
+            raw, buffer = buffer.split(b"\\0", 1)
+            args = json.loads(raw)
+            if args[0] == "fail":
+                sys.stderr.write("A fatal error occurred: bad query\\n")
+                sys.stderr.flush()
+            if args[0] == "write":
+                for arg in args[1:]:
+                    if arg.startswith("--output="):
+                        open(arg[len("--output="):], "w").write("fresh")
+            if args[0] == "slow":
+                # 持续输出但迟迟不结束
+                for _ in range(20):
+                    sys.stdout.buffer.write(b".")
+                    sys.stdout.buffer.flush()
+                    time.sleep(0.1)
+            sys.stdout.buffer.write(("ran " + " ".join(args)).encode() + b"\\0")
+            sys.stdout.buffer.flush()
+""")
+
+
+@pytest.fixture
+def fake_codeql(tmp_path):
+    counter = tmp_path / "starts.log"
+    script = tmp_path / "codeql"
+    script.write_text(FAKE_CODEQL.format(python=sys.executable, counter=str(counter)))
+    script.chmod(0o755)
+    return script, counter
+
+
+def test_cli_server_reuses_process(fake_codeql):
+    """多条命令复用同一个server进程"""
+    script, counter = fake_codeql
+    backend = CliServerBackend(str(script))
+    try:
+        first = backend.run(["database", "analyze", "db1"], timeout=10)
+        second = backend.run(["database", "analyze", "db2"], timeout=10)
+    finally:
+        backend.close()
+
+    assert first.stdout == "ran database analyze db1"
+    assert second.stdout == "ran database analyze db2"
+    assert counter.read_text().count("started") == 1
+
+
+def test_cli_server_reports_fatal_errors(fake_codeql):
+    """致命错误转换为 CalledProcessError"""
+    script, _ = fake_codeql
+    backend = CliServerBackend(str(script))
+    try:
+        with pytest.raises(subprocess.CalledProcessError) as exc_info:
+            backend.run(["fail"], timeout=10)
+        assert "bad query" in exc_info.value.stderr
+        # 出错后server仍可继续使用
+        assert backend.run(["resolve"], timeout=10).stdout == "ran resolve"
+    finally:
+        backend.close()
+
+
+def test_cli_server_requires_output_files(fake_codeql, tmp_path):
+    """没有生成 --output 文件的命令视为失败，不会留下上一次的旧结果"""
+    script, _ = fake_codeql
+    output = tmp_path / "final.sarif"
+    output.write_text("stale")
+    backend = CliServerBackend(str(script))
+    try:
+        with pytest.raises(subprocess.CalledProcessError) as exc_info:
+            backend.run(["noop", f"--output={output}"], timeout=10)
+        assert str(output) in exc_info.value.stderr
+        assert not output.exists()
+
+        backend.run(["write", f"--output={output}"], timeout=10)
+        assert output.read_text() == "fresh"
+    finally:
+        backend.close()
+
+
+def test_subprocess_backend(fake_codeql):
+    """子进程后端每条命令单独执行"""
+    script, counter = fake_codeql
+    result = SubprocessBackend(str(script)).run(["version"], timeout=10)
+    assert result.stdout.strip() == "one-shot version"
+    assert not counter.exists()
+
+
+def test_cli_server_timeout_covers_whole_command(fake_codeql):
+    """超时按整条命令计算：持续有输出也会超时，之后重启server"""
+    script, counter = fake_codeql
+    backend = CliServerBackend(str(script))
+    try:
+        with pytest.raises(subprocess.TimeoutExpired):
+            backend.run(["slow"], timeout=0.5)
+        assert backend.run(["resolve"], timeout=10).stdout == "ran resolve"
+    finally:
+        backend.close()
+
+    assert counter.read_text().count("started") == 2
+
+
+def test_backend_requires_run():
+    """后端基类是抽象类，子类必须实现 run"""
+    with pytest.raises(TypeError):
+        CodeQLBackend()
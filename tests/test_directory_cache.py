@@ -0,0 +1,72 @@
+"""
+数据库目录缓存测试
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import config
+from py_safe_scan.cache.directory_cache import DirectoryCache
+from py_safe_scan.core.codeql_manager import CodeQLManager
+from py_safe_scan.utils.file_utils import FileUtils
+
+
+def _populate(cache: DirectoryCache, key: str, size: int) -> Path:
+    path = cache.path_for(key)
+    path.mkdir(parents=True)
+    (path / "data.bin").write_bytes(b"x" * size)
+    return cache.put(key)
+
+
+def test_hit_and_miss(tmp_path):
+    """命中返回已有目录，未命中返回None"""
+    cache = DirectoryCache(tmp_path / "dbs", suffix=".db")
+    assert cache.get("abc") is None
+
+    path = _populate(cache, "abc", 10)
+    assert path.name == "abc.db"
+    assert cache.get("abc") == path
+
+    # 重新加载索引后仍然命中
+    reloaded = DirectoryCache(tmp_path / "dbs", suffix=".db")
+    assert reloaded.get("abc") == path
+
+
+def test_lru_eviction_under_budget(tmp_path):
+    """超出预算时淘汰最久未使用的条目"""
+    cache = DirectoryCache(tmp_path / "dbs", max_bytes=250)
+    _populate(cache, "a", 100)
+    _populate(cache, "b", 100)
+    cache.index["a"]["last_used"] = 1  # a 最久未使用
+    cache.index["b"]["last_used"] = 2
+    _populate(cache, "c", 100)
+
+    assert cache.get("a") is None
+    assert not cache.path_for("a").exists()
+    assert cache.get("b") is not None
+    assert cache.get("c") is not None
+    assert cache.total_bytes() == 200
+
+
+def test_tree_hash_tracks_content(tmp_path):
+    """目录哈希只依赖相对路径和内容"""
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    for root in (first, second):
+        (root / "pkg").mkdir(parents=True)
+        (root / "pkg" / "app.py").write_text("print('hi')\n")
+
+    assert FileUtils.get_tree_hash(first) == FileUtils.get_tree_hash(second)
+
+    (second / "pkg" / "app.py").write_text("print('bye')\n")
+    assert FileUtils.get_tree_hash(first) != FileUtils.get_tree_hash(second)
+
+
+def test_database_cache_budget_zero_is_respected(tmp_path, monkeypatch):
+    """显式传入0作为数据库缓存预算时不被替换为配置默认值"""
+    monkeypatch.setattr(CodeQLManager, "_check_codeql", lambda self: None)
+    assert CodeQLManager(workspace_dir=tmp_path, db_cache_max_bytes=0, backend=object()).db_cache.max_bytes == 0
+    default = CodeQLManager(workspace_dir=tmp_path, backend=object())
+    assert default.db_cache.max_bytes == config.CODEQL_DB_CACHE_MAX_BYTES
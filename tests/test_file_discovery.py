@@ -0,0 +1,55 @@
+"""
+文件发现测试
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.utils.file_discovery import FileDiscovery, load_exclude_config
+from py_safe_scan.utils.file_utils import FileUtils
+
+
+def _touch(root: Path, *paths: str):
+    for rel in paths:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+
+
+def test_gitignore_and_exclude_rules_prune_tree(tmp_path):
+    """.gitignore（含嵌套和取反）与 exclude 规则生效，输出与排序结果一致"""
+    _touch(tmp_path, "a.py", "b/x.py", "b/gen_1.py", "b/keep/gen_2.py", "c.py", "build/out.py",
+           "node_modules/pkg/m.py", "lib/test_lib.py", "lib/util.py", "lib/notes.txt", "logs/x.py")
+    (tmp_path / ".gitignore").write_text("# 生成目录\n/build/\nlogs\n")
+    (tmp_path / "b" / ".gitignore").write_text("gen_*.py\n!keep/gen_2.py\n")
+
+    discovery = FileDiscovery(exclude=load_exclude_config(), workers=4)
+    found = list(discovery.iter_files(tmp_path))
+
+    expected = [tmp_path / rel for rel in ("a.py", "b/keep/gen_2.py", "b/x.py", "c.py", "lib/util.py")]
+    assert found == expected
+    assert found == sorted(found)
+    assert list(FileDiscovery(exclude=load_exclude_config(), workers=1).iter_files(tmp_path)) == expected
+    assert list(discovery.iter_files(tmp_path, recursive=False)) == [tmp_path / "a.py", tmp_path / "c.py"]
+
+
+def test_find_python_files_is_deterministic_and_root_relative(tmp_path):
+    """忽略模式只匹配扫描目录内的相对路径，max_files 截断结果确定"""
+    # pytest 的临时目录本身包含 "test_"，不能因此忽略全部文件
+    assert "test_" in str(tmp_path)
+    _touch(tmp_path, *(f"pkg{i}/mod.py" for i in range(5)), "tests/t.py", "venv/lib/site.py")
+
+    first = FileUtils.find_python_files(tmp_path, max_files=3)
+    assert first == [tmp_path / f"pkg{i}/mod.py" for i in range(3)]
+    assert FileUtils.find_python_files(tmp_path, max_files=3) == first
+
+
+def test_workers_must_be_positive():
+    """workers 为0或负数时报错，而不是静默回退到默认值"""
+    for workers in (0, -1):
+        with pytest.raises(ValueError):
+            FileDiscovery(exclude={}, workers=workers)
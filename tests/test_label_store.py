@@ -0,0 +1,100 @@
+"""
+API标签库测试
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.llm.deepseek_client import DeepSeekClient
+from py_safe_scan.llm.label_store import APILabelStore
+
+
+def test_versioned_lookup_and_overrides(tmp_path):
+    """标签按模型/提示词版本隔离，低置信度不覆盖高置信度，人工标注固定生效"""
+    store = APILabelStore(tmp_path / "labels.sqlite3", model="m1", prompt_version="1")
+    assert store.put("subprocess.Popen", "CWE-78", "sink", 90, sink_args=[0])
+    assert not store.put("subprocess.Popen", "CWE-78", "none", 40)
+    assert store.lookup("subprocess.Popen", "CWE-78")["label"] == "sink"
+    assert store.lookup("subprocess.Popen", "CWE-89") is None
+
+    # 换提示词版本后旧标签失效
+    bumped = APILabelStore(tmp_path / "labels.sqlite3", model="m1", prompt_version="2")
+    assert bumped.lookup("subprocess.Popen", "CWE-78") is None
+
+    # 人工标注对所有版本生效，且不被LLM结果覆盖
+    bumped.put("args.get", "CWE-78", "source", 50, origin="manual")
+    assert not bumped.put_many([{"api": "args.get", "cwe": "CWE-78", "label": "none", "confidence": 100,
+                                 "model": "*", "prompt_version": "*"}])
+    assert store.lookup("args.get", "CWE-78")["origin"] == "manual"
+
+    # 导出后导入到新库
+    exported = tmp_path / "labels.json"
+    assert len(store.export_labels(exported)) == 2
+    other = APILabelStore(tmp_path / "other.sqlite3", model="m1", prompt_version="1")
+    assert other.import_labels(exported) == 2
+    assert other.lookup("subprocess.Popen", "CWE-78")["sink_args"] == [0]
+
+
+def test_inference_checks_store_first(tmp_path, monkeypatch):
+    """规范推断只把标签库未命中的API发送给LLM，并回写推断结果"""
+    store = APILabelStore(tmp_path / "labels.sqlite3", model="deepseek-chat", prompt_version="1")
+    store.put("sqlite3.Cursor.execute", "CWE-89", "sink", 95, sink_args=[0])
+    # 同名但包名未解析的API不应命中
+    store.put("args.get", "CWE-89", "none", 95)
+    client = DeepSeekClient(api_key="test-key", model="deepseek-chat", label_store=store)
+
+    sent = []
+
+    def fake_batch(batch, *args):
+        sent.extend(api["method"] for api in batch)
+        for api in batch:
+            api.update({"llm_label": "source", "llm_confidence": 80, "sink_args": []})
+        return batch
+
+    monkeypatch.setattr(client, "_infer_batch", fake_batch)
+    apis = [
+        {"package": "sqlite3", "class": "Cursor", "method": "execute"},
+        {"package": "flask", "class": "request", "method": "get_json"},
+        {"package": "unknown", "class": "args", "method": "get"},
+    ]
+
+    results = client.infer_source_sink_specs(apis, "CWE-89", "")
+
+    assert sent == ["get_json", "get"]
+    assert [api["llm_label"] for api in results] == ["sink", "source", "source"]
+    assert store.lookup("flask.request.get_json", "CWE-89")["confidence"] == 80
+    # 包名未解析的推断结果不写回标签库
+    assert store.lookup("args.get", "CWE-89")["label"] == "none"
+    assert client.get_stats()["label_store_hits"] == 1
+
+
+def test_multi_cwe_inference_uses_store(tmp_path, monkeypatch):
+    """多CWE推断：所有CWE都命中标签库的API不发送给LLM，推断结果按CWE回写"""
+    store = APILabelStore(tmp_path / "labels.sqlite3", model="deepseek-chat", prompt_version="1")
+    store.put("sqlite3.Cursor.execute", "CWE-89", "sink", 95, sink_args=[0])
+    store.put("sqlite3.Cursor.execute", "CWE-78", "none", 90)
+    client = DeepSeekClient(api_key="test-key", model="deepseek-chat", label_store=store)
+
+    sent = []
+
+    def fake_batch(batch, cwe_types):
+        sent.extend(api["method"] for api in batch)
+        for api in batch:
+            api["llm_labels"] = {"CWE-78": {"type": "source", "confidence": 80, "sink_args": []}}
+        return batch
+
+    monkeypatch.setattr(client, "_infer_multi_batch", fake_batch)
+    apis = [
+        {"package": "sqlite3", "class": "Cursor", "method": "execute"},
+        {"package": "flask", "class": "request", "method": "get_json"},
+    ]
+
+    results = client.infer_multi_cwe_specs(apis, ["CWE-89", "CWE-78"])
+
+    assert sent == ["get_json"]
+    assert results[0]["llm_labels"] == {"CWE-89": {"type": "sink", "confidence": 95, "sink_args": [0]}}
+    assert store.lookup("flask.request.get_json", "CWE-78")["label"] == "source"
+    assert store.lookup("flask.request.get_json", "CWE-89")["label"] == "none"
+    assert client.get_stats()["label_store_hits"] == 1
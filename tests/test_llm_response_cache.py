@@ -0,0 +1,89 @@
+"""
+LLM请求级缓存测试
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.cache.backends import SQLiteBackend
+from py_safe_scan.cache.cache_manager import CacheManager
+from py_safe_scan.core.path_slicer import PathSlicer
+from py_safe_scan.core.pipeline import IRISPipeline
+from py_safe_scan.llm.deepseek_client import DeepSeekClient
+from py_safe_scan.utils.file_utils import FileUtils
+from py_safe_scan.utils.source_index import SourceIndex
+
+
+def _client_with_fake_api(cache_dir: Path, calls: list) -> DeepSeekClient:
+    cache = CacheManager(cache_dir, backend=SQLiteBackend(cache_dir))
+    client = DeepSeekClient(api_key="test-key", model="deepseek-chat", cache=cache)
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        content = '{"is_vulnerable": true, "confidence": 90}'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return client
+
+
+def test_repeat_validation_hits_cache_across_instances(tmp_path):
+    """相同的验证请求只调用一次API，新的客户端实例也能命中持久缓存"""
+    calls = []
+    client = _client_with_fake_api(tmp_path, calls)
+    args = dict(source={"file": "a.py", "line": 1}, sink={"file": "a.py", "line": 5}, path=[],
+                cwe_type="CWE-78", code_snippets={"source": "x = request.args['c']", "sink": "os.system(x)"})
+
+    first = client.validate_vulnerability_path(**args)
+    second = client.validate_vulnerability_path(**args)
+    assert first == second == {"is_vulnerable": True, "confidence": 90}
+    assert len(calls) == 1
+    assert client.get_stats()["cache_hits"] == 1
+    client.cache.close()
+
+    rerun = _client_with_fake_api(tmp_path, calls)
+    assert rerun.validate_vulnerability_path(**args)["is_vulnerable"]
+    assert len(calls) == 1
+    rerun.cache.close()
+
+
+def test_cache_key_normalization(tmp_path):
+    """提示词中的行尾空白和多余空行不影响缓存键，温度和模型影响缓存键"""
+    client = DeepSeekClient(api_key="test-key", model="deepseek-chat")
+    key = client._response_cache_key("sys", "line1\n\n\nline2  \n", 0.1)
+
+    assert key == client._response_cache_key("sys ", "line1\n\nline2", 0.1)
+    assert key != client._response_cache_key("sys", "line1\n\nline2", 0.2)
+    assert key != DeepSeekClient(api_key="test-key", model="other")._response_cache_key("sys", "line1\n\nline2", 0.1)
+
+
+def test_pipeline_counts_response_cache_hits_separately(tmp_path):
+    """流水线只把实际API请求计为 llm_calls，响应缓存命中计为 llm_cache_hits"""
+    (tmp_path / "app.py").write_text("cmd = input()\nimport os\nos.system(cmd)\n")
+    calls = []
+    client = _client_with_fake_api(tmp_path / "cache", calls)
+    vuln = {"file": "app.py", "line": 3, "code": "os.system(cmd)", "message": "flow",
+            "source": {"file": "app.py", "line": 1}, "path": [{"file": "app.py", "line": 1, "code": "cmd"}]}
+
+    stats = []
+    for _ in range(2):
+        # 新实例没有路径缓存，第二次验证由LLM响应缓存返回
+        pipeline = IRISPipeline.__new__(IRISPipeline)
+        pipeline.cwe_type = "CWE-78"
+        pipeline.cache = None
+        pipeline.deepseek = client
+        pipeline.source_index = SourceIndex([tmp_path])
+        pipeline.file_utils = FileUtils(pipeline.source_index)
+        pipeline.path_slicer = PathSlicer(pipeline.source_index)
+        pipeline.path_cache, pipeline.source_cache, pipeline.sink_cache = {}, set(), set()
+        pipeline._fingerprints = {}
+        pipeline.stats = {"llm_calls": 0, "llm_cache_hits": 0, "cache_hits": 0}
+        assert len(pipeline._validate_paths([vuln])) == 1
+        stats.append((pipeline.stats["llm_calls"], pipeline.stats["llm_cache_hits"]))
+
+    assert stats == [(1, 0), (0, 1)]
+    assert len(calls) == 1
+    client.cache.close()
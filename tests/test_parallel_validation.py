@@ -0,0 +1,108 @@
+"""
+第四阶段并发路径验证测试
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.core.pipeline import IRISPipeline
+from py_safe_scan.utils.file_utils import FileUtils
+
+
+def _vuln(source_line: int, sink_line: int) -> dict:
+    return {
+        "file": "app.py",
+        "line": sink_line,
+        "message": f"flow {source_line}->{sink_line}",
+        "source": {"file": "app.py", "line": source_line},
+        "path": [{"file": "app.py", "line": source_line, "message": "request.args"}],
+    }
+
+
+class _FakeClient:
+    """只记录请求次数的LLM客户端"""
+
+    def __init__(self):
+        self.stats = {"calls": 0, "cache_hits": 0}
+        self.lock = threading.Lock()
+
+    def request(self):
+        with self.lock:
+            self.stats["calls"] += 1
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+def _bare_pipeline() -> IRISPipeline:
+    pipeline = IRISPipeline.__new__(IRISPipeline)
+    pipeline.cwe_type = "CWE-78"
+    pipeline.cache = None
+    pipeline.path_cache = {}
+    pipeline.source_cache = set()
+    pipeline.sink_cache = set()
+    pipeline.file_utils = FileUtils()
+    pipeline._fingerprints = {}
+    pipeline.deepseek = _FakeClient()
+    pipeline.stats = {"llm_calls": 0, "llm_cache_hits": 0, "cache_hits": 0}
+    return pipeline
+
+
+def test_parallel_validation_matches_serial_order(monkeypatch):
+    """并发验证与串行结果一致：误报会让共享sink的后续组被跳过"""
+    pipeline = _bare_pipeline()
+    validated = []
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_validate(vuln, timeout=None):
+        pipeline.deepseek.request()
+        with lock:
+            validated.append(vuln["source"]["line"])
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.pop()
+        # sink 20 处的第一条路径判定为误报
+        return {"is_vulnerable": vuln["line"] != 20}
+
+    monkeypatch.setattr(pipeline, "_validate_single", fake_validate)
+
+    vulns = [_vuln(1, 20), _vuln(2, 20), _vuln(3, 30), _vuln(4, 40)]
+    confirmed = pipeline._validate_paths(vulns)
+
+    # 第2组与第1组共享sink，第1组是误报，因此不应发出验证请求
+    assert sorted(validated) == [1, 3, 4]
+    assert [v["line"] for v in confirmed] == [30, 40]
+    assert max(peak) > 1
+    assert pipeline.stats["llm_calls"] == 3
+    assert pipeline._site_key("app.py", 20) in pipeline.sink_cache
+
+
+def test_distinct_flows_of_same_pair_validated_separately(monkeypatch):
+    """同一source-sink对的不同路径各自验证：一条路径误报不会吞掉另一条"""
+    pipeline = _bare_pipeline()
+    validated = []
+
+    def fake_validate(vuln, timeout=None):
+        pipeline.deepseek.request()
+        validated.append(len(vuln["path"]))
+        # 只经过 source 的路径判定为误报，多经过一步的路径是真实漏洞
+        return {"is_vulnerable": len(vuln["path"]) > 1}
+
+    monkeypatch.setattr(pipeline, "_validate_single", fake_validate)
+
+    sanitized = _vuln(1, 20)
+    direct = _vuln(1, 20)
+    direct["path"] = direct["path"] + [{"file": "app.py", "line": 10, "message": "cmd"}]
+    confirmed = pipeline._validate_paths([sanitized, direct])
+
+    assert validated == [1, 2]
+    assert confirmed == [direct]
+    assert pipeline.stats["llm_calls"] == 2
@@ -0,0 +1,77 @@
+"""
+污点路径图测试
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.core.codeql_manager import CodeQLManager
+from py_safe_scan.core.path_graph import EMPTY_FLOW, PathGraph
+
+
+def _step(line: int, text: str) -> dict:
+    return {"location": {
+        "physicalLocation": {"artifactLocation": {"uri": "app.py"}, "region": {"startLine": line}},
+        "message": {"text": f"ControlFlowNode for {text}"}
+    }}
+
+
+def _result(*flows) -> dict:
+    return {
+        "ruleId": "py/command-line-injection",
+        "message": {"text": "命令注入"},
+        "locations": [{"physicalLocation": {"artifactLocation": {"uri": "app.py"}, "region": {"startLine": 30}}}],
+        "codeFlows": [{"threadFlows": [{"locations": [_step(line, text) for line, text in flow]}]} for flow in flows]
+    }
+
+
+def test_shared_prefix_flows():
+    """相同位置只登记一次，共享前缀的路径复用前缀节点，相同路径ID相同"""
+    graph = PathGraph()
+    a, b, c, d = (graph.intern_location("app.py", line, f"x{line}") for line in (1, 2, 3, 4))
+    assert graph.intern_location("app.py", 1, "x1") == a
+
+    first = graph.add_flow([a, b, c])
+    second = graph.add_flow([a, b, d])
+    assert graph.add_flow([a, b, c]) == first
+    assert graph.node_count == 4
+    assert graph.flow_locations(second) == [a, b, d]
+    assert graph.prefix(first, 2) == graph.prefix(second, 2)
+    assert graph.source(second) == a and graph.depth(second) == 3
+    assert graph.flow_path(first)[0] is graph.flow_path(second)[0]
+    assert graph.add_flow([]) == EMPTY_FLOW and graph.source(EMPTY_FLOW) is None
+
+
+def test_extract_keeps_distinct_flows(tmp_path, monkeypatch):
+    """共享sink的不同路径各自成为一个漏洞，重复路径去重"""
+    monkeypatch.setattr(CodeQLManager, "_check_codeql", lambda self: None)
+    manager = CodeQLManager(workspace_dir=tmp_path, backend=object())
+
+    cookie_flow = [(5, "request.cookies"), (12, "cmd"), (30, "cmd")]
+    args_flow = [(6, "request.args"), (12, "cmd"), (30, "cmd")]
+    sarif_path = tmp_path / "results.sarif"
+    sarif_path.write_text(json.dumps({"runs": [{"results": [
+        _result(cookie_flow, args_flow),
+        _result(args_flow),
+    ]}]}), encoding="utf-8")
+
+    vulns = manager.extract_results(sarif_path)
+
+    assert [(v["source"]["line"], v["line"]) for v in vulns] == [(5, 30), (6, 30)]
+    assert [[node["line"] for node in v["path"]] for v in vulns] == [[5, 12, 30], [6, 12, 30]]
+    assert vulns[1]["path"][1] is vulns[0]["path"][1]
+    assert vulns[0]["flow_key"] != vulns[1]["flow_key"]
+    json.dumps(vulns[0]["flow_key"])
+
+
+def test_fingerprint_independent_of_graph():
+    """路径指纹只取决于路径内容，不同图中的相同路径指纹相同"""
+    first, second = PathGraph(), PathGraph()
+    second.intern_location("other.py", 9)
+    flows = [graph.add_flow([graph.intern_location("app.py", line, "x") for line in (1, 2)])
+             for graph in (first, second)]
+    assert first.fingerprint(flows[0]) == second.fingerprint(flows[1])
+    assert first.fingerprint(EMPTY_FLOW) == ""
@@ -0,0 +1,113 @@
+"""
+路径切片测试
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.core.path_slicer import PathSlicer
+from py_safe_scan.core.pipeline import IRISPipeline
+from py_safe_scan.utils.file_utils import FileUtils
+from py_safe_scan.utils.source_index import SourceIndex
+
+APP = '''import os
+import subprocess
+
+
+def unrelated():
+    return "x" * 100
+
+
+def handler(request):
+    name = request.args.get("name")
+    log("received")
+    if name.isalnum():
+        cmd = build(name)
+        subprocess.run(
+            cmd,
+            shell=True,
+        )
+    return "ok"
+
+
+def build(value):
+    return "ls " + value
+'''
+
+
+def _vuln(offset: int = 0) -> dict:
+    return {
+        "file": "app.py",
+        "line": 14 + offset,
+        "source": {"file": "app.py", "line": 10 + offset},
+        "path": [{"file": "app.py", "line": 10 + offset, "code": "request.args.get"},
+                 {"file": "app.py", "line": 13 + offset, "code": "cmd"},
+                 {"file": "app.py", "line": 22 + offset, "code": "value"},
+                 {"file": "app.py", "line": 14 + offset, "code": "cmd"}],
+    }
+
+
+def test_slice_keeps_path_and_guards(tmp_path):
+    """切片包含路径语句、函数签名和条件头，不含无关函数和行号，插入无关代码后不变"""
+    (tmp_path / "app.py").write_text(APP, encoding="utf-8")
+    slicer = PathSlicer(SourceIndex([tmp_path]), token_budget=100)
+    path_slice = slicer.slice(_vuln())
+
+    text = path_slice.text
+    assert "def handler(request):" in text
+    assert "    if name.isalnum():" in text
+    assert '→     name = request.args.get("name")' in text
+    assert "→         subprocess.run(" in text and "            shell=True," in text
+    assert "def build(value):" in text
+    # 预算内补充 source/sink 所在函数的完整函数体
+    assert 'log("received")' in text
+    assert "unrelated" not in text and "14" not in text
+    assert "subprocess.run(" in path_slice.sink and "def handler" in path_slice.source
+    assert not path_slice.truncated and path_slice.tokens <= 100
+
+    (tmp_path / "app.py").write_text("# header\n\n" + APP, encoding="utf-8")
+    shifted = PathSlicer(SourceIndex([tmp_path]), token_budget=100).slice(_vuln(offset=2))
+    assert shifted.text == text
+
+
+def test_budget_drops_middle_steps_first(tmp_path):
+    """超出预算时先省略路径中间的语句，source和sink总是保留"""
+    (tmp_path / "app.py").write_text(APP, encoding="utf-8")
+    path_slice = PathSlicer(SourceIndex([tmp_path]), token_budget=10).slice(_vuln())
+
+    assert path_slice.truncated
+    assert "request.args" in path_slice.text and "subprocess.run(" in path_slice.text
+    assert "def build" not in path_slice.text
+
+
+def test_validation_receives_real_sink_and_slice_only(tmp_path, monkeypatch):
+    """验证请求的sink是结果位置而不是source；切片模式下不再读取前后5行的旧片段"""
+    (tmp_path / "app.py").write_text(APP)
+    pipeline = IRISPipeline.__new__(IRISPipeline)
+    pipeline.cwe_type = "CWE-78"
+    pipeline.source_index = SourceIndex([tmp_path])
+    pipeline.path_slicer = PathSlicer(pipeline.source_index, token_budget=100)
+    pipeline.file_utils = FileUtils(pipeline.source_index)
+
+    def legacy_snippet(*args, **kwargs):
+        raise AssertionError("切片模式不应读取旧的代码片段")
+
+    monkeypatch.setattr(pipeline.file_utils, "get_code_snippet", legacy_snippet)
+
+    requests = []
+
+    class _Client:
+        def validate_vulnerability_path(self, **kwargs):
+            requests.append(kwargs)
+            return {"is_vulnerable": True}
+
+    pipeline.deepseek = _Client()
+    vuln = dict(_vuln(), code="subprocess.run(")
+    pipeline._validate_single(vuln)
+
+    (request,) = requests
+    assert request["source"] == vuln["source"]
+    assert request["sink"] == {"file": "app.py", "line": 14, "code": "subprocess.run("}
+    assert "slice" in request["code_snippets"]
@@ -0,0 +1,96 @@
+"""
+项目级AST分析测试
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.core.ast_analyzer import ProjectAnalyzer
+
+MODULE = '''import os
+import requests
+
+
+def handler_{i}(path, *args, **kwargs):
+    data = requests.get("http://example.com/{i}")
+    os.system(path)
+'''
+
+
+def test_process_pool_matches_serial(tmp_path):
+    """多进程结果与串行逐项一致，顺序按文件路径确定"""
+    for i in range(6):
+        pkg = tmp_path / f"pkg{i % 2}"
+        pkg.mkdir(exist_ok=True)
+        (pkg / f"mod{i}.py").write_text(MODULE.format(i=i))
+    (tmp_path / "broken.py").write_text("def oops(:\n")
+
+    serial = ProjectAnalyzer(jobs=1)
+    serial.analyze_directory(tmp_path)
+    parallel = ProjectAnalyzer(jobs=3)
+    parallel.analyze_directory(tmp_path)
+
+    assert parallel.file_count == serial.file_count == 7
+    assert parallel.results == serial.results
+    assert list(parallel.iter_external_apis()) == list(serial.iter_external_apis())
+    assert list(parallel.iter_string_literals()) == list(serial.iter_string_literals())
+
+    functions = list(parallel.iter_internal_functions())
+    assert [f.name for f in functions] == [f"handler_{i}" for i in (0, 2, 4, 1, 3, 5)]
+    assert functions[0].params[0].file == str(tmp_path / "pkg0" / "mod0.py")
+    # 只在JSON边界转换为字典，结构与原字典结果一致
+    assert functions[0].to_dict()["params"][2] == {
+        "name": "kwargs", "line": 5, "type": None, "function": "handler_0",
+        "class": None, "file": str(tmp_path / "pkg0" / "mod0.py"), "kind": "kwargs"
+    }
+
+
+def test_unchanged_files_served_from_cache(tmp_path, monkeypatch):
+    """第二次扫描只解析变化的文件，缓存结果与重新解析一致（包括bytes常量参数）"""
+    from py_safe_scan.cache.backends import SQLiteBackend
+    from py_safe_scan.cache.cache_manager import CacheManager
+
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(3):
+        (src / f"mod{i}.py").write_text(MODULE.format(i=i))
+    (src / "raw.py").write_text("import socket\nsocket.send(b'\\x00', 1j, ...)\n")
+
+    cache = CacheManager(tmp_path / "cache", backend=SQLiteBackend(tmp_path / "cache"))
+    first = ProjectAnalyzer(jobs=1, cache=cache)
+    first.analyze_directory(src)
+    assert first.cache_hits == 0
+
+    (src / "mod1.py").write_text(MODULE.format(i=9))
+    parsed = []
+    analyze = ProjectAnalyzer.analyze_file
+    monkeypatch.setattr(ProjectAnalyzer, "analyze_file", lambda self, path: parsed.append(path) or analyze(self, path))
+
+    second = ProjectAnalyzer(jobs=1, cache=cache)
+    second.analyze_directory(src)
+    assert parsed == [src / "mod1.py"]
+    assert second.cache_hits == 3
+    assert second.results == ProjectAnalyzer(jobs=1).analyze_directory(src)
+    assert second.results[-1].external_apis[0].args[0].value == b"\x00"
+    assert second.results[-1].external_apis[0].args[2].value is Ellipsis
+
+    # 内部包集合不同，缓存键不同
+    third = ProjectAnalyzer({"requests"}, jobs=1, cache=cache)
+    third.analyze_directory(src)
+    assert third.cache_hits == 0
+    cache.close()
+
+
+def test_counts_reset_between_runs(tmp_path):
+    """同一个分析器重复扫描时，文件数和结果只反映最近一次扫描"""
+    for i in range(2):
+        (tmp_path / f"mod{i}.py").write_text(MODULE.format(i=i))
+
+    analyzer = ProjectAnalyzer(jobs=1)
+    first = list(analyzer.analyze_directory(tmp_path))
+    second = analyzer.analyze_directory(tmp_path)
+
+    assert analyzer.file_count == 2
+    assert second == first
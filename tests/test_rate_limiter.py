@@ -0,0 +1,111 @@
+"""
+LLM限流、重试与并发推断测试
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.llm.deepseek_client import DeepSeekClient
+from py_safe_scan.llm.rate_limiter import TokenBucket, retry_with_backoff
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_token_bucket_limits_rate():
+    """突发容量用完后按速率发放令牌"""
+    async def acquire_all():
+        bucket = TokenBucket(rate=50, capacity=2)
+        start = time.monotonic()
+        for _ in range(7):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # 2个突发 + 5个按 50/s 发放 ≈ 0.1s
+    assert asyncio.run(acquire_all()) >= 0.09
+
+
+def test_token_bucket_non_positive_rate_disables_limit():
+    """速率小于等于0表示不限流，不会除零或无限等待"""
+    async def acquire_all(rate):
+        bucket = TokenBucket(rate=rate, capacity=1)
+        for _ in range(5):
+            await bucket.acquire()
+
+    for rate in (0, -1):
+        asyncio.run(asyncio.wait_for(acquire_all(rate), timeout=1))
+
+
+def test_retry_on_429_and_5xx_only():
+    """429/5xx重试，其它错误直接抛出"""
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _StatusError(429 if len(attempts) == 1 else 503)
+        return "ok"
+
+    assert asyncio.run(retry_with_backoff(flaky, base_delay=0.001)) == "ok"
+    assert len(attempts) == 3
+
+    async def bad_request():
+        attempts.append(1)
+        raise _StatusError(400)
+
+    attempts.clear()
+    with pytest.raises(_StatusError):
+        asyncio.run(retry_with_backoff(bad_request, base_delay=0.001))
+    assert len(attempts) == 1
+
+
+def test_async_inference_keeps_input_order(monkeypatch):
+    """并发推断的结果顺序与输入一致，失败批次标记为unknown"""
+    client = DeepSeekClient(api_key="test-key")
+
+    async def fake_batch(async_client, bucket, apis, *args):
+        index = apis[0]["index"]
+        await asyncio.sleep(0.01 * (5 - index))  # 后面的批次先完成
+        if index == 2:
+            raise RuntimeError("boom")
+        for api in apis:
+            api["llm_label"] = "sink"
+            api["llm_confidence"] = 90
+        return apis
+
+    monkeypatch.setattr(client, "_infer_batch_async", fake_batch)
+    apis = [{"index": i, "method": f"m{i}"} for i in range(5)]
+
+    results = client.infer_source_sink_specs(apis, "CWE-78", "", batch_size=1)
+
+    assert [api["index"] for api in results] == [0, 1, 2, 3, 4]
+    assert results[2]["llm_label"] == "unknown"
+    assert all(api["llm_label"] == "sink" for i, api in enumerate(results) if i != 2)
+
+
+def test_async_multi_cwe_inference(monkeypatch):
+    """多CWE推断同样并发处理批次，失败批次没有任何标签"""
+    client = DeepSeekClient(api_key="test-key")
+
+    async def fake_batch(async_client, bucket, apis, cwe_types):
+        if apis[0]["index"] == 1:
+            raise RuntimeError("boom")
+        for api in apis:
+            api["llm_labels"] = {cwe: {"type": "sink", "confidence": 90, "sink_args": []} for cwe in cwe_types}
+        return apis
+
+    monkeypatch.setattr(client, "_infer_multi_batch_async", fake_batch)
+    apis = [{"index": i, "method": f"m{i}"} for i in range(3)]
+
+    results = client.infer_multi_cwe_specs(apis, ["CWE-78"], batch_size=1)
+
+    assert [set(api["llm_labels"]) for api in results] == [{"CWE-78"}, set(), {"CWE-78"}]
@@ -0,0 +1,113 @@
+"""
+SARIF流式读取测试
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.utils.sarif_parser import SARIFParser
+from py_safe_scan.utils.sarif_stream import SarifStreamReader, iter_sarif_result_refs, iter_sarif_results, json_default
+
+
+def _result(rule_id: str, line: int) -> dict:
+    return {
+        "ruleId": rule_id,
+        "message": {"text": f"结果 {line} → \"quoted\""},
+        "locations": [{"physicalLocation": {
+            "artifactLocation": {"uri": "app.py"},
+            "region": {"startLine": line, "startColumn": 1234567, "snippet": {"text": "x = [1, {2: 3}]"}}
+        }}],
+        "score": 0.125 * line
+    }
+
+
+def _sarif() -> dict:
+    return {
+        "version": "2.1.0",
+        "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+        "runs": [
+            {
+                "tool": {"driver": {"name": "CodeQL", "rules": [{"id": "py/sql-injection", "name": "SQL"}]}},
+                "artifacts": [{"location": {"uri": "app.py"}}],
+                "results": [_result("py/sql-injection", line) for line in range(1, 40)]
+            },
+            {"tool": {"driver": {"name": "empty"}}, "results": []},
+            {
+                # tool 位于 results 之后
+                "results": [_result("py/xss", 7)],
+                "tool": {"driver": {"name": "other", "rules": [{"id": "py/xss", "name": "XSS"}]}}
+            }
+        ]
+    }
+
+
+def test_stream_matches_json_load(tmp_path):
+    """任意读块大小下逐条读取的结果与整体解析一致（包括跨块的数字和字符串）"""
+    sarif_path = tmp_path / "results.sarif"
+    sarif_path.write_text(json.dumps(_sarif(), indent=2, ensure_ascii=False), encoding="utf-8")
+    expected = [result for run in _sarif()["runs"] for result in run["results"]]
+
+    assert list(iter_sarif_results(sarif_path)) == expected
+    for chunk_size in (1, 3, 7, 64):
+        reader = SarifStreamReader(sarif_path, chunk_size=chunk_size)
+        assert list(reader.iter_results()) == expected
+
+    events = [(kind, run, key) for kind, run, key, _ in SarifStreamReader(sarif_path).events() if kind != "result"]
+    assert events == [
+        ("run_start", 0, None), ("run_field", 0, "tool"), ("run_end", 0, None),
+        ("run_start", 1, None), ("run_field", 1, "tool"), ("run_end", 1, None),
+        ("run_start", 2, None), ("run_field", 2, "tool"), ("run_end", 2, None),
+    ]
+
+
+def test_parser_streaming_matches_string_parse(tmp_path):
+    """parse_file 流式解析与 parse_string 结果一致（规则信息在 results 之后时也能关联）"""
+    sarif_path = tmp_path / "results.sarif"
+    text = json.dumps(_sarif())
+    sarif_path.write_text(text, encoding="utf-8")
+
+    parser = SARIFParser()
+    streamed = parser.parse_file(sarif_path)
+    parsed = parser.parse_string(text)
+    assert len(streamed) == 40
+    # 只有文件解析带原始结果引用
+    assert all(vuln.pop("sarif_ref") is not None for vuln in streamed)
+    assert all(vuln.pop("sarif_ref") is None for vuln in parsed)
+    assert streamed == parsed
+
+
+def test_result_refs_resolve_to_original(tmp_path):
+    """结果引用按字节偏移读回原始结果（非ASCII字符和CRLF换行不影响偏移），可写入JSON"""
+    sarif_path = tmp_path / "results.sarif"
+    text = json.dumps(_sarif(), indent=2, ensure_ascii=False).replace("\n", "\r\n")
+    sarif_path.write_bytes(text.encode("utf-8"))
+
+    pairs = list(iter_sarif_result_refs(sarif_path))
+    assert len(pairs) == 40
+    for result, ref in pairs:
+        assert ref.resolve() == result
+
+    parsed = SARIFParser().parse_file(sarif_path)
+    assert "raw" not in parsed[0]
+    assert parsed[5]["sarif_ref"].resolve() == pairs[5][0]
+    assert json.loads(json.dumps(parsed[5], default=json_default))["sarif_ref"] == {
+        "sarif": str(sarif_path), "offset": pairs[5][1].offset, "length": pairs[5][1].length
+    }
+
+
+def test_scalars_split_across_chunks(tmp_path):
+    """结果之外的数字和字面量在任意位置被读取块截断（如 "-2." 或 "1e"）时仍完整解码"""
+    results = [{"ruleId": "py/x", "rank": -2.75}]
+    document = {"version": -2.5, "count": 1e5, "runs": [
+        {"tool": -0.125e-3, "flag": True, "results": results, "total": 10, "none": None}
+    ]}
+    sarif_path = tmp_path / "scalars.sarif"
+    sarif_path.write_text(json.dumps(document, separators=(",", ":")), encoding="utf-8")
+
+    for chunk_size in range(1, 24):
+        events = list(SarifStreamReader(sarif_path, chunk_size=chunk_size).events())
+        assert [value for kind, _, _, value in events if kind == "result"] == results, chunk_size
+        assert [value for kind, _, _, value in events if kind == "run_field"] == [-0.125e-3], chunk_size
@@ -0,0 +1,38 @@
+"""
+增量扫描清单测试
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.cache.scan_manifest import ScanManifest
+
+
+def test_diff_and_reuse(tmp_path):
+    """只复用未变化文件中的规范和验证结果"""
+    target = tmp_path / "project"
+    manifest = ScanManifest.load(target, "CWE-78", manifest_dir=tmp_path / "manifests")
+    assert manifest.is_empty
+
+    apis = [
+        {"file": "a.py", "line": 3, "method": "system", "llm_label": "sink", "llm_confidence": 90},
+        {"file": "b.py", "line": 5, "method": "get", "llm_label": "source", "llm_confidence": 80},
+    ]
+    verdicts = {
+        "a.py:1->a.py:3:msg": {"is_vulnerable": True, "files": ["a.py"]},
+        "b.py:5->a.py:3:msg": {"is_vulnerable": False, "files": ["a.py", "b.py"]},
+    }
+    manifest.update({"a.py": "h1", "b.py": "h2"}, apis, verdicts)
+    manifest.save()
+
+    reloaded = ScanManifest.load(target, "CWE-78", manifest_dir=tmp_path / "manifests")
+    changed = reloaded.diff({"a.py": "h1", "b.py": "h2-modified", "c.py": "h3"})
+    assert changed == {"b.py", "c.py"}
+
+    unchanged = {"a.py"}
+    specs = reloaded.reusable_specs(unchanged)
+    assert list(specs) == [ScanManifest.api_key(apis[0])]
+    assert specs[ScanManifest.api_key(apis[0])]["llm_label"] == "sink"
+    assert list(reloaded.reusable_verdicts(unchanged)) == ["a.py:1->a.py:3:msg"]
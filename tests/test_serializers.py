@@ -0,0 +1,65 @@
+"""
+缓存序列化测试
+"""
+
+import pickle
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.cache.backends import SQLiteBackend
+from py_safe_scan.cache.cache_manager import CacheManager
+from py_safe_scan.cache.serializers import HEADER_SIZE, MAGIC, Serializer
+
+
+def test_round_trip_and_compression():
+    """JSON编码往返一致，大负载压缩，小负载不压缩"""
+    serializer = Serializer(compression="zlib", min_compress_size=64)
+    value = {"apis": [{"method": "execute", "llm_label": "sink", "sink_args": [0]}] * 50, "note": "中文"}
+
+    data = serializer.dumps(value)
+    assert data.startswith(MAGIC)
+    assert serializer.loads(data) == value
+    assert len(data) < len(Serializer(compression="none").dumps(value))
+
+    small = serializer.dumps({"a": 1})
+    assert small[HEADER_SIZE - 1] == 0  # 未压缩
+    assert serializer.loads(small) == {"a": 1}
+
+
+def test_rejects_stale_and_pickle_entries():
+    """旧格式、版本不符和未启用的pickle条目直接拒绝"""
+    serializer = Serializer()
+    with pytest.raises(ValueError):
+        serializer.loads(pickle.dumps({"a": 1}))
+
+    stale = bytearray(serializer.dumps({"a": 1}))
+    stale[len(MAGIC)] = 99
+    with pytest.raises(ValueError):
+        serializer.loads(bytes(stale))
+
+    pickled = Serializer(codec="pickle", allow_pickle=True).dumps({1, 2})
+    with pytest.raises(ValueError):
+        serializer.loads(pickled)
+    assert Serializer(codec="pickle", allow_pickle=True).loads(pickled) == {1, 2}
+
+    with pytest.raises(ValueError):
+        Serializer(codec="pickle")
+
+
+def test_cache_manager_treats_rejected_entry_as_miss(tmp_path):
+    """持久层中的旧pickle条目按未命中处理"""
+    backend = SQLiteBackend(tmp_path)
+    cache = CacheManager(tmp_path, backend=backend, serializer=Serializer())
+    backend.put(cache._hash_key("legacy"), pickle.dumps({"a": 1}))
+
+    assert cache.get("legacy") is None
+    assert cache.get_stats()["rejected"] == 1
+
+    cache.set("legacy", {"a": 2})
+    cache.memory_cache.clear()
+    assert cache.get("legacy") == {"a": 2}
+    backend.close()
@@ -0,0 +1,76 @@
+"""
+源文件行索引测试
+"""
+
+import os
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.utils.file_utils import FileUtils
+from py_safe_scan.utils.source_index import SourceIndex
+
+
+def test_snippets_from_root_relative_paths(tmp_path):
+    """相对路径按源码根目录解析，片段格式与行号标记正确，越界行被忽略"""
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "app.py").write_text("a = 1\r\nb = 2\r\nc = 3\r\n", newline="")
+    index = SourceIndex(roots=[tmp_path])
+
+    assert index.get_lines("pkg/app.py", 2, 9) == ["b = 2", "c = 3"]
+    assert index.get_snippet("pkg/app.py", 2, 1) == "     1: a = 1\n→    2: b = 2\n     3: c = 3"
+    assert index.get_snippet("missing.py", 1) == "文件不存在: missing.py"
+    assert index.get_lines("missing.py", 1, 3) == []
+
+
+def test_large_files_are_mmapped_and_reset_drops_content(tmp_path):
+    """超过阈值的文件使用mmap；解析结果在reset前复用，reset后重新读取"""
+    path = tmp_path / "big.py"
+    path.write_text("".join(f"x{i} = {i}\n" for i in range(1, 2001)) + "tail = 'no newline'")
+    index = SourceIndex(roots=[tmp_path], mmap_threshold=1024)
+
+    assert index.get_lines("big.py", 1500, 1501) == ["x1500 = 1500", "x1501 = 1501"]
+    assert index.get_lines("big.py", 2001, 2001) == ["tail = 'no newline'"]
+    assert index.get("big.py").line_count == 2001
+
+    replacement = tmp_path / "big.py.new"
+    replacement.write_text("changed = True\n")
+    os.replace(replacement, path)
+    assert index.get_lines("big.py", 1, 1) == ["x1 = 1"]  # 同一次扫描内不重新读取
+
+    index.reset([tmp_path])
+    assert index.get_lines("big.py", 1, 1) == ["changed = True"]
+    assert index.resolve("new.py") is None
+    (tmp_path / "new.py").write_text("")
+    assert index.resolve("new.py") is None  # 找不到的路径同样只解析一次
+
+
+def test_injected_indexes_are_independent_and_thread_safe(tmp_path):
+    """各自注入的索引互不影响；并发读取同一文件时所有线程得到同一个源文件对象"""
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "app.py").write_text(f"root = {name!r}\n")
+    first = FileUtils(SourceIndex([tmp_path / "a"]))
+    second = FileUtils(SourceIndex([tmp_path / "b"]))
+
+    second.source_index.reset([tmp_path / "b"])
+    assert first.get_code_lines("app.py", 1, 1) == ["root = 'a'"]
+    assert second.get_code_lines("app.py", 1, 1) == ["root = 'b'"]
+
+    index = SourceIndex([tmp_path / "a"])
+    barrier = threading.Barrier(8)
+    seen = []
+
+    def read():
+        barrier.wait()
+        seen.append(index.get("app.py"))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(source) for source in seen}) == 1
+    assert seen[0].lines(1, 1) == ["root = 'a'"]
@@ -0,0 +1,108 @@
+"""
+第四阶段验证结论持久化测试
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from py_safe_scan.cache.backends import SQLiteBackend
+from py_safe_scan.cache.cache_manager import CacheManager
+from py_safe_scan.core.path_slicer import PathSlicer
+from py_safe_scan.core.pipeline import IRISPipeline
+from py_safe_scan.utils.file_utils import FileUtils
+from py_safe_scan.utils.source_index import SourceIndex
+
+APP = """from flask import request
+import os
+
+
+def run():
+    cmd = request.args.get("cmd")
+    os.system(cmd)
+"""
+
+
+class _Client:
+    """返回固定结论的LLM客户端，记录实际请求次数"""
+
+    def __init__(self, is_vulnerable: bool):
+        self.is_vulnerable = is_vulnerable
+        self.stats = {"calls": 0, "cache_hits": 0}
+
+    def validate_vulnerability_path(self, **kwargs):
+        self.stats["calls"] += 1
+        return {"is_vulnerable": self.is_vulnerable}
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+def _pipeline(source_root: Path, cache: CacheManager) -> IRISPipeline:
+    pipeline = IRISPipeline.__new__(IRISPipeline)
+    pipeline.cwe_type = "CWE-78"
+    pipeline.cache = cache
+    pipeline.source_index = SourceIndex([source_root])
+    pipeline.file_utils = FileUtils(pipeline.source_index)
+    pipeline.path_cache = {}
+    pipeline.source_cache = set()
+    pipeline.sink_cache = set()
+    pipeline.fp_sources = set()
+    pipeline.fp_sinks = set()
+    pipeline._fingerprints = {}
+    pipeline.path_slicer = PathSlicer(pipeline.source_index)
+    pipeline.stats = {"llm_calls": 0, "llm_cache_hits": 0, "cache_hits": 0}
+    return pipeline
+
+
+def _vuln(offset: int) -> dict:
+    source_line, sink_line = 6 + offset, 7 + offset
+    return {
+        "file": "app.py",
+        "line": sink_line,
+        "message": "This command depends on a user-provided value.",
+        "source": {"file": "app.py", "line": source_line},
+        "path": [{"file": "app.py", "line": source_line, "message": "request.args"}],
+    }
+
+
+def test_verdicts_survive_line_shifts_and_renamed_roots(tmp_path):
+    """新实例从缓存复用验证结论；代码整体下移、扫描目录改名后键不变"""
+    cache = CacheManager(tmp_path / "cache", backend=SQLiteBackend(tmp_path / "cache"))
+    first_root = tmp_path / "scan_a"
+    first_root.mkdir()
+    (first_root / "app.py").write_text(APP)
+
+    first = _pipeline(first_root, cache)
+    first._load_verdicts()
+    first.deepseek = _Client(True)
+    assert len(first._validate_paths([_vuln(0)])) == 1
+    assert first.stats["llm_calls"] == 1
+    first._save_verdicts()
+    # 每条结论单独一个缓存条目，并发的扫描不会互相覆盖
+    (path_key,) = first.path_cache
+    assert cache.get(first._verdict_cache_key("path", path_key))["is_vulnerable"] is True
+
+    # 在文件顶部插入无关代码，并换一个临时目录
+    second_root = tmp_path / "scan_b"
+    second_root.mkdir()
+    (second_root / "app.py").write_text("import sys\n\n\n" + APP)
+
+    second = _pipeline(second_root, cache)
+    second._load_verdicts()
+    second.deepseek = _Client(False)
+    assert len(second._validate_paths([_vuln(3)])) == 1
+    assert second.stats["llm_calls"] == 0
+    assert second.stats["cache_hits"] == 1
+    second._save_verdicts()
+    assert second._stored_verdicts == {("path", path_key)}  # 读回的结论不再重复写入
+
+    # 改动sink所在代码后不再命中
+    (second_root / "app.py").write_text("import sys\n\n\n" + APP.replace("os.system(cmd)", "os.system(shlex.quote(cmd))"))
+    third = _pipeline(second_root, cache)
+    third._load_verdicts()
+    third.deepseek = _Client(False)
+    assert third._validate_paths([_vuln(3)]) == []
+    assert third.stats["llm_calls"] == 1
+    cache.close()